@@ -0,0 +1,50 @@
+"""import-time benchmark of the cli and each subsystem.
+every measurement runs in a fresh interpreter, e.g.
+
+python benchmarks/bench_import_time.py --repeat 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from timeit import default_timer as timer
+
+repo_path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+TARGETS = [
+    ("python (baseline)", ["-c", "pass"]),
+    ("databricks-admin --help", ["-m", "databricks_api", "--help"]),
+    ("import databricks_api.cli", ["-c", "import databricks_api.cli"]),
+    ("import databricks_api.api", ["-c", "import databricks_api.api"]),
+    ("import databricks_api.acl", ["-c", "import databricks_api.acl"]),
+    ("import databricks_api.cluster", ["-c", "import databricks_api.cluster"]),
+]
+
+
+def measure(cmd_args, repeat):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        p for p in [repo_path, env.get("PYTHONPATH")] if p)
+
+    timings = []
+    for _ in range(repeat):
+        start = timer()
+        subprocess.run([sys.executable, *cmd_args], env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(timer() - start)
+
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='interpreter starts per target. Default is 5')
+    args = parser.parse_args()
+
+    print(f"{'target':<32} {'median ms':>10} {'min ms':>10}")
+    for name, cmd_args in TARGETS:
+        timings = measure(cmd_args, args.repeat)
+        print(f"{name:<32} {statistics.median(timings) * 1000:>10.1f} "
+              f"{min(timings) * 1000:>10.1f}")
@@ -0,0 +1,5 @@
+import sys
+
+from databricks_api.cli import main
+
+sys.exit(main())
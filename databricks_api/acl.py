@@ -1,140 +1,262 @@
-from databricks_api.api import SCIM, ClusterPermissions, DirectoryPermissions
-
-from databricks_cli.sdk import ApiClient
-from databricks_cli.secrets.api import SecretApi
-from databricks_cli.clusters.api import ClusterApi
-from databricks_cli.workspace.api import WorkspaceApi
-from databricks_cli.groups.api import GroupsApi
-
-from databricks_api.utils import render_yaml, parse_cmdline, logger, dir_path, logging, LOGGER_NAME
+from databricks_api.api import SCIM, Listings, Groups, Secrets, Workspace
+from databricks_api.auth import register_args
+from databricks_api.base import get_request_cache, get_transport, configure_transport
+from databricks_api.cache import InventoryCache, DEFAULT_CACHE_PATH
+from databricks_api.capture import Recorder
+from databricks_api.cleanup import CleanupExecutor, CleanupGuard
+from databricks_api.journal import RunJournal, DEFAULT_JOURNAL_DIR
+from databricks_api.membership import MembershipGraph, member_node, USER, SPN
+from databricks_api.permissions import PermissionsEngine, OBJECT_TYPES
+from databricks_api.principals import names, scope_acl_set, scope_acl_items
+from databricks_api.profiling import Profiler
+from databricks_api.report import shard_report, write_report
+from databricks_api.shard import Shard
+from databricks_api.sources import sync_source_members
+from databricks_api.usersync import sync_users
+
+from databricks_api.utils import render_yaml, parse_cmdline, logger, config_path, logging, LOGGER_NAME, fan_out
 # , dump_yaml
 from timeit import default_timer as timer
 import datetime
 
+# root folders every workspace has, never deleted as unmanaged
+IGNORED_FOLDERS = ["Shared", "Users", "Repos"]
 
-def deploy_groups(groups_client, scim, groups_config, remove_unmanaged=False):
+
+def deploy_groups(groups_client, scim, groups_config, remove_unmanaged=False,
+                  journal=None, shard=None, listings=None, cleanup=None):
     """function to deploy groups and corresponding users/spn
 
     :param groups_client: databricks Groups API
-    :type groups_client: databricks_client.groups.api.GroupsApi
+    :type groups_client: api.Groups
     :param scim: databricks SCIM API
     :type scim: api.SCIM
     :param groups_config: GROUPS in ACL.yaml
     :type groups_config: list(dict)
+    :param journal: optional run journal to skip groups synced by a resumed run
+    :type journal: journal.RunJournal
+    :param shard: optional shard. only its groups are deployed and only
+        the coordinator removes unmanaged groups
+    :type shard: shard.Shard
+    :param listings: optional streamed listings of the workspace groups
+    :type listings: api.Listings
+    :param cleanup: guarded executor deleting unmanaged groups
+    :type cleanup: cleanup.CleanupExecutor
     """
+    coordinator = not shard or shard.is_coordinator
     if remove_unmanaged:
         logger.warning("remove unmanaged groups and users is ENABLED")
     # delete groups that are not authorized
-    existing_groups = [g for g in groups_client.list_all()["group_names"]
-                       if g != "users"]
-    group_list = [g["name"] for g in groups_config]
+    group_names = (listings.iter_group_names() if listings
+                   else groups_client.list_all()["group_names"])
+    existing_groups = [g for g in group_names if g != "users"]
+    group_list = names(g["name"] for g in groups_config)
 
     logger.debug(existing_groups)
     logger.debug(group_list)
 
+    # nested groups: fail on cycles and undefined groups before any change,
+    # then deploy child groups before the groups they are members of
+    graph = MembershipGraph.from_config(groups_config)
+    config_by_name = {g["name"]: g for g in groups_config}
+    unknown_groups = [g for g in graph.groups if g not in config_by_name]
+    if unknown_groups:
+        raise ValueError(f"nested groups not defined in GROUPS: {unknown_groups}")
+    ordered_config = [config_by_name[g] for g in graph.topological_order()]
+
     remove_groups = [g for g in existing_groups
                      if g not in group_list and g != "admins"]
     logger.warning(f"unmanaged groups: {remove_groups}")
-    if remove_unmanaged:
-        for g in remove_groups:
-            groups_client.delete(g)
-            logger.debug(f"removed group: {g}")
-
-    # group creation and user/spn create,add,remove
-    for grp in groups_config:
-        principal = grp["name"]
-        logger.info("========================================")
-        logger.info(f"Group: {principal}")
-
-        try:
-            groups_client.create(principal)
-            logger.info(f"created group {principal}")
-        except Exception as err:
-            logger.error(err)
-
-        # remove unauthorized members
-        temp_members = groups_client.list_members(principal)
-        if temp_members.get("members"):
-            current_members = temp_members.get("members")
-        else:
-            current_members = []
-
-        member_list = grp["members"]
-
-        # add_members = []
-        modified_member_list = []
-        for member in member_list:
-            user_name = member.get("user_name") if member.get(
-                "user_name") else member.get("application_id")
-            modified_member_list.append({"user_name": user_name})
-            # if {"user_name": user_name} not in current_members:
-            #     add_members.append(member)
-
-        remove_members = []
-        for cur_mem in current_members:
-            member_key = "user_name" if grp["type"] == "user" else "application_id"
-            if cur_mem not in modified_member_list:
-                remove_members.append({member_key: cur_mem["user_name"]})
-
-        logger.debug({"current members": current_members})
-        logger.warning({"unmanaged members": remove_members})
-        # logger.info(f"adding members: {add_members}")
-        logger.info(f"adding members to group")
-
-        # create and add users/spn to their groups
-        groups = [principal]
-
-        if grp["type"] == "user":
-            if remove_unmanaged:
-                for user in remove_members:
-                    user_name = user["user_name"]
-                    groups_client.remove_member(
-                        principal, user_name, None)
-                    logger.warning(f"removed {user_name} from {principal}")
-
-            for user in member_list:
+    if remove_unmanaged and coordinator:
+        (cleanup or CleanupExecutor()).run("groups", remove_groups, groups_client.delete,
+                                           total=len(existing_groups))
+    if shard:
+        # nested groups of one component stay on one shard to keep the order
+        component_key = {g: min(c) for c in graph.components() for g in c}
+        ordered_config = [g for g in ordered_config
+                          if shard.owns("group", g["name"], key=component_key[g["name"]])]
+
+    # group creation and user/spn/group create,add,remove
+    current_graph = MembershipGraph()
+    for grp in ordered_config:
+        if journal and journal.skip("group", grp["name"], grp,
+                                    validate=lambda _: grp["name"] in existing_groups):
+            continue
+
+        current_graph.add_group(grp["name"])
+        for node in deploy_group(groups_client, scim, grp,
+                                 remove_unmanaged=remove_unmanaged):
+            current_graph.add_member(grp["name"], node)
+        if journal:
+            journal.record("group", grp["name"], grp)
+
+    for group in current_graph.groups:
+        added, removed = graph.effective_diff(current_graph, group)
+        if added or removed:
+            logger.info({f"effective membership of {group}":
+                         {"added": sorted(added), "removed": sorted(removed)}})
+
+    # display name, active and entitlements of the members, in /Bulk requests
+    sync_users(scim, ordered_config)
+
+
+def deploy_group(groups_client, scim, grp, remove_unmanaged=False):
+    """function to create a group and sync its users/spn and nested groups.
+    only direct members are synced, members of nested groups are left alone
+
+    :param groups_client: databricks Groups API
+    :type groups_client: api.Groups
+    :param scim: databricks SCIM API
+    :type scim: api.SCIM
+    :param grp: group in GROUPS of ACL.yaml
+    :type grp: dict
+
+    :return: direct members before the sync as membership graph nodes
+    :type return: list(tuple)
+    """
+    principal = grp["name"]
+    logger.info("========================================")
+    logger.info(f"Group: {principal}")
+
+    try:
+        groups_client.create(principal)
+        logger.info(f"created group {principal}")
+    except Exception as err:
+        logger.error(err)
+
+    # remove unauthorized members
+    temp_members = groups_client.list_members(principal)
+    if temp_members.get("members"):
+        current_members = temp_members.get("members")
+    else:
+        current_members = []
+
+    # nested groups are synced as group members, users/spn below
+    deploy_nested_groups(
+        groups_client, principal,
+        [m["group_name"] for m in grp.get("members") or [] if m.get("group_name")],
+        [m["group_name"] for m in current_members if m.get("group_name")],
+        remove_unmanaged=remove_unmanaged)
+
+    # large groups stream their users/spn from an external file
+    if grp.get("source"):
+        sync_source_members(groups_client, scim, grp,
+                            remove_unmanaged=remove_unmanaged,
+                            current_members=current_members)
+        return [member_node(m) for m in current_members if m.get("group_name")]
+
+    kind = SPN if grp["type"] == "spn" else USER
+    current_nodes = [member_node(m, kind) for m in current_members]
+    member_list = [m for m in grp["members"] if not m.get("group_name")]
+    current_members = [m for m in current_members if not m.get("group_name")]
+
+    # list_members returns users and service principals as user_name
+    managed_members = names(m.get("user_name") or m.get("application_id")
+                            for m in member_list)
+    member_key = "user_name" if grp["type"] == "user" else "application_id"
+    remove_members = [{member_key: m["user_name"]} for m in current_members
+                      if m["user_name"] not in managed_members]
+
+    logger.debug({"current members": current_members})
+    logger.warning({"unmanaged members": remove_members})
+    # logger.info(f"adding members: {add_members}")
+    logger.info(f"adding members to group")
+
+    # create and add users/spn to their groups
+    groups = [principal]
+
+    if grp["type"] == "user":
+        if remove_unmanaged:
+            for user in remove_members:
                 user_name = user["user_name"]
-                display_name = user.get("display_name")
-                try:
-                    r = scim.add_user(user_name, display_name, groups)
-                except Exception as err:
-                    logger.debug(repr(err))
-
-                    r = groups_client.add_member(
-                        principal, user_name, None)
-                    # update display name as well
-                    if display_name:
-                        scim.update_user(user_name, display_name)
-
-                logger.debug(r)
-                # logger.info(f"successfully added {user_name}")
-        elif grp["type"] == "spn":
-            for spn in remove_members:
-                scim.remove_sp_group(
-                    app_id=spn["application_id"], groups=groups)
-
-            for spn in member_list:
-                app_id = spn["application_id"]
-                display_name = spn.get("display_name")
-                # scim.delete_sp(app_id)
-                try:
-                    r = scim.add_sp(app_id, display_name, groups)
-                except Exception as err:
-                    logger.debug(repr(err))
-                    # if already existing SP, can update the groups
-                    # remove_current=True,
-                    r = scim.update_sp_group(app_id, groups,)
-
-                logger.debug(r)
-
-
-def deploy_secret_acl(secret_client, secret_config):
+                groups_client.remove_member(
+                    principal, user_name, None)
+                logger.warning(f"removed {user_name} from {principal}")
+
+        for user in member_list:
+            user_name = user["user_name"]
+            display_name = user.get("display_name")
+            try:
+                r = scim.add_user(user_name, display_name, groups)
+            except Exception as err:
+                logger.debug(repr(err))
+
+                # display names of existing users are synced by sync_users
+                r = groups_client.add_member(
+                    principal, user_name, None)
+
+            logger.debug(r)
+            # logger.info(f"successfully added {user_name}")
+    elif grp["type"] == "spn":
+        for spn in remove_members:
+            scim.remove_sp_group(
+                app_id=spn["application_id"], groups=groups)
+
+        for spn in member_list:
+            app_id = spn["application_id"]
+            display_name = spn.get("display_name")
+            # scim.delete_sp(app_id)
+            try:
+                r = scim.add_sp(app_id, display_name, groups)
+            except Exception as err:
+                logger.debug(repr(err))
+                # if already existing SP, can update the groups
+                # remove_current=True,
+                r = scim.update_sp_group(app_id, groups,)
+
+            logger.debug(r)
+
+    return current_nodes
+
+
+def deploy_nested_groups(groups_client, principal, child_groups, current_groups,
+                         remove_unmanaged=False):
+    """function to sync the groups that are direct members of a group
+
+    :param groups_client: databricks Groups API
+    :type groups_client: api.Groups
+    :param principal: parent group name
+    :type principal: str
+    :param child_groups: desired member groups
+    :type child_groups: list(str)
+    :param current_groups: current member groups
+    :type current_groups: list(str)
+    """
+    current = names(current_groups)
+    desired = names(child_groups)
+    for child in child_groups:
+        if child not in current:
+            groups_client.add_member(principal, None, child)
+            logger.info(f"added group {child} to {principal}")
+
+    remove_groups = [g for g in current_groups if g not in desired]
+    if remove_groups:
+        logger.warning({f"unmanaged member groups of {principal}": remove_groups})
+    if remove_unmanaged:
+        for child in remove_groups:
+            groups_client.remove_member(principal, None, child)
+            logger.warning(f"removed group {child} from {principal}")
+
+
+def deploy_secret_acl(secret_client, secret_config, cache=None, journal=None,
+                      shard=None, listings=None, cleanup=None):
     """function to deploy secret scope permissions
 
     :param secret_client: databricks Secrets API
-    :type secret_client: databricks_cli.secrets.api.SecretApi
+    :type secret_client: api.Secrets
     :param secret_config: SECRETS in ACL.yaml
     :type secret_config: list(dict)
+    :param cache: optional inventory cache for current scope ACLs
+    :type cache: cache.InventoryCache
+    :param journal: optional run journal to skip scopes reconciled by a resumed run
+    :type journal: journal.RunJournal
+    :param shard: optional shard. only its scopes are reconciled and only
+        the coordinator removes ACL from unmanaged scopes
+    :type shard: shard.Shard
+    :param listings: optional streamed listings of the workspace scopes
+    :type listings: api.Listings
+    :param cleanup: guarded executor removing ACL from unmanaged scopes
+    :type cleanup: cleanup.CleanupExecutor
     """
     logger.info("""
 ++++++++++++++++++++++++++++++++++++++++
@@ -143,168 +265,177 @@ SECRETS ACL
         """)
 
     # remove ACL on *unmanaged* secret scopes
-    current_scopes = [s["name"] for s in secret_client.list_scopes()["scopes"]]
+    scopes = listings.iter_scopes() if listings else secret_client.list_scopes()["scopes"]
+    current_scopes = [s["name"] for s in scopes]
+    coordinator = not shard or shard.is_coordinator
+    cleanup = cleanup or CleanupExecutor()
     if not secret_config:
+        if not coordinator:
+            return
         logger.warning(f"removing ACL from UNMANAGED scopes: {current_scopes}")
-        for s in current_scopes:
-            current_acl = secret_client.list_acls(s)
-            if current_acl.get("items"):
-                for i in current_acl.get("items"):
-                    secret_client.delete_acl(s, i["principal"])
-
+        remove_scope_acls(secret_client, current_scopes, cleanup, total=len(current_scopes))
         return
 
-    scope_list = [s["scope"] for s in secret_config]
-    remove_scopes = [s for s in current_scopes if s not in scope_list]
+    scope_list = names(s["scope"] for s in secret_config)
+    remove_scopes = [s for s in current_scopes if s not in scope_list] if coordinator else []
     logger.warning(f"removing ACL from UNMANAGED scopes: {remove_scopes}")
-    for s in remove_scopes:
-        current_acl = secret_client.list_acls(s)
-        if current_acl.get("items"):
-            for i in current_acl.get("items"):
-                secret_client.delete_acl(s, i["principal"])
-        # secret_client.delete_scope(s)
+    remove_scope_acls(secret_client, remove_scopes, cleanup, total=len(current_scopes))
+    # secret_client.delete_scope(s)
 
     # remove then add ACL on scope
     for secret in secret_config:
-        # TODO try create scope?
-        # complicated. needs AAD token which requires AAD application. also needs KV resource ID, KV DNS name:
-        # https://docs.microsoft.com/en-us/azure/databricks/security/secrets/secret-scopes#create-an-azure-key-vault-backed-secret-scope-using-the-databricks-cli
-        # https://docs.microsoft.com/en-us/azure/databricks/dev-tools/api/latest/aad/app-aad-token#--use-an-azure-ad-access-token-to-access-the-databricks-rest-api
-        # backend_azure_keyvault = {
-        #     'resource_id': resource_id,
-        #     'dns_name': dns_name
-        # }
-        # secret_client.create_scope(secret["scope"], "Creator", "AZURE_KEYVAULT", backend_azure_keyvault)
-
-        scope = secret["scope"]
-        acl_list = secret["acl"]
-        logger.info("========================================")
-        logger.info(scope)
-        logger.debug(acl_list)
-
-        # check and remove unauthorized ACL on scope
-        current_acl = secret_client.list_acls(scope)
-        parsed_acl = []
-        if current_acl.get("items"):
-            temp_read = {"permission": "READ"}
-            temp_manage = {"permission": "MANAGE"}
-            temp_write = {"permission": "WRITE"}
-            for i in current_acl["items"]:
-                if i["permission"] == "READ":
-                    temp_read["group"] = temp_read.get(
-                        "group", []) + [i["principal"]]
-                elif i["permission"] == "MANAGE":
-                    temp_manage["group"] = temp_manage.get(
-                        "group", []) + [i["principal"]]
-                elif i["permission"] == "WRITE":
-                    temp_write["group"] = temp_write.get(
-                        "group", []) + [i["principal"]]
-
-            if temp_read.get("group"):
-                parsed_acl.append(temp_read)
-            if temp_manage.get("group"):
-                parsed_acl.append(temp_manage)
-            if temp_write.get("group"):
-                parsed_acl.append(temp_write)
-            logger.debug(f"existing parsed ACL: {parsed_acl}")
-        else:
-            logger.info(f"No ACL on scope {scope}")
-
-        remove_acl = [d for d in parsed_acl if d not in acl_list]
-        logger.warning(f"remove ACL: {remove_acl}")
-        for d in remove_acl:
-            for g in d["group"]:
-                secret_client.delete_acl(scope, g)
-
-        logger.info(f"applying ACL on scope {scope}")
-        for acl in acl_list:
-            for group in acl["group"]:
-                secret_client.put_acl(scope, group, acl["permission"])
-                logger.info(f'{acl["permission"]}: {group}')
-
-
-def deploy_cluster_acl(cluster_client, cluster_perm, cluster_config):
-    """function to deploy cluster permissions
-
-    :param cluster_client: databricks Cluster API
-    :type cluster_client: databricks_cli.clusters.api.ClusterApi
-    :param cluster_perm:
-        databricks Permissions API (cluster)
-        https://docs.gcp.databricks.com/dev-tools/api/latest/permissions.html#tag/Cluster-permissions
-    :type cluster_perm: api.ClusterPermissions
-    :param cluster_config: CLUSTERS in ACL.yaml
-    :type cluster_config: list(dict)
+        if shard and not shard.owns("scope", secret["scope"]):
+            continue
+        if journal and journal.skip("scope", secret["scope"], secret,
+                                    validate=lambda _: secret["scope"] in current_scopes):
+            continue
+
+        deploy_scope_acl(secret_client, secret, cache=cache)
+        if journal:
+            journal.record("scope", secret["scope"], secret)
+
+
+def remove_scope_acls(secret_client, scopes, cleanup, total=None):
+    """function to delete every ACL entry of unmanaged secret scopes.
+    all entries are listed first, the guard counts scopes
+
+    :param secret_client: databricks Secrets API
+    :type secret_client: api.Secrets
+    :param scopes: unmanaged scope names
+    :type scopes: list(str)
+    :param cleanup: guarded executor of the deletions
+    :type cleanup: cleanup.CleanupExecutor
+    :param total: existing scopes, for the percentage limit
+    :type total: int
     """
-    for cluster in cluster_config:
-        cluster_name = cluster["name"]
-        acl_list = cluster["acl"]
-        logger.info("========================================")
-        logger.info(cluster_name)
-        logger.debug(acl_list)
-
-        try:
-            # get cluster id
-            cluster_id = cluster_client.get_cluster_id_for_name(
-                cluster["name"])
-
-            # replace ACL on cluster
-            logger.info(
-                cluster_perm.replace_permissions(cluster_id, acl_list)
-            )
-        except Exception as err:
-            logger.debug(err)
+    entries, affected = [], 0
+    for scope, current_acl, err in fan_out(secret_client.list_acls, scopes,
+                                           max_workers=cleanup.max_workers):
+        if err:
+            logger.error(f"listing ACL of scope {scope} failed: {repr(err)}")
+            continue
+        items = current_acl.get("items") or []
+        affected += bool(items)
+        entries.extend((scope, i["principal"]) for i in items)
 
+    return cleanup.run("scope ACL entries", entries,
+                       lambda entry: secret_client.delete_acl(*entry),
+                       total=total, count=affected)
 
-def deploy_workspace_acl(workspace_client, dir_perm, workspace_config):
-    """function to deploy permissions on workspace folders
+
+def deploy_scope_acl(secret_client, secret, cache=None):
+    """function to reconcile the ACL of one secret scope
+
+    :param secret_client: databricks Secrets API
+    :type secret_client: api.Secrets
+    :param secret: scope in SECRETS of ACL.yaml
+    :type secret: dict
+    :param cache: optional inventory cache for current scope ACLs
+    :type cache: cache.InventoryCache
+    """
+    # TODO try create scope?
+    # complicated. needs AAD token which requires AAD application. also needs KV resource ID, KV DNS name:
+    # https://docs.microsoft.com/en-us/azure/databricks/security/secrets/secret-scopes#create-an-azure-key-vault-backed-secret-scope-using-the-databricks-cli
+    # https://docs.microsoft.com/en-us/azure/databricks/dev-tools/api/latest/aad/app-aad-token#--use-an-azure-ad-access-token-to-access-the-databricks-rest-api
+    # backend_azure_keyvault = {
+    #     'resource_id': resource_id,
+    #     'dns_name': dns_name
+    # }
+    # secret_client.create_scope(secret["scope"], "Creator", "AZURE_KEYVAULT", backend_azure_keyvault)
+
+    scope = secret["scope"]
+    acl_list = secret["acl"]
+    logger.info("========================================")
+    logger.info(scope)
+    logger.debug(acl_list)
+
+    # check and remove unauthorized ACL on scope
+    current_acl = cache.scope_acl(scope) if cache else None
+    if current_acl is None:
+        current_acl = secret_client.list_acls(scope)
+    current = scope_acl_items(current_acl.get("items"))
+    if current:
+        logger.debug(f"existing ACL: {sorted(current)}")
+    else:
+        logger.info(f"No ACL on scope {scope}")
+
+    # put_acl overwrites the permission of a principal, so only principals
+    # without any configured permission are deleted
+    desired = scope_acl_set(acl_list)
+    desired_principals = names(d.principal for d in desired)
+    remove_acl = sorted(c for c in current if c.principal not in desired_principals)
+    logger.warning(f"remove ACL: {remove_acl}")
+    for principal, _ in remove_acl:
+        secret_client.delete_acl(scope, principal)
+
+    logger.info(f"applying ACL on scope {scope}")
+    if cache:
+        cache.invalidate_scope(scope)
+    for acl in acl_list:
+        for group in acl["group"]:
+            if (group, acl["permission"]) in current:
+                continue
+            secret_client.put_acl(scope, group, acl["permission"])
+            logger.info(f'{acl["permission"]}: {group}')
+
+    if cache:
+        cache.put_scope_acl(scope, [
+            {"principal": group, "permission": acl["permission"]}
+            for acl in acl_list for group in acl["group"]
+        ])
+
+
+def deploy_workspace_acl(workspace_client, engine, workspace_config, cache=None,
+                         journal=None, shard=None, listings=None, cleanup=None):
+    """function to delete unmanaged workspace folders and deploy permissions on
+    managed folders. missing folders are created
 
     :param workspace_client: databricks Workspace API
-    :type workspace_client: databricks_cli.workspace.api.WorkspaceApi
-    :param dir_perm:
-        databricks Permissions API (directory)
-        https://docs.gcp.databricks.com/dev-tools/api/latest/permissions.html#tag/Directory-permissions
-    :type dir_perm: api.DirectoryPermissions
+    :type workspace_client: api.Workspace
+    :param engine: permissions engine
+    :type engine: permissions.PermissionsEngine
     :param workspace_config: WORKSPACE in ACL.yaml
     :type workspace_config: list(dict)
+    :param cache: optional inventory cache for directory ids
+    :type cache: cache.InventoryCache
+    :param journal: optional run journal to skip folders done by a resumed run
+    :type journal: journal.RunJournal
+    :param shard: optional shard. only its folders are deployed and only
+        the coordinator deletes unmanaged folders
+    :type shard: shard.Shard
+    :param listings: optional streamed listings of the workspace root
+    :type listings: api.Listings
+    :param cleanup: guarded executor deleting unmanaged folders
+    :type cleanup: cleanup.CleanupExecutor
     """
     # delete unmanaged folders
-    folder_list = [f["folder"] for f in workspace_config]
+    folder_list = names(f["folder"] for f in workspace_config)
     logger.debug(folder_list)
-    ignore_folders = ["Shared", "Users", "Repos"]
 
-    current_items = ["/" + i.basename for i in workspace_client.list_objects("/")
-                     if i.basename not in ignore_folders]
+    if listings:
+        basenames = (o["path"].rsplit("/", 1)[-1] for o in listings.iter_objects("/"))
+    else:
+        basenames = (o["path"].rsplit("/", 1)[-1] for o in workspace_client.list_objects("/"))
+    current_items = ["/" + b for b in basenames if b not in IGNORED_FOLDERS]
 
     remove_items = [i for i in current_items if i not in folder_list]
+    if shard and not shard.is_coordinator:
+        remove_items = []
     logger.warning(f"removing UNMANAGED folders/files: {remove_items}")
-    for ri in remove_items:
-        workspace_client.delete(ri, True)
+
+    def delete(path):
+        workspace_client.delete(path, True)
+        if cache:
+            cache.invalidate_object("directory", path)
+
+    (cleanup or CleanupExecutor()).run("folders", remove_items, delete,
+                                       total=len(current_items))
 
     # apply ACL to folders. create if not exist
-    for wsdir in workspace_config:
-        folder = wsdir["folder"]
-        acl_list = wsdir["acl"]
-        logger.info("========================================")
-        logger.info(folder)
-        logger.debug(acl_list)
-        try:
-            directory = workspace_client.get_status(folder)
-        except Exception as error:
-            logger.error(repr(error))
-            logger.info(f"creating folder {folder}")
-            logger.debug(workspace_client.mkdirs(folder))
-            directory = workspace_client.get_status(folder)
-
-        # https://github.com/databricks/databricks-cli/blob/master/databricks_cli/workspace/api.py#L39
-        if not directory.is_dir:
-            logger.error(f"path {folder} is not a directory")
-        else:
-            logger.info(
-                dir_perm.replace_permissions(directory.object_id, acl_list)
-            )
+    engine.deploy("WORKSPACE", workspace_config, journal=journal, shard=shard)
 
 
-def main(config, token=None, host=None, cmdline_args=None):
+def main(config, token=None, host=None, cmdline_args=None, profiler=None):
     """main function for end to end Databricks workspace ACL configuraiton
 
     :param config: ACL configuration
@@ -315,7 +446,10 @@ def main(config, token=None, host=None, cmdline_args=None):
     :type host: str
     :param cmdline_args: command line arguments
     :type cmdline_args: argparse
+    :param profiler: optional profiler timing each phase
+    :type profiler: profiling.Profiler
     """
+    profiler = profiler or Profiler()
     remove_unmanaged = False
     if cmdline_args.remove:
         remove_unmanaged = True
@@ -323,40 +457,97 @@ def main(config, token=None, host=None, cmdline_args=None):
     logger.debug(config)
     kwargs = {"token": token,
               "host": host}
-
-    # https://github.com/databricks/databricks-cli/blob/master/databricks_cli/sdk/api_client.py#L65
-    api_client = ApiClient(**kwargs)
+    # every client of the run shares one connection pool and rate limit
+    configure_transport(host, rate=cmdline_args.max_requests_per_second,
+                        pool_size=max(32, cmdline_args.max_workers),
+                        max_concurrency=cmdline_args.max_concurrency)
+
+    # journal of completed units, --resume skips them
+    journal = RunJournal(run_id=cmdline_args.resume,
+                         directory=cmdline_args.journal_dir or DEFAULT_JOURNAL_DIR,
+                         resume=bool(cmdline_args.resume))
+    shard = Shard.from_arg(cmdline_args.shard)
+    if shard.count > 1:
+        logger.info(f"deploying shard {shard}"
+                    f"{' (coordinator)' if shard.is_coordinator else ''}")
+
+    # unmanaged groups, scope ACL entries and folders are only planned during the deploy.
+    # they are deleted concurrently at the end once the guard passed for all of them
+    cleanup = CleanupExecutor(guard=CleanupGuard(cmdline_args.max_deletions,
+                                                 cmdline_args.max_delete_percentage),
+                              max_workers=cmdline_args.max_workers, defer=True)
+
+    # inventory cache of principals and object ids between runs
+    cache = None
+    if cmdline_args.cache or cmdline_args.refresh_cache:
+        cache = InventoryCache(host,
+                               path=cmdline_args.cache_path or DEFAULT_CACHE_PATH)
+        with profiler.phase("inventory_cache"):
+            cache.refresh(SCIM(**kwargs), full=cmdline_args.refresh_cache)
+
+    listings = Listings(**kwargs)
     if not cmdline_args.skip_groups:
-        # https://github.com/databricks/databricks-cli/blob/master/databricks_cli/groups/api.py#L27
-        groups_client = GroupsApi(api_client)
-        scim = SCIM(**kwargs)
-        deploy_groups(groups_client, scim,
-                      config["GROUPS"], remove_unmanaged=remove_unmanaged)
-
-    # https://github.com/databricks/databricks-cli/blob/master/databricks_cli/secrets/api.py#L27
-    secret_client = SecretApi(api_client)
-    if config.get("SECRETS"):
-        deploy_secret_acl(secret_client, config["SECRETS"])
-    else:
-        deploy_secret_acl(secret_client, None)
-
-    # https://github.com/databricks/databricks-cli/blob/master/databricks_cli/clusters/api.py
-    cluster_client = ClusterApi(api_client)
-    cluster_perm = ClusterPermissions(**kwargs)
-    if config.get("CLUSTERS"):
-        deploy_cluster_acl(cluster_client, cluster_perm, config["CLUSTERS"])
-
-    # https://github.com/databricks/databricks-cli/blob/master/databricks_cli/workspace/api.py#L86
-    # prepend all paths with /
-    workspace_client = WorkspaceApi(api_client)
-    dir_perm = DirectoryPermissions(**kwargs)
-    deploy_workspace_acl(workspace_client, dir_perm, config["WORKSPACE"])
-
-
-if __name__ == "__main__":
+        groups_client = Groups(**kwargs)
+        scim = SCIM(cache=cache, **kwargs)
+        with profiler.phase("deploy_groups"):
+            deploy_groups(groups_client, scim,
+                          config["GROUPS"], remove_unmanaged=remove_unmanaged,
+                          journal=journal, shard=shard, listings=listings,
+                          cleanup=cleanup)
+
+    secret_client = Secrets(**kwargs)
+    with profiler.phase("deploy_secret_acl"):
+        if config.get("SECRETS"):
+            deploy_secret_acl(secret_client, config["SECRETS"], cache=cache,
+                              journal=journal, shard=shard, listings=listings,
+                              cleanup=cleanup)
+        else:
+            deploy_secret_acl(secret_client, None, shard=shard, listings=listings,
+                              cleanup=cleanup)
+
+    # cluster, folder, notebook, job, instance pool, cluster policy and token ACLs
+    # share one pipeline: bulk id resolution, concurrent fetch, diff, apply changes
+    engine = PermissionsEngine(max_workers=cmdline_args.max_workers,
+                               retries=cmdline_args.retries,
+                               cache=cache, **kwargs)
+    for section in OBJECT_TYPES:
+        if section == "WORKSPACE":
+            # prepend all paths with /
+            workspace_client = Workspace(**kwargs)
+            with profiler.phase("deploy_workspace_acl"):
+                deploy_workspace_acl(workspace_client, engine, config["WORKSPACE"],
+                                     cache=cache, journal=journal, shard=shard,
+                                     listings=listings, cleanup=cleanup)
+        elif config.get(section):
+            with profiler.phase(f"permissions.{section}"):
+                engine.deploy(section, config[section], journal=journal, shard=shard)
+
+    with profiler.phase("cleanup"):
+        cleanup.execute()
+
+    if cache:
+        cache.close()
+
+    logger.info(f"request cache: {get_request_cache(host).stats()}")
+    logger.info(f"concurrency limits: {get_transport(host).concurrency.summary()}")
+    concurrency = get_transport(host).concurrency.stats()
+    if cleanup.results:
+        logger.info(f"cleanup: {cleanup.summary()}")
+
+    report_path = cmdline_args.report or (
+        f"report-acl-shard-{shard.index}-of-{shard.count}.json" if shard.count > 1 else None)
+    if report_path:
+        write_report(shard_report(shard, journal, concurrency), report_path)
+
+
+def run(args):
+    """render ACL configuration and deploy it
+
+    :param args: command line arguments of parse_cmdline(cmd_type="ACL")
+    :type args: argparse.Namespace
+    """
     start = timer()
 
-    args = parse_cmdline(cmd_type="ACL")
     if args.debug:
         logging.getLogger(LOGGER_NAME).setLevel(logging.DEBUG)
 
@@ -367,17 +558,24 @@ if __name__ == "__main__":
         # "adf_delphi_appid": args.adf_delphi_appid,
     # }
 
-    acl_config = render_yaml(
-        f"{dir_path}\\configuration\\{args.acl_file}",
-        # mako_kwargs
-    )
+    with Recorder(args.capture), Profiler(args.profile, mode=args.profile_mode) as profiler:
+        with profiler.phase("render"):
+            acl_config = render_yaml(
+                config_path(args.acl_file),
+                # mako_kwargs
+            )
 
-    main(acl_config,
-         token=args.personal_access_token,
-         host=args.workspace_url,
-         cmdline_args=args)
+        main(acl_config,
+             token=register_args(args),
+             host=args.workspace_url,
+             cmdline_args=args,
+             profiler=profiler)
 
     end = timer()
     runtime = str(datetime.timedelta(seconds=end-start))
     # Time in day:hour:minute.second, e.g. 0:02:51.598863
     logger.info(f"EXECUTION TIME = {runtime}")
+
+
+if __name__ == "__main__":
+    run(parse_cmdline(cmd_type="ACL"))
@@ -1,19 +1,37 @@
+import base64
+
 from databricks_api.base import APIBase, PermissionsBase
-from databricks_api.utils import logger
+from databricks_api.cache import USER, GROUP
+from databricks_api.utils import fan_out, logger
 # , trycatch
 
 
+def is_not_found(err):
+    """True for a ValueError of APIBase carrying a 404 SCIM or API error response
+    """
+    response = err.args[0] if err.args else None
+    if not isinstance(response, dict):
+        return False
+    return (str(response.get("status")) == "404"
+            or response.get("error_code") in ["RESOURCE_DOES_NOT_EXIST", "NOT_FOUND"])
+
+
 class SCIM(APIBase):
     """https://docs.microsoft.com/en-us/azure/databricks/dev-tools/api/latest/scim/#resource-url
     """
 
-    def __init__(self, **kwargs):
+    def __init__(self, cache=None, **kwargs):
+        """
+        :param cache: optional inventory cache answering name -> id lookups
+        :type cache: cache.InventoryCache
+        """
         logger.info("""
 ++++++++++++++++++++++++++++++++++++++++
 SCIM API
 ++++++++++++++++++++++++++++++++++++++++
         """)
         super().__init__(**kwargs)
+        self.cache = cache
         self.headers["Content-Type"] = "application/scim+json"
         self.headers["Accept"] = 'application/scim+json'
 
@@ -33,6 +51,154 @@ SCIM API
         self.user_schema = {
             "schemas": ["urn:ietf:params:scim:schemas:core:2.0:User"]
         }
+        self.bulk_schema = {
+            "schemas": ["urn:ietf:params:scim:api:messages:2.0:BulkRequest"]
+        }
+
+    def iter_resources(self, url, scim_filter=None, attributes=None, count=100):
+        """generator over a paginated SCIM listing
+
+        :param url: SCIM resource url, e.g. self.users_url
+        :type url: str
+        :param scim_filter: SCIM filter expression, e.g. 'userName co @domain.ca'
+        :type scim_filter: str
+        :param attributes: comma separated attributes to return
+        :type attributes: str
+        :param count: page size
+        :type count: int
+        """
+        start_index = 1
+        while True:
+            params = {"startIndex": start_index, "count": count}
+            if scim_filter:
+                params["filter"] = scim_filter
+            if attributes:
+                params["attributes"] = attributes
+
+            # pages are decoded while they are read, not memoized
+            page = self.stream(url, "Resources", params=params)
+            returned = 0
+            for resource in page:
+                returned += 1
+                yield resource
+
+            start_index += returned
+            if not returned or start_index > page.meta.get("totalResults", 0):
+                return
+
+    def list_resources(self, url, attributes=None, count=100, max_workers=8):
+        """all resources of a SCIM listing. once the first page gives
+        totalResults, the other pages are read concurrently
+
+        :param attributes: comma separated attributes to return
+        :type attributes: str
+        :return: resources in listing order
+        :type return: list(dict)
+        """
+        def page(start_index):
+            params = {"startIndex": start_index, "count": count}
+            if attributes:
+                params["attributes"] = attributes
+            resources = self.stream(url, "Resources", params=params)
+            return list(resources), resources.meta
+
+        first, meta = page(1)
+        # the server may cap the page size below count
+        size = len(first) or count
+        pages = {1: first}
+        for start_index, result, err in fan_out(
+                lambda i: page(i)[0], range(1 + size, meta.get("totalResults", 0) + 1, size),
+                max_workers=max_workers):
+            if err:
+                raise err
+            pages[start_index] = result
+        return [r for i in sorted(pages) for r in pages[i]]
+
+    def resolve_ids(self, url, attribute, values, batch_size=50):
+        """resolve SCIM ids for many values with one OR filter per batch
+
+        :param url: SCIM resource url, e.g. self.users_url
+        :type url: str
+        :param attribute: unique attribute to match, e.g. userName or applicationId
+        :type attribute: str
+        :param values: values to resolve
+        :type values: iterable(str)
+        :param batch_size: values per lookup request
+        :type batch_size: int
+
+        :return: (value, id) tuples. values that do not exist are not returned
+        :type return: generator
+        """
+        batch = []
+        for value in values:
+            batch.append(value)
+            if len(batch) == batch_size:
+                yield from self._resolve_batch(url, attribute, batch)
+                batch = []
+        if batch:
+            yield from self._resolve_batch(url, attribute, batch)
+
+    def _resolve_batch(self, url, attribute, batch):
+        scim_filter = " or ".join(f'{attribute} eq "{v}"' for v in batch)
+        for resource in self.iter_resources(url, scim_filter=scim_filter,
+                                            attributes=f"id,{attribute}",
+                                            count=len(batch)):
+            yield resource[attribute], resource["id"]
+
+    def bulk(self, operations, fail_on_errors=None):
+        """send operations in a single SCIM /Bulk request
+
+        :param operations: bulk operations, e.g.
+            [{"method": "DELETE", "path": "/Users/123", "bulkId": "123"}]
+        :type operations: list(dict)
+        :param fail_on_errors: number of errors after which the server stops
+        :type fail_on_errors: int
+        """
+        body = {"Operations": operations, **self.bulk_schema}
+        if fail_on_errors is not None:
+            body["failOnErrors"] = fail_on_errors
+
+        return self.request(f"{self.scim_url}/Bulk", body, request_type="post")
+
+    def _retry_stale(self, call, kind, names):
+        """call(use_cache). the inventory cache only drops deleted principals on
+        its next full refresh, so a 404 with ids from the cache drops the ids
+        of names and repeats the call with fresh lookups
+        """
+        try:
+            return call(bool(self.cache))
+        except ValueError as err:
+            if not self.cache or not is_not_found(err):
+                raise
+            logger.debug(f"{repr(err)}, dropping cached {kind} ids of {names}")
+            for name in names:
+                self.cache.remove_principal(kind, name)
+            return call(False)
+
+    def patch_group_members(self, group_id, add=(), remove=()):
+        """add and remove members of a group with one PATCH request
+
+        :param group_id: SCIM id of the group
+        :type group_id: str
+        :param add: SCIM ids of members to add
+        :type add: list(str)
+        :param remove: SCIM ids of members to remove
+        :type remove: list(str)
+        """
+        operations = []
+        if add:
+            operations.append({"op": "add",
+                               "path": "members",
+                               "value": [{"value": i} for i in add]})
+        for i in remove:
+            operations.append({"op": "remove",
+                               "path": f"members[value eq \"{i}\"]"})
+        if not operations:
+            return None
+
+        return self.request(f"{self.groups_url}/{group_id}",
+                            {"Operations": operations, **self.patchop_schema},
+                            request_type="patch")
 
     def get_sp(self, app_id=None):
         if app_id:
@@ -50,25 +216,34 @@ SCIM API
 
         return [{"value": val} for val in group_values]
 
-    def get_groups(self, groups):
+    def get_groups(self, groups, use_cache=True):
         group_values = []
         for group in groups:
-            r = self.request(f"{self.groups_url}?filter=displayName+eq+{group}",
-                             request_type="get")
-            group_values.append(r["Resources"][0]["id"])
+            group_id = self.cache.get_id(GROUP, group) if self.cache and use_cache else None
+            if not group_id:
+                r = self.request(f"{self.groups_url}?filter=displayName+eq+{group}",
+                                 request_type="get")
+                group_id = r["Resources"][0]["id"]
+                if self.cache:
+                    self.cache.put_principal(GROUP, group, group_id)
+
+            group_values.append(group_id)
 
         return group_values
 
     # @trycatch
     def add_sp(self, app_id, display_name, groups):
-        body = {"applicationId": app_id,
-                "displayName": display_name,
-                "groups": self.parse_group_vals(
-                    self.get_groups(groups)
-                ),
-                **self.sp_schema
-                }
-        r = self.request(self.sp_url, body, request_type="post")
+        def add(use_cache):
+            body = {"applicationId": app_id,
+                    "displayName": display_name,
+                    "groups": self.parse_group_vals(
+                        self.get_groups(groups, use_cache)
+                    ),
+                    **self.sp_schema
+                    }
+            return self.request(self.sp_url, body, request_type="post")
+
+        r = self._retry_stale(add, GROUP, groups)
         logger.info(f"ADDED spn {app_id} to groups {groups}")
         return r
 
@@ -94,12 +269,14 @@ SCIM API
             **self.patchop_schema
         }
 
-        if groups:
-            sp_groups = self.get_groups(groups)
+        def remove(use_cache):
+            group_ids = self.get_groups(groups, use_cache) if groups else sp_groups
+            for group in group_ids:
+                logger.debug(self.request(f"{self.groups_url}/{group}",
+                                          body, request_type="patch"))
+            return group_ids
 
-        for group in sp_groups:
-            logger.debug(self.request(f"{self.groups_url}/{group}",
-                                      body, request_type="patch"))
+        sp_groups = self._retry_stale(remove, GROUP, groups or [])
 
         logger.warning(f"Removed GROUPS {sp_groups} from SP {sp_id}")
         return
@@ -115,22 +292,24 @@ SCIM API
             self.remove_sp_group(sp_id=sp_id, sp_groups=sp_groups)
 
         # if sp_groups:
-        body = {"Operations": [
-            {
-                "op": "add",
-                "path": "groups",
-                "value": self.parse_group_vals(
-                    self.get_groups(groups)
-                ),
-            },
-        ],
-            ** self.patchop_schema
-        }
+        def add(use_cache):
+            body = {"Operations": [
+                {
+                    "op": "add",
+                    "path": "groups",
+                    "value": self.parse_group_vals(
+                        self.get_groups(groups, use_cache)
+                    ),
+                },
+            ],
+                ** self.patchop_schema
+            }
+            return self.request(f"{self.sp_url}/{sp_id}",
+                                body,
+                                request_type="patch")
 
         try:
-            r = self.request(f"{self.sp_url}/{sp_id}",
-                             body,
-                             request_type="patch")
+            r = self._retry_stale(add, GROUP, groups)
             logger.info(f"UPDATED SP {app_id} to groups {sp_groups}")
 
             return r
@@ -147,20 +326,37 @@ SCIM API
         return r
 
     def add_user(self, user_name, display_name, groups):
-        body = {"userName": user_name,
-                "displayName": display_name,
-                "groups": self.parse_group_vals(
-                    self.get_groups(groups)
-                ),
-                **self.user_schema
-                }
-        r = self.request(self.users_url, body, request_type="post")
+        def add(use_cache):
+            body = {"userName": user_name,
+                    "displayName": display_name,
+                    "groups": self.parse_group_vals(
+                        self.get_groups(groups, use_cache)
+                    ),
+                    **self.user_schema
+                    }
+            return self.request(self.users_url, body, request_type="post")
+
+        r = self._retry_stale(add, GROUP, groups)
         logger.info(f"ADDED user {user_name} to groups {groups}")
+        if self.cache and isinstance(r, dict) and r.get("id"):
+            self.cache.put_principal(USER, user_name, r["id"])
         return r
 
-    def get_user(self, user_name):
-        return self.request(f"{self.users_url}?filter=userName+eq+{user_name}",
+    def get_user(self, user_name, use_cache=True):
+        """get SCIM user. on inventory cache hit only id and userName are returned,
+        use_cache=False always returns the full user
+        """
+        if self.cache and use_cache:
+            userid = self.cache.get_id(USER, user_name)
+            if userid:
+                return {"id": userid, "userName": user_name}
+
+        user = self.request(f"{self.users_url}?filter=userName+eq+{user_name}",
                             request_type="get")["Resources"][0]
+        if self.cache:
+            self.cache.put_principal(USER, user_name, user["id"],
+                                     user.get("meta", {}).get("lastModified"))
+        return user
         # user = r["Resources"][0]
         # userid = user["id"]
         # groups = user.get("groups")
@@ -177,7 +373,12 @@ SCIM API
         return users
 
     def update_user(self, user_name, display_name):
-        scim_user = self.get_user(user_name)
+        return self._retry_stale(
+            lambda use_cache: self._update_user(user_name, display_name, use_cache),
+            USER, [user_name])
+
+    def _update_user(self, user_name, display_name, use_cache):
+        scim_user = self.get_user(user_name, use_cache)
         userid = scim_user.pop("id")
         id_url = f"{self.users_url}/{userid}"
 
@@ -205,12 +406,17 @@ SCIM API
         return r
 
     def delete_user(self, user_name, userid=None):
-        if not userid:
-            scim_user = self.get_user(user_name)
-            userid = scim_user["id"]
+        def delete(use_cache):
+            user_id = userid or self.get_user(user_name, use_cache)["id"]
+            return self.request(f"{self.users_url}/{user_id}",
+                                request_type="delete")
 
-        r = self.request(f"{self.users_url}/{userid}",
-                         request_type="delete")
+        if userid:
+            r = delete(False)
+        else:
+            r = self._retry_stale(delete, USER, [user_name])
+        if self.cache and user_name:
+            self.cache.remove_principal(USER, user_name)
         return r
 
 
@@ -255,3 +461,456 @@ DIRECTORY PERMISSONS
         self.object_url = f"{self.permissions_url}/directories"
         self.allowed_permissions = ["CAN_READ",
                                     "CAN_RUN", "CAN_EDIT", "CAN_MANAGE"]
+
+
+class Listings(APIBase):
+    """workspace listings streamed item by item, see APIBase.stream.
+    for inventories of large workspaces instead of the fully materialized
+    databricks_cli list calls
+    """
+
+    def iter_clusters(self):
+        """clusters/list items
+        """
+        return self.stream(f"{self.api_url}/clusters/list", "clusters")
+
+    def iter_objects(self, path):
+        """workspace/list items of a folder, dicts with path and object_type
+        """
+        return self.stream(f"{self.api_url}/workspace/list", "objects",
+                           params={"path": path})
+
+    def iter_scopes(self):
+        """secrets/scopes/list items
+        """
+        return self.stream(f"{self.api_url}/secrets/scopes/list", "scopes")
+
+    def iter_group_names(self):
+        """groups/list group names
+        """
+        return self.stream(f"{self.api_url}/groups/list", "group_names")
+
+
+class Dbfs(APIBase):
+    """https://docs.databricks.com/dev-tools/api/latest/dbfs.html
+    paths are absolute DBFS paths without the dbfs: scheme
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.dbfs_url = f"{self.api_url}/dbfs"
+
+    def get_status(self, path):
+        """file info of path. raises ValueError if it doesn't exist
+        """
+        return self.request(f"{self.dbfs_url}/get-status", params={"path": path},
+                            request_type="get", memoize=False)
+
+    def create(self, path, overwrite=False):
+        """open a streaming upload
+
+        :return: handle for add_block and close
+        :type return: int
+        """
+        return self.request(f"{self.dbfs_url}/create",
+                            body={"path": path, "overwrite": overwrite},
+                            request_type="post")["handle"]
+
+    def add_block(self, handle, data):
+        """append a block of at most 1 MB
+
+        :param data: block content
+        :type data: bytes
+        """
+        self.request(f"{self.dbfs_url}/add-block",
+                     body={"handle": handle, "data": base64.b64encode(data).decode("ascii")},
+                     request_type="post")
+
+    def close(self, handle):
+        self.request(f"{self.dbfs_url}/close", body={"handle": handle},
+                     request_type="post")
+
+
+class Groups(APIBase):
+    """https://docs.databricks.com/dev-tools/api/latest/groups.html
+    same methods as databricks_cli.groups.api.GroupsApi
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.groups_url = f"{self.api_url}/groups"
+
+    def create(self, group_name):
+        return self.request(f"{self.groups_url}/create", {"group_name": group_name},
+                            request_type="post")
+
+    @staticmethod
+    def _member(parent_name, user_name, group_name):
+        body = {"parent_name": parent_name}
+        if user_name is not None:
+            body["user_name"] = user_name
+        if group_name is not None:
+            body["group_name"] = group_name
+        return body
+
+    def add_member(self, parent_name, user_name, group_name):
+        """add a user (user_name) or a group (group_name) to parent_name
+        """
+        return self.request(f"{self.groups_url}/add-member",
+                            self._member(parent_name, user_name, group_name),
+                            request_type="post")
+
+    def remove_member(self, parent_name, user_name, group_name):
+        return self.request(f"{self.groups_url}/remove-member",
+                            self._member(parent_name, user_name, group_name),
+                            request_type="post")
+
+    def list_members(self, group_name):
+        return self.request(f"{self.groups_url}/list-members",
+                            params={"group_name": group_name}, request_type="get")
+
+    def list_all(self):
+        return self.request(f"{self.groups_url}/list", request_type="get")
+
+    def list_parents(self, user_name, group_name):
+        params = {"user_name": user_name} if user_name is not None else {"group_name": group_name}
+        return self.request(f"{self.groups_url}/list-parents", params=params,
+                            request_type="get")
+
+    def delete(self, group_name):
+        return self.request(f"{self.groups_url}/delete", {"group_name": group_name},
+                            request_type="post")
+
+
+class Secrets(APIBase):
+    """https://docs.databricks.com/dev-tools/api/latest/secrets.html
+    same methods as databricks_cli.secrets.api.SecretApi
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.secrets_url = f"{self.api_url}/secrets"
+
+    def create_scope(self, scope, initial_manage_principal, scope_backend_type,
+                     backend_azure_keyvault):
+        body = {"scope": scope}
+        if initial_manage_principal is not None:
+            body["initial_manage_principal"] = initial_manage_principal
+        if scope_backend_type is not None:
+            body["scope_backend_type"] = scope_backend_type
+        if backend_azure_keyvault is not None:
+            body["backend_azure_keyvault"] = backend_azure_keyvault
+        return self.request(f"{self.secrets_url}/scopes/create", body, request_type="post")
+
+    def delete_scope(self, scope):
+        return self.request(f"{self.secrets_url}/scopes/delete", {"scope": scope},
+                            request_type="post")
+
+    def list_scopes(self):
+        return self.request(f"{self.secrets_url}/scopes/list", request_type="get")
+
+    def put_acl(self, scope, principal, permission):
+        return self.request(f"{self.secrets_url}/acls/put",
+                            {"scope": scope, "principal": principal, "permission": permission},
+                            request_type="post")
+
+    def delete_acl(self, scope, principal):
+        return self.request(f"{self.secrets_url}/acls/delete",
+                            {"scope": scope, "principal": principal},
+                            request_type="post")
+
+    def list_acls(self, scope):
+        return self.request(f"{self.secrets_url}/acls/list", params={"scope": scope},
+                            request_type="get")
+
+    def get_acl(self, scope, principal):
+        return self.request(f"{self.secrets_url}/acls/get",
+                            params={"scope": scope, "principal": principal},
+                            request_type="get")
+
+
+class Clusters(APIBase):
+    """https://docs.databricks.com/dev-tools/api/latest/clusters.html
+    same methods as databricks_cli.clusters.api.ClusterApi.
+    cluster states change on their own, so get_cluster is never memoized
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.clusters_url = f"{self.api_url}/clusters"
+
+    def create_cluster(self, json):
+        return self.request(f"{self.clusters_url}/create", json, request_type="post")
+
+    def edit_cluster(self, json):
+        return self.request(f"{self.clusters_url}/edit", json, request_type="post")
+
+    def start_cluster(self, cluster_id):
+        return self.request(f"{self.clusters_url}/start", {"cluster_id": cluster_id},
+                            request_type="post")
+
+    def restart_cluster(self, cluster_id):
+        return self.request(f"{self.clusters_url}/restart", {"cluster_id": cluster_id},
+                            request_type="post")
+
+    def delete_cluster(self, cluster_id):
+        """terminate a cluster, its configuration is kept
+        """
+        return self.request(f"{self.clusters_url}/delete", {"cluster_id": cluster_id},
+                            request_type="post")
+
+    def permanent_delete(self, cluster_id):
+        return self.request(f"{self.clusters_url}/permanent-delete", {"cluster_id": cluster_id},
+                            request_type="post")
+
+    def get_cluster(self, cluster_id):
+        return self.request(f"{self.clusters_url}/get", params={"cluster_id": cluster_id},
+                            request_type="get", memoize=False)
+
+    def list_clusters(self):
+        return self.request(f"{self.clusters_url}/list", request_type="get")
+
+    def list_node_types(self):
+        return self.request(f"{self.clusters_url}/list-node-types", request_type="get")
+
+    def get_events(self, cluster_id, start_time=None, end_time=None, order=None,
+                   event_types=None, offset=None, limit=None):
+        """one page of cluster events, next_page is the body of the next page
+        """
+        body = {"cluster_id": cluster_id}
+        for key, value in [("start_time", start_time), ("end_time", end_time), ("order", order),
+                           ("event_types", event_types), ("offset", offset), ("limit", limit)]:
+            if value is not None:
+                body[key] = value
+        # a read sent as POST, it doesn't invalidate memoized GETs
+        return self._send(f"{self.clusters_url}/events", body, request_type="post")
+
+    def iter_events(self, cluster_id, start_time=None, event_types=None, limit=500):
+        """events of a cluster oldest first, following next_page
+
+        :param start_time: epoch milliseconds of the oldest event
+        :type start_time: int
+        :param event_types: only these event types, e.g. ["RUNNING"]
+        :type event_types: list(str)
+        """
+        body = {"cluster_id": cluster_id, "order": "ASC", "limit": limit}
+        if start_time is not None:
+            body["start_time"] = start_time
+        if event_types:
+            body["event_types"] = event_types
+        while body:
+            page = self._send(f"{self.clusters_url}/events", body, request_type="post")
+            yield from page.get("events") or []
+            body = page.get("next_page")
+
+    def get_cluster_ids_by_name(self, cluster_name):
+        """ids of the clusters named cluster_name
+        """
+        return [c["cluster_id"] for c in self.list_clusters().get("clusters", [])
+                if c.get("cluster_name") == cluster_name]
+
+    def get_cluster_by_name(self, cluster_name):
+        """raises ValueError unless exactly one cluster has the name
+        """
+        cluster_ids = self.get_cluster_ids_by_name(cluster_name)
+        if len(cluster_ids) != 1:
+            raise ValueError(f"{len(cluster_ids)} clusters named {cluster_name}")
+        return self.get_cluster(cluster_ids[0])
+
+
+class Libraries(APIBase):
+    """https://docs.databricks.com/dev-tools/api/latest/libraries.html
+    same methods as databricks_cli.libraries.api.LibrariesApi.
+    statuses change while libraries install, so they are never memoized
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.libraries_url = f"{self.api_url}/libraries"
+
+    def all_cluster_statuses(self):
+        return self.request(f"{self.libraries_url}/all-cluster-statuses",
+                            request_type="get", memoize=False)
+
+    def cluster_status(self, cluster_id):
+        return self.request(f"{self.libraries_url}/cluster-status",
+                            params={"cluster_id": cluster_id},
+                            request_type="get", memoize=False)
+
+    def install_libraries(self, cluster_id, libraries):
+        return self.request(f"{self.libraries_url}/install",
+                            {"cluster_id": cluster_id, "libraries": libraries},
+                            request_type="post")
+
+    def uninstall_libraries(self, cluster_id, libraries):
+        return self.request(f"{self.libraries_url}/uninstall",
+                            {"cluster_id": cluster_id, "libraries": libraries},
+                            request_type="post")
+
+
+class Workspace(APIBase):
+    """https://docs.databricks.com/dev-tools/api/latest/workspace.html
+    same methods as databricks_cli.workspace.api.WorkspaceApi, except that
+    objects are returned as the API dicts with path and object_type
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.workspace_url = f"{self.api_url}/workspace"
+
+    def get_status(self, workspace_path):
+        return self.request(f"{self.workspace_url}/get-status",
+                            params={"path": workspace_path}, request_type="get")
+
+    def list_objects(self, workspace_path):
+        r = self.request(f"{self.workspace_url}/list", params={"path": workspace_path},
+                         request_type="get")
+        return r.get("objects", []) if isinstance(r, dict) else []
+
+    def mkdirs(self, workspace_path):
+        return self.request(f"{self.workspace_url}/mkdirs", {"path": workspace_path},
+                            request_type="post")
+
+    def delete(self, workspace_path, is_recursive):
+        return self.request(f"{self.workspace_url}/delete",
+                            {"path": workspace_path, "recursive": is_recursive},
+                            request_type="post")
+
+
+class InstancePools(APIBase):
+    """https://docs.databricks.com/dev-tools/api/latest/instance-pools.html
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.pools_url = f"{self.api_url}/instance-pools"
+
+    def list_instance_pools(self):
+        r = self.request(f"{self.pools_url}/list", request_type="get")
+        return r.get("instance_pools", []) if isinstance(r, dict) else []
+
+    def get_instance_pool(self, instance_pool_id):
+        return self.request(f"{self.pools_url}/get",
+                            params={"instance_pool_id": instance_pool_id},
+                            request_type="get")
+
+    def get_instance_pool_by_name(self, instance_pool_name):
+        """returns None if no pool has the name
+        """
+        for pool in self.list_instance_pools():
+            if pool["instance_pool_name"] == instance_pool_name:
+                return pool
+
+    def create_instance_pool(self, pool_specs):
+        return self.request(f"{self.pools_url}/create", pool_specs,
+                            request_type="post")
+
+    def edit_instance_pool(self, pool_specs):
+        """pool_specs must contain instance_pool_id. node_type_id cannot change
+        """
+        return self.request(f"{self.pools_url}/edit", pool_specs,
+                            request_type="post")
+
+
+class InstancePoolPermissions(PermissionsBase):
+    """https://docs.databricks.com/dev-tools/api/latest/permissions.html#tag/Instance-Pool-permissions
+    There are three permission levels for an instance pool:
+    No Permissions
+    Can Attach To (CAN_ATTACH_TO)
+    Can Manage (CAN_MANAGE)
+    """
+
+    def __init__(self, **kwargs):
+        logger.info("""
+++++++++++++++++++++++++++++++++++++++++
+INSTANCE POOL PERMISSONS
+++++++++++++++++++++++++++++++++++++++++
+        """)
+        super().__init__(**kwargs)
+        self.object_url = f"{self.permissions_url}/instance-pools"
+        self.allowed_permissions = ["CAN_ATTACH_TO", "CAN_MANAGE"]
+
+
+class NotebookPermissions(PermissionsBase):
+    """https://docs.databricks.com/dev-tools/api/latest/permissions.html#tag/Notebook-permissions
+    There are five permission levels for a notebook:
+    No Permissions
+    Can Read (CAN_READ)
+    Can Run (CAN_RUN)
+    Can Edit (CAN_EDIT)
+    Can Manage (CAN_MANAGE)
+    """
+
+    def __init__(self, **kwargs):
+        logger.info("""
+++++++++++++++++++++++++++++++++++++++++
+NOTEBOOK PERMISSONS
+++++++++++++++++++++++++++++++++++++++++
+        """)
+        super().__init__(**kwargs)
+        self.object_url = f"{self.permissions_url}/notebooks"
+        self.allowed_permissions = ["CAN_READ",
+                                    "CAN_RUN", "CAN_EDIT", "CAN_MANAGE"]
+
+
+class JobPermissions(PermissionsBase):
+    """https://docs.databricks.com/dev-tools/api/latest/permissions.html#tag/Job-permissions
+    There are five permission levels for a job:
+    No Permissions
+    Can View (CAN_VIEW)
+    Can Manage Run (CAN_MANAGE_RUN)
+    Is Owner (IS_OWNER)
+    Can Manage (CAN_MANAGE)
+
+    a job has exactly one owner. the current owner is kept when the
+    configuration doesn't name one
+    """
+
+    def __init__(self, **kwargs):
+        logger.info("""
+++++++++++++++++++++++++++++++++++++++++
+JOB PERMISSONS
+++++++++++++++++++++++++++++++++++++++++
+        """)
+        super().__init__(**kwargs)
+        self.object_url = f"{self.permissions_url}/jobs"
+        self.allowed_permissions = ["CAN_VIEW", "CAN_MANAGE_RUN",
+                                    "IS_OWNER", "CAN_MANAGE"]
+        self.preserved_permissions = ["IS_OWNER"]
+
+
+class ClusterPolicyPermissions(PermissionsBase):
+    """https://docs.databricks.com/dev-tools/api/latest/permissions.html#tag/Cluster-policy-permissions
+    There are two permission levels for a cluster policy:
+    No Permissions
+    Can Use (CAN_USE)
+    """
+
+    def __init__(self, **kwargs):
+        logger.info("""
+++++++++++++++++++++++++++++++++++++++++
+CLUSTER POLICY PERMISSONS
+++++++++++++++++++++++++++++++++++++++++
+        """)
+        super().__init__(**kwargs)
+        self.object_url = f"{self.permissions_url}/cluster-policies"
+        self.allowed_permissions = ["CAN_USE"]
+
+
+class TokenPermissions(PermissionsBase):
+    """https://docs.databricks.com/dev-tools/api/latest/permissions.html#tag/Token-permissions
+    one workspace wide object, its object id is "tokens".
+    There are two permission levels for tokens:
+    No Permissions
+    Can Use (CAN_USE)
+    """
+
+    def __init__(self, **kwargs):
+        logger.info("""
+++++++++++++++++++++++++++++++++++++++++
+TOKEN PERMISSONS
+++++++++++++++++++++++++++++++++++++++++
+        """)
+        super().__init__(**kwargs)
+        self.object_url = f"{self.permissions_url}/authorization"
+        self.allowed_permissions = ["CAN_USE"]
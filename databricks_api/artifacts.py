@@ -0,0 +1,123 @@
+"""content-addressed staging of local cluster library artifacts to DBFS.
+whl, jar and egg entries of clusterlib.yaml may name local files. each file is
+uploaded once to dbfs:/FileStore/artifacts/<sha256>/<file name>, uploads whose
+content already exists are skipped, and the entries are rewritten to the
+staged paths, which never change for the same content.
+"""
+import copy
+import hashlib
+import os
+import re
+
+from databricks_api.utils import fan_out, logger
+
+ARTIFACT_ROOT = "/FileStore/artifacts"
+# library types that reference a file
+ARTIFACT_KEYS = ["whl", "jar", "egg"]
+# DBFS add-block limit
+BLOCK_SIZE = 1 << 20
+_REMOTE = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]*:/")
+
+
+def is_local(path):
+    """True for paths without a scheme such as dbfs:/, s3:/ or abfss:/
+    """
+    return isinstance(path, str) and not _REMOTE.match(path)
+
+
+def file_sha256(path, block_size=BLOCK_SIZE):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Artifact:
+    """a local file and its content-addressed DBFS path
+    """
+
+    def __init__(self, local_path):
+        self.local_path = local_path
+        self.size = os.path.getsize(local_path)
+        self.sha256 = file_sha256(local_path)
+        self.dbfs_path = f"{ARTIFACT_ROOT}/{self.sha256}/{os.path.basename(local_path)}"
+
+    @property
+    def uri(self):
+        return f"dbfs:{self.dbfs_path}"
+
+
+def _exists(dbfs, artifact):
+    try:
+        status = dbfs.get_status(artifact.dbfs_path)
+    except ValueError:
+        return False
+    # a size mismatch is an interrupted upload, it is uploaded again
+    return status.get("file_size") == artifact.size
+
+
+def upload(dbfs, artifact, block_size=None):
+    """stream a file to DBFS in blocks: create, add-block, close
+
+    :param dbfs: DBFS API
+    :type dbfs: api.Dbfs
+    :param artifact: artifact to upload
+    :type artifact: Artifact
+    """
+    block_size = block_size or BLOCK_SIZE
+    handle = dbfs.create(artifact.dbfs_path, overwrite=True)
+    try:
+        with open(artifact.local_path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                dbfs.add_block(handle, block)
+    finally:
+        dbfs.close(handle)
+
+
+def stage_libraries(dbfs, cluster_libraries, max_workers=4):
+    """upload the local artifacts of clusterlib.yaml and rewrite their entries
+
+    :param dbfs: DBFS API
+    :type dbfs: api.Dbfs
+    :param cluster_libraries: clusterlib.yaml
+    :type cluster_libraries: list(dict)
+    :param max_workers: concurrent uploads
+    :type max_workers: int
+
+    :return: copy of cluster_libraries with dbfs:/FileStore/artifacts paths
+    :type return: list(dict)
+    """
+    cluster_libraries = copy.deepcopy(cluster_libraries or [])
+    entries = [(lib, key) for lib in cluster_libraries for key in ARTIFACT_KEYS
+               if is_local(lib.get(key))]
+    if not entries:
+        return cluster_libraries
+
+    artifacts = {}
+    for lib, key in entries:
+        path = os.path.abspath(lib[key])
+        if path not in artifacts:
+            artifacts[path] = Artifact(path)
+
+    def stage(artifact):
+        if _exists(dbfs, artifact):
+            logger.info(f"artifact {artifact.local_path} already staged at {artifact.uri}")
+            return False
+        logger.info(f"uploading {artifact.local_path} ({artifact.size} bytes) to {artifact.uri}")
+        upload(dbfs, artifact)
+        return True
+
+    errors = []
+    uploaded = 0
+    for artifact, result, err in fan_out(stage, list(artifacts.values()), max_workers=max_workers):
+        if err:
+            errors.append(f"{artifact.local_path}: {repr(err)}")
+        uploaded += bool(result)
+    if errors:
+        raise ValueError(f"artifact upload failed: {errors}")
+    logger.info(f"{len(artifacts)} artifacts staged, {uploaded} uploaded")
+
+    for lib, key in entries:
+        lib[key] = artifacts[os.path.abspath(lib[key])].uri
+    return cluster_libraries
@@ -0,0 +1,211 @@
+"""credential providers shared by every APIBase of a workspace.
+tokens are cached per workspace and refreshed ahead of expiry by a single
+worker while the others keep using the current token. a 401 invalidates the
+token it was sent with and the request is retried once with a fresh one.
+"""
+import os
+import threading
+import time
+
+import requests
+
+from databricks_api.utils import logger
+
+# application id of the AzureDatabricks first party application
+AZURE_DATABRICKS_RESOURCE = "2ff814a6-3304-4ab8-85cb-cd0e6f879c1d"
+AAD_TOKEN_URL = "https://login.microsoftonline.com/{tenant_id}/oauth2/v2.0/token"
+
+
+class PatProvider:
+    """static Personal Access Token
+    """
+
+    def __init__(self, token):
+        self._token = token
+
+    def fetch(self):
+        """
+        :return: token and its expiry epoch, None if it does not expire
+        :type return: tuple(str, float)
+        """
+        return self._token, None
+
+
+class EnvFileProvider:
+    """token of an environment variable or a file, e.g. rotated by a sidecar.
+    re-read whenever the token is refreshed, e.g. after a 401
+    """
+
+    def __init__(self, env="DATABRICKS_TOKEN", path=None):
+        """
+        :param env: environment variable of the token
+        :type env: str
+        :param path: token file. takes precedence over env
+        :type path: str
+        """
+        self.env = env
+        self.path = path
+
+    def fetch(self):
+        if self.path:
+            with open(self.path) as f:
+                token = f.read().strip()
+        else:
+            token = os.environ.get(self.env)
+        if not token:
+            raise ValueError(f"no token in {self.path or '$' + self.env}")
+        return token, None
+
+
+class AadClientCredentialsProvider:
+    """AAD token of a service principal (client credentials grant)
+    """
+
+    def __init__(self, tenant_id, client_id, client_secret, resource=AZURE_DATABRICKS_RESOURCE):
+        self.tenant_id = tenant_id
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.resource = resource
+
+    def fetch(self):
+        r = requests.post(AAD_TOKEN_URL.format(tenant_id=self.tenant_id),
+                          data={"grant_type": "client_credentials",
+                                "client_id": self.client_id,
+                                "client_secret": self.client_secret,
+                                "scope": f"{self.resource}/.default"})
+        if r.status_code != 200:
+            raise ValueError(f"AAD token request of {self.client_id} failed: {r.status_code} {r.text}")
+        response = r.json()
+        return response["access_token"], time.time() + int(response["expires_in"])
+
+
+class TokenCache:
+    """cached token of a provider.
+    within refresh_margin seconds of expiry one caller refreshes the token
+    while the others keep using the current one. once expired, callers wait
+    on the one refresh in flight.
+    """
+
+    def __init__(self, provider, refresh_margin=300):
+        """
+        :param provider: object with fetch() returning (token, expiry epoch or None)
+        :type provider: PatProvider, EnvFileProvider or AadClientCredentialsProvider
+        :param refresh_margin: seconds before expiry the token is refreshed
+        :type refresh_margin: int
+        """
+        self.provider = provider
+        self.refresh_margin = refresh_margin
+        self.refreshes = 0
+        self._refresh_lock = threading.Lock()
+        # replaced as a whole so readers never see a token of one refresh
+        # with the expiry of another
+        self._state = (None, None)
+
+    def _valid(self, state, margin=0):
+        token, expires_at = state
+        return token is not None and (expires_at is None or time.time() < expires_at - margin)
+
+    def _refresh(self):
+        self._state = self.provider.fetch()
+        self.refreshes += 1
+        logger.debug(f"refreshed token of {type(self.provider).__name__}")
+
+    def token(self):
+        """current token, refreshed if it is close to expiry
+        """
+        state = self._state
+        if self._valid(state, self.refresh_margin):
+            return state[0]
+
+        if self._valid(state):
+            # ahead of expiry: refresh unless another worker already is
+            if self._refresh_lock.acquire(blocking=False):
+                try:
+                    if not self._valid(self._state, self.refresh_margin):
+                        self._refresh()
+                except Exception as err:
+                    logger.warning(f"token refresh failed, using the current token: {err}")
+                finally:
+                    self._refresh_lock.release()
+            return self._state[0]
+
+        with self._refresh_lock:
+            if not self._valid(self._state):
+                self._refresh()
+            return self._state[0]
+
+    def invalidate(self, token):
+        """drop token after a 401. a no-op if it was already refreshed,
+        so concurrent 401s of one token cause one refresh
+        """
+        with self._refresh_lock:
+            if self._state[0] == token:
+                self._state = (None, None)
+
+    def headers(self):
+        return {"Authorization": f"Bearer {self.token()}"}
+
+
+_credentials = {}
+_credentials_lock = threading.Lock()
+
+
+def set_credentials(host, credentials):
+    """credentials of the clients of host created without a token
+    """
+    with _credentials_lock:
+        _credentials[host] = credentials
+
+
+def get_credentials(host, token=None):
+    """credentials shared by every client of a workspace within this process
+
+    :param token: Personal Access Token. None uses the credentials set for host
+    :type token: str
+    :return: token cache
+    :type return: TokenCache
+    """
+    with _credentials_lock:
+        if token is not None:
+            return _credentials.setdefault((host, token), TokenCache(PatProvider(token)))
+        if host not in _credentials:
+            raise ValueError(f"no token or credentials for {host}")
+        return _credentials[host]
+
+
+def credentials_from_args(args):
+    """token cache of the --auth command line args
+
+    :param args: command line arguments with personal_access_token, auth,
+        token_file, tenant_id and client_id
+    :type args: argparse.Namespace
+    :return: token cache
+    :type return: TokenCache
+    """
+    if args.auth == "aad":
+        tenant_id = args.tenant_id or os.environ.get("AZURE_TENANT_ID")
+        client_id = args.client_id or os.environ.get("AZURE_CLIENT_ID")
+        client_secret = os.environ.get("AZURE_CLIENT_SECRET")
+        if not (tenant_id and client_id and client_secret):
+            raise ValueError("--auth aad needs --tenant_id, --client_id and $AZURE_CLIENT_SECRET")
+        return TokenCache(AadClientCredentialsProvider(tenant_id, client_id, client_secret))
+    if args.auth == "env":
+        return TokenCache(EnvFileProvider(path=args.token_file))
+    if not args.personal_access_token:
+        raise ValueError("--auth pat needs -pat")
+    return TokenCache(PatProvider(args.personal_access_token))
+
+
+def register_args(args):
+    """set the credentials of args.workspace_url from the command line
+
+    :return: token for clients of the workspace: the PAT with --auth pat,
+        otherwise None so clients use the registered credentials
+    :type return: str
+    """
+    if args.auth == "pat":
+        if not args.personal_access_token:
+            raise ValueError("--auth pat needs -pat")
+        return args.personal_access_token
+    set_credentials(args.workspace_url, credentials_from_args(args))
+    return None
@@ -1,24 +1,320 @@
+import threading
+import time
+from copy import deepcopy
+
 import requests
+from requests.adapters import HTTPAdapter
+from databricks_api.auth import get_credentials
+from databricks_api.concurrency import ConcurrencyController
+from databricks_api.jsonstream import ArrayStream
 from databricks_api.utils import logger
 
 
+class _Flight:
+    """an in-flight GET other callers wait on
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RequestCache:
+    """per run memo of GET responses.
+    concurrent identical GETs share one in-flight request (single-flight),
+    writes invalidate every memoized GET under a url prefix.
+    callers get deep copies, so mutating a response doesn't change the memo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results = {}
+        self._in_flight = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    def get_or_call(self, key, func):
+        """memoized func() result of key. key[0] must be the url
+
+        :param key: (url, ...) tuple
+        :type key: tuple
+        :param func: function doing the request
+        :type func: callable
+        """
+        with self._lock:
+            if key in self._results:
+                self.hits += 1
+                return deepcopy(self._results[key])
+
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._in_flight[key] = flight
+                generation = self._generation
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error:
+                raise flight.error
+            return deepcopy(flight.result)
+
+        try:
+            flight.result = func()
+        except Exception as err:
+            flight.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                # a write during the request may have changed the resource
+                if flight.error is None and generation == self._generation:
+                    self._results[key] = flight.result
+            flight.event.set()
+
+        return deepcopy(flight.result)
+
+    def invalidate(self, prefix):
+        """drop memoized GETs whose url starts with prefix
+        """
+        with self._lock:
+            self._generation += 1
+            for key in [k for k in self._results if k[0].startswith(prefix)]:
+                del self._results[key]
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._results.clear()
+
+    def stats(self):
+        """hit/miss statistics
+
+        :return: hits, misses, coalesced, invalidations and hit_ratio
+        :type return: dict
+        """
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "coalesced": self.coalesced,
+                    "invalidations": self.invalidations,
+                    "hit_ratio": round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0}
+
+
+_request_caches = {}
+_request_caches_lock = threading.Lock()
+
+
+def get_request_cache(host):
+    """request cache shared by every APIBase of a workspace within this process
+    """
+    with _request_caches_lock:
+        return _request_caches.setdefault(host, RequestCache())
+
+
+class RateLimiter:
+    """token bucket limiting the request rate to a workspace.
+    callers reserve a slot and sleep outside the lock until it is due,
+    so waiting callers are served in arrival order
+    """
+
+    def __init__(self, rate=None, burst=None):
+        """
+        :param rate: requests per second. None is unlimited
+        :type rate: float
+        :param burst: requests sent back to back before the rate applies.
+            Default is one second worth of requests
+        :type burst: int
+        """
+        self.rate = rate
+        self.burst = burst or max(1, int(rate or 1))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def acquire(self):
+        """wait for a request slot
+
+        :return: seconds waited
+        :type return: float
+        """
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited += wait
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class Transport:
+    """connection pool, rate limiter and adaptive concurrency limits shared by
+    every APIBase of a workspace. throttled requests (429) are retried after
+    Retry-After or an exponential backoff, and lower the concurrency limit of
+    their endpoint family, see concurrency.py
+    """
+
+    def __init__(self, rate=None, pool_size=32, max_concurrency=64, throttle_retries=6):
+        """
+        :param rate: requests per second. None is unlimited
+        :type rate: float
+        :param pool_size: kept-alive connections, should cover the concurrent workers
+        :type pool_size: int
+        :param max_concurrency: highest concurrency limit of an endpoint family
+        :type max_concurrency: int
+        :param throttle_retries: retries of a throttled request
+        :type throttle_retries: int
+        """
+        adapter = HTTPAdapter(pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.limiter = RateLimiter(rate)
+        self.concurrency = ConcurrencyController(initial=min(8, max_concurrency),
+                                                 max_limit=max_concurrency)
+        self.throttle_retries = throttle_retries
+
+    def send(self, request_type, **kwargs):
+        """requests.Session response of a rate and concurrency limited request
+        """
+        limit = self.concurrency.limit(kwargs["url"])
+        for attempt in range(self.throttle_retries + 1):
+            self.limiter.acquire()
+            started = limit.acquire()
+            try:
+                r = getattr(self.session, request_type)(**kwargs)
+            except Exception:
+                limit.release(started)
+                raise
+            limit.release(started, r.status_code)
+            if r.status_code != 429 or attempt == self.throttle_retries:
+                return r
+
+            wait = _retry_after(r)
+            if wait is None:
+                wait = min(2 ** attempt, 60)
+            logger.debug(f"429 on {request_type} {kwargs['url']}, retrying in {wait}s")
+            r.close()
+            time.sleep(wait)
+
+
+def _retry_after(response):
+    """seconds of a Retry-After header, None if missing or a date
+    """
+    try:
+        return float(response.headers["Retry-After"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(host):
+    """transport shared by every APIBase of a workspace within this process
+    """
+    with _transports_lock:
+        if host not in _transports:
+            _transports[host] = Transport()
+        return _transports[host]
+
+
+def configure_transport(host, rate=None, pool_size=32, max_concurrency=64):
+    """replace the shared transport of a workspace, before its clients are created
+    """
+    with _transports_lock:
+        _transports[host] = Transport(rate=rate, pool_size=pool_size,
+                                      max_concurrency=max_concurrency)
+        return _transports[host]
+
+
 class APIBase:
-    def __init__(self, token, host):
+    def __init__(self, token, host, request_cache=None, credentials=None, transport=None):
+        """
+        :param token: Databricks Personal Access Token. None uses the credentials set for host
+        :type token: str
+        :param host: Databricks workspace url
+        :type host: str
+        :param request_cache: GET memo. Default is the cache shared per host
+        :type request_cache: RequestCache
+        :param credentials: token cache. Default is the one shared per host and token
+        :type credentials: auth.TokenCache
+        :param transport: connection pool and rate limiter. Default is the one shared per host
+        :type transport: Transport
+        """
         self.token = token
-        self.headers = {'Authorization': f'Bearer {self.token}'}
+        self.credentials = credentials or get_credentials(host, token)
+        # static headers, Authorization is added per request
+        self.headers = {}
         self.host = host
         self.api_url = f"{self.host}/api/2.0"
+        self.request_cache = request_cache or get_request_cache(host)
+        self.transport = transport or get_transport(host)
+
+    def _invalidation_prefix(self, url):
+        """url prefix of memoized GETs a write to url may change.
+        default is the API family, e.g. {api_url}/clusters or {api_url}/preview/scim
+        """
+        path = url.split("?")[0][len(self.api_url):].strip("/").split("/")
+        depth = 2 if path[0] == "preview" else 1
+        return f"{self.api_url}/{'/'.join(path[:depth])}"
+
+    def request(self, url, body=None, request_type="get", params=None, memoize=True):
+        """send a request. GETs are memoized per run unless memoize=False,
+        any other request type invalidates the memoized GETs it may change
+        """
+        if request_type == "get" and memoize:
+            key = (url, repr(sorted((params or {}).items())))
+            return self.request_cache.get_or_call(
+                key, lambda: self._send(url, body, request_type, params))
+
+        try:
+            return self._send(url, body, request_type, params)
+        finally:
+            if request_type != "get":
+                self.request_cache.invalidate(self._invalidation_prefix(url))
 
-    def request(self, url, body=None, request_type="get"):
+    def _authorized(self, request_type, **kwargs):
+        """response of a request sent with the current token.
+        a 401 is retried once with a refreshed token
+        """
+        for attempt in range(2):
+            token = self.credentials.token()
+            kwargs["headers"] = {**self.headers, "Authorization": f"Bearer {token}"}
+            r = self.transport.send(request_type, **kwargs)
+            if r.status_code != 401 or attempt:
+                return r
+            # expired or rotated token: retry once with a refreshed one
+            logger.debug(f"401 on {request_type} {kwargs['url']}, retrying with a refreshed token")
+            r.close()
+            self.credentials.invalidate(token)
+
+    def _send(self, url, body=None, request_type="get", params=None):
         kwargs = {
             "url": url,
-            "headers": self.headers,
         }
         if body:
             kwargs["json"] = body
+        if params:
+            kwargs["params"] = params
 
-        request = getattr(requests, request_type)
-        r = request(**kwargs)
+        r = self._authorized(request_type, **kwargs)
         try:
             final_response = r.json()
         except Exception:
@@ -31,21 +327,54 @@ class APIBase:
             raise ValueError(final_response)
 
         r.close()
-        logger.debug(final_response)
+        # not the body, formatting large listings costs more than the request
+        logger.debug(f"{request_type.upper()} {url}: {r.status_code}")
         return final_response
 
+    def stream(self, url, field, params=None, chunk_size=65536):
+        """items of an array field of a GET response, decoded while the body
+        is read. neither memoized nor logged, for listings of many objects
+
+        :param field: top-level array field, e.g. clusters
+        :type field: str
+        :return: iterator over the items, its meta holds the other top-level fields
+        :type return: jsonstream.ArrayStream
+        """
+        return ArrayStream(self._stream_chunks(url, params, chunk_size), field)
+
+    def _stream_chunks(self, url, params=None, chunk_size=65536):
+        r = self._authorized("get", url=url, params=params, stream=True)
+        try:
+            if r.status_code != 200:
+                try:
+                    final_response = r.json()
+                except Exception:
+                    final_response = r.text
+                logger.debug(f"status code: {r.status_code}")
+                raise ValueError(final_response)
+            yield from r.iter_content(chunk_size=chunk_size)
+        finally:
+            r.close()
+
 
 class PermissionsBase(APIBase):
     """Permissions Super class
     Following attributes will be set in the child class:
     object_url
     allowed_permissions
+    preserved_permissions (optional) current levels kept when not configured
     """
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.permissions_api = "preview/permissions"
         self.permissions_url = f"{self.api_url}/{self.permissions_api}"
+        self.preserved_permissions = []
+
+    def _invalidation_prefix(self, url):
+        """permission writes only change the object they target
+        """
+        return url.split("?")[0]
 
     def _check_permission(self, permission_level):
         permission_level = permission_level.upper()
@@ -80,14 +409,27 @@ class PermissionsBase(APIBase):
                             "permission_level": permission_level
                         }
                     )
+            elif acl.get("service_principal"):
+                for spn in acl["service_principal"]:
+                    acl_list.append(
+                        {
+                            "service_principal_name": spn,
+                            "permission_level": permission_level
+                        }
+                    )
             else:
-                logger.error("acl does not contain group or user")
+                logger.error("acl does not contain group, user or service_principal")
 
         return acl_list
 
     def get_permission_levels(self, object_id):
-        return self.request(f"{self.object_url}/{object_id}/permissionLevels",
-                            request_type="get")
+        """permission levels only depend on the object type,
+        so they are memoized once per object_url
+        """
+        return self.request_cache.get_or_call(
+            (self.object_url, "permissionLevels"),
+            lambda: self.request(f"{self.object_url}/{object_id}/permissionLevels",
+                                 request_type="get", memoize=False))
 
     def get_permissions(self, object_id):
         return self.request(f"{self.object_url}/{object_id}",
@@ -104,10 +446,8 @@ class PermissionsBase(APIBase):
             }
         ]
         """
-        acl = self._parse_acl(access_control_list)
-        return self.request(f"{self.object_url}/{object_id}",
-                            body={"access_control_list": acl},
-                            request_type="patch")
+        return self.apply_permissions(object_id, self._parse_acl(access_control_list),
+                                      request_type="patch")
 
     def replace_permissions(self, object_id, access_control_list):
         """overwrites existing permissions. not supporting user or SPN objects.
@@ -120,7 +460,17 @@ class PermissionsBase(APIBase):
             }
         ]
         """
-        acl = self._parse_acl(access_control_list)
+        return self.apply_permissions(object_id, self._parse_acl(access_control_list),
+                                      request_type="put")
+
+    def apply_permissions(self, object_id, acl, request_type="put"):
+        """send an already parsed access control list
+
+        :param acl: e.g. [{"group_name": "a", "permission_level": "CAN_MANAGE"}]
+        :type acl: list(dict)
+        :param request_type: put replaces, patch adds
+        :type request_type: str
+        """
         return self.request(f"{self.object_url}/{object_id}",
                             body={"access_control_list": acl},
-                            request_type="put")
+                            request_type=request_type)
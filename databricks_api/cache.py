@@ -0,0 +1,315 @@
+"""on-disk inventory cache of workspace principals and object ids.
+one sqlite database can hold several workspaces, rows are keyed by workspace url.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from databricks_api.utils import logger
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "databricks_api", "inventory.sqlite")
+
+USER = "user"
+GROUP = "group"
+SPN = "spn"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS principals (
+    workspace TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    id TEXT NOT NULL,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (workspace, kind, name)
+);
+CREATE INDEX IF NOT EXISTS principals_id ON principals (workspace, kind, id);
+CREATE TABLE IF NOT EXISTS memberships (
+    workspace TEXT NOT NULL,
+    member_id TEXT NOT NULL,
+    group_id TEXT NOT NULL,
+    PRIMARY KEY (workspace, member_id, group_id)
+);
+CREATE INDEX IF NOT EXISTS memberships_group ON memberships (workspace, group_id);
+CREATE TABLE IF NOT EXISTS scope_acls (
+    workspace TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    principal TEXT NOT NULL,
+    permission TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (workspace, scope, principal)
+);
+CREATE TABLE IF NOT EXISTS scopes (
+    workspace TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (workspace, scope)
+);
+CREATE TABLE IF NOT EXISTS objects (
+    workspace TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    id TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (workspace, kind, name)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    workspace TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    full_synced_at REAL NOT NULL,
+    last_modified TEXT,
+    PRIMARY KEY (workspace, kind)
+);
+"""
+
+
+class InventoryCache:
+    """sqlite cache of principals, group memberships, scope ACLs and object ids
+
+    principals are refreshed incrementally with SCIM meta.lastModified filters
+    and fully once the last full sync is older than ttl. deleted principals
+    don't show up in incremental refreshes, their ids stay until the next full
+    sync or until a SCIM request using them returns 404, see api.SCIM.
+    scope ACLs and object ids (clusters, directories) expire after object_ttl.
+    """
+
+    def __init__(self, workspace_url, path=DEFAULT_CACHE_PATH, ttl=86400,
+                 object_ttl=900):
+        """
+        :param workspace_url: databricks workspace url, key of all rows
+        :type workspace_url: str
+        :param path: sqlite file
+        :type path: str
+        :param ttl: seconds between full principal syncs
+        :type ttl: int
+        :param object_ttl: seconds scope ACLs and object ids stay valid
+        :type object_ttl: int
+        """
+        self.workspace = workspace_url.rstrip("/")
+        self.path = path
+        self.ttl = ttl
+        self.object_ttl = object_ttl
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+
+    def _execute(self, sql, params=(), many=False):
+        with self._lock, self._conn:
+            if many:
+                return self._conn.executemany(sql, params).fetchall()
+            return self._conn.execute(sql, params).fetchall()
+
+    def close(self):
+        self._conn.close()
+
+    def clear(self):
+        for table in ["principals", "memberships", "scope_acls", "scopes",
+                      "objects", "sync_state"]:
+            self._execute(f"DELETE FROM {table} WHERE workspace = ?",
+                          (self.workspace,))
+
+    # principals
+    def get_id(self, kind, name):
+        """name -> id lookup of a principal. None on cache miss
+        """
+        rows = self._execute(
+            "SELECT id FROM principals WHERE workspace = ? AND kind = ? AND name = ?",
+            (self.workspace, kind, name))
+        return rows[0][0] if rows else None
+
+    def get_name(self, kind, principal_id):
+        rows = self._execute(
+            "SELECT name FROM principals WHERE workspace = ? AND kind = ? AND id = ?",
+            (self.workspace, kind, principal_id))
+        return rows[0][0] if rows else None
+
+    def put_principal(self, kind, name, principal_id, last_modified=None):
+        self._execute(
+            "INSERT OR REPLACE INTO principals VALUES (?, ?, ?, ?, ?, ?)",
+            (self.workspace, kind, name, principal_id, last_modified, time.time()))
+
+    def remove_principal(self, kind, name):
+        principal_id = self.get_id(kind, name)
+        self._execute(
+            "DELETE FROM principals WHERE workspace = ? AND kind = ? AND name = ?",
+            (self.workspace, kind, name))
+        if principal_id:
+            self._execute(
+                "DELETE FROM memberships WHERE workspace = ? "
+                "AND (member_id = ? OR group_id = ?)",
+                (self.workspace, principal_id, principal_id))
+
+    # memberships
+    def member_groups(self, member_id):
+        """member -> group ids lookup
+        """
+        rows = self._execute(
+            "SELECT group_id FROM memberships WHERE workspace = ? AND member_id = ?",
+            (self.workspace, member_id))
+        return [r[0] for r in rows]
+
+    def group_members(self, group_id):
+        rows = self._execute(
+            "SELECT member_id FROM memberships WHERE workspace = ? AND group_id = ?",
+            (self.workspace, group_id))
+        return [r[0] for r in rows]
+
+    def put_group_members(self, group_id, member_ids):
+        """replace the direct members of a group
+        """
+        self._execute(
+            "DELETE FROM memberships WHERE workspace = ? AND group_id = ?",
+            (self.workspace, group_id))
+        self._execute(
+            "INSERT OR IGNORE INTO memberships VALUES (?, ?, ?)",
+            [(self.workspace, m, group_id) for m in member_ids],
+            many=True)
+
+    # scope ACLs
+    def scope_acl(self, scope):
+        """cached ACL items of a secret scope in list_acls format.
+        None on cache miss or when older than object_ttl
+        """
+        rows = self._execute(
+            "SELECT fetched_at FROM scopes WHERE workspace = ? AND scope = ?",
+            (self.workspace, scope))
+        if not rows or time.time() - rows[0][0] > self.object_ttl:
+            return None
+
+        rows = self._execute(
+            "SELECT principal, permission FROM scope_acls "
+            "WHERE workspace = ? AND scope = ?",
+            (self.workspace, scope))
+        return {"items": [{"principal": p, "permission": perm} for p, perm in rows]}
+
+    def put_scope_acl(self, scope, items):
+        """
+        :param items: list_acls()["items"], e.g. [{"principal": "a", "permission": "READ"}]
+        :type items: list(dict)
+        """
+        now = time.time()
+        self._execute(
+            "DELETE FROM scope_acls WHERE workspace = ? AND scope = ?",
+            (self.workspace, scope))
+        self._execute(
+            "INSERT OR REPLACE INTO scope_acls VALUES (?, ?, ?, ?, ?)",
+            [(self.workspace, scope, i["principal"], i["permission"], now)
+             for i in items],
+            many=True)
+        self._execute("INSERT OR REPLACE INTO scopes VALUES (?, ?, ?)",
+                      (self.workspace, scope, now))
+
+    def invalidate_scope(self, scope):
+        self._execute("DELETE FROM scopes WHERE workspace = ? AND scope = ?",
+                      (self.workspace, scope))
+
+    # object ids
+    def get_object_id(self, kind, name):
+        """name -> id lookup of clusters, directories etc.
+        None on cache miss or when older than object_ttl
+        """
+        rows = self._execute(
+            "SELECT id, fetched_at FROM objects "
+            "WHERE workspace = ? AND kind = ? AND name = ?",
+            (self.workspace, kind, name))
+        if not rows or time.time() - rows[0][1] > self.object_ttl:
+            return None
+        return rows[0][0]
+
+    def put_object(self, kind, name, object_id):
+        self._execute("INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?)",
+                      (self.workspace, kind, name, str(object_id), time.time()))
+
+    def invalidate_object(self, kind, name):
+        self._execute(
+            "DELETE FROM objects WHERE workspace = ? AND kind = ? AND name = ?",
+            (self.workspace, kind, name))
+
+    # refresh
+    def _sync_state(self, kind):
+        rows = self._execute(
+            "SELECT full_synced_at, last_modified FROM sync_state "
+            "WHERE workspace = ? AND kind = ?",
+            (self.workspace, kind))
+        return rows[0] if rows else (None, None)
+
+    def refresh(self, scim, full=False):
+        """sync principals and memberships from SCIM.
+        incremental with meta.lastModified unless full=True or the last
+        full sync is older than ttl
+
+        :param scim: databricks SCIM API
+        :type scim: api.SCIM
+        :param full: force full refresh, e.g. --refresh-cache
+        :type full: bool
+        """
+        sources = [
+            (USER, scim.users_url, "userName", "groups"),
+            (SPN, scim.sp_url, "applicationId", "groups"),
+            (GROUP, scim.groups_url, "displayName", "members"),
+        ]
+        for kind, url, name_attr, member_attr in sources:
+            full_synced_at, last_modified = self._sync_state(kind)
+            kind_full = (full or full_synced_at is None
+                         or time.time() - full_synced_at > self.ttl)
+            scim_filter = None
+            if not kind_full and last_modified:
+                scim_filter = f'meta.lastModified gt "{last_modified}"'
+
+            try:
+                count, last_modified = self._refresh_kind(
+                    scim, kind, url, name_attr, member_attr,
+                    scim_filter, kind_full, last_modified)
+            except ValueError as err:
+                if kind_full:
+                    raise
+                # lastModified filter not supported by the endpoint
+                logger.debug(repr(err))
+                kind_full = True
+                count, last_modified = self._refresh_kind(
+                    scim, kind, url, name_attr, member_attr,
+                    None, kind_full, None)
+
+            logger.info(f"inventory cache: refreshed {count} {kind} "
+                        f"({'full' if kind_full else 'incremental'})")
+            self._execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)",
+                (self.workspace, kind,
+                 time.time() if kind_full else full_synced_at,
+                 last_modified))
+
+    def _refresh_kind(self, scim, kind, url, name_attr, member_attr,
+                      scim_filter, full, last_modified):
+        if full:
+            self._execute(
+                "DELETE FROM principals WHERE workspace = ? AND kind = ?",
+                (self.workspace, kind))
+
+        count = 0
+        attributes = f"id,{name_attr},meta,{member_attr}"
+        for resource in scim.iter_resources(url, scim_filter=scim_filter,
+                                            attributes=attributes):
+            modified = resource.get("meta", {}).get("lastModified")
+            self.put_principal(kind, resource[name_attr], resource["id"], modified)
+            if modified and (last_modified is None or modified > last_modified):
+                last_modified = modified
+
+            values = [v["value"] for v in resource.get(member_attr) or []]
+            if kind == GROUP:
+                self.put_group_members(resource["id"], values)
+            else:
+                self._execute(
+                    "DELETE FROM memberships WHERE workspace = ? AND member_id = ?",
+                    (self.workspace, resource["id"]))
+                self._execute(
+                    "INSERT OR IGNORE INTO memberships VALUES (?, ?, ?)",
+                    [(self.workspace, resource["id"], g) for g in values],
+                    many=True)
+            count += 1
+
+        return count, last_modified
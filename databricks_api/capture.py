@@ -0,0 +1,208 @@
+"""traffic capture of live runs.
+every request sent by APIBase, including streamed listings, and the
+databricks_cli ApiClient is recorded with
+its sanitized body, response, status and duration to a gzipped jsonl file,
+which replay.py can serve as a local stub or drive as load.
+"""
+import functools
+import gzip
+import json
+import threading
+import time
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from databricks_api.utils import logger
+
+REDACTED = "***"
+# keys whose values are credentials or secret payloads
+SECRET_KEYS = {"token", "token_value", "password", "client_secret", "secret",
+               "string_value", "bytes_value", "access_token", "refresh_token",
+               "authorization"}
+# APIBase errors only carry the response body, the status is derived from its error code
+ERROR_STATUS = {"RESOURCE_DOES_NOT_EXIST": 404, "NOT_FOUND": 404,
+                "RESOURCE_ALREADY_EXISTS": 409, "PERMISSION_DENIED": 403,
+                "UNAUTHENTICATED": 401, "REQUEST_LIMIT_EXCEEDED": 429,
+                "TEMPORARILY_UNAVAILABLE": 503}
+
+
+def error_status(response):
+    """http status of an APIBase error response body
+    """
+    if isinstance(response, dict):
+        if "error_code" in response:
+            return ERROR_STATUS.get(response["error_code"], 400)
+        # SCIM errors
+        if str(response.get("status", "")).isdigit():
+            return int(response["status"])
+    return 400
+
+
+def sanitize(value):
+    """copy of a request or response body with credentials redacted
+    """
+    if isinstance(value, dict):
+        return {k: REDACTED if k.lower() in SECRET_KEYS else sanitize(v)
+                for k, v in value.items()}
+    if isinstance(value, list):
+        return [sanitize(v) for v in value]
+    return value
+
+
+def request_key(method, url, params=None):
+    """(method, path, canonical query) of a request, without scheme and host
+    """
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    query += [(k, str(v)) for k, v in (params or {}).items()]
+    return method.upper(), parts.path, urlencode(sorted(query))
+
+
+class Recorder:
+    """records request/response pairs while started
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path: capture file, gzipped if it ends with .gz. None disables capture
+        :type path: str
+        """
+        self.enabled = path is not None
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+        self._patched = []
+        self._file = None
+        self._start = None
+
+    def record(self, method, url, params, body, status, response, duration):
+        method, path, query = request_key(method, url, params)
+        entry = {"t": round(time.perf_counter() - self._start, 4),
+                 "method": method,
+                 "path": path,
+                 "query": query,
+                 "body": sanitize(body),
+                 "status": status,
+                 "response": sanitize(response),
+                 "duration": round(duration, 4)}
+        line = json.dumps(entry, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self.count += 1
+
+    def _wrap_send(self, send):
+        recorder = self
+
+        @functools.wraps(send)
+        def wrapper(self, url, body=None, request_type="get", params=None):
+            start = time.perf_counter()
+            try:
+                response = send(self, url, body, request_type, params)
+            except ValueError as err:
+                # APIBase raises ValueError(response) on non 2xx responses
+                response = err.args[0] if err.args else None
+                recorder.record(request_type, url, params, body, error_status(response),
+                                response, time.perf_counter() - start)
+                raise
+            recorder.record(request_type, url, params, body, 200, response,
+                            time.perf_counter() - start)
+            return response
+        return wrapper
+
+    def _wrap_stream_chunks(self, stream_chunks):
+        recorder = self
+
+        @functools.wraps(stream_chunks)
+        def wrapper(self, url, params=None, chunk_size=65536):
+            start = time.perf_counter()
+            chunks = []
+            try:
+                for chunk in stream_chunks(self, url, params, chunk_size):
+                    chunks.append(chunk)
+                    yield chunk
+            except ValueError as err:
+                response = err.args[0] if err.args else None
+                recorder.record("get", url, params, None, error_status(response),
+                                response, time.perf_counter() - start)
+                raise
+            # only fully read listings are recorded, a listing closed early has no valid body
+            body = b"".join(chunks)
+            try:
+                response = json.loads(body)
+            except ValueError:
+                response = body.decode("utf-8", "replace")
+            recorder.record("get", url, params, None, 200, response,
+                            time.perf_counter() - start)
+        return wrapper
+
+    def _wrap_perform_query(self, perform_query):
+        recorder = self
+
+        @functools.wraps(perform_query)
+        def wrapper(self, method, path, data={}, headers=None, files=None, version=None):
+            url = self.get_url(path, version=version)
+            params, body = (data, None) if method.upper() == "GET" else (None, data)
+            start = time.perf_counter()
+            try:
+                response = perform_query(self, method, path, data, headers, files, version)
+            except Exception as err:
+                r = getattr(err, "response", None)
+                try:
+                    content = r.json()
+                except Exception:
+                    content = getattr(r, "text", repr(err))
+                recorder.record(method, url, params, body,
+                                getattr(r, "status_code", 500), content,
+                                time.perf_counter() - start)
+                raise
+            recorder.record(method, url, params, body, 200, response,
+                            time.perf_counter() - start)
+            return response
+        return wrapper
+
+    def start(self):
+        if not self.enabled:
+            return self
+        opener = gzip.open if self.path.endswith(".gz") else open
+        self._file = opener(self.path, "wt")
+        self._start = time.perf_counter()
+
+        from databricks_api.base import APIBase
+        self._patched.append((APIBase, "_send", APIBase._send))
+        APIBase._send = self._wrap_send(APIBase._send)
+        self._patched.append((APIBase, "_stream_chunks", APIBase._stream_chunks))
+        APIBase._stream_chunks = self._wrap_stream_chunks(APIBase._stream_chunks)
+        try:
+            from databricks_cli.sdk.api_client import ApiClient
+            self._patched.append((ApiClient, "perform_query", ApiClient.perform_query))
+            ApiClient.perform_query = self._wrap_perform_query(ApiClient.perform_query)
+        except ImportError:
+            pass
+
+        logger.info(f"capturing API traffic to {self.path}")
+        return self
+
+    def stop(self):
+        if not self.enabled:
+            return
+        for cls, name, original in reversed(self._patched):
+            setattr(cls, name, original)
+        self._patched = []
+        self._file.close()
+        logger.info(f"captured {self.count} requests to {self.path}")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def load_capture(path):
+    """records of a capture file
+
+    :return: records in recorded order
+    :type return: list(dict)
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -0,0 +1,143 @@
+"""guarded, concurrent deletion of unmanaged objects.
+every cleanup is planned in full first, the blast radius guard aborts before
+anything is deleted, then deletions run with bounded workers and each item
+gets its own result. a deferring executor collects the plans of every kind
+of a run and checks them together in execute(), so one kind over a limit
+stops the deletions of all kinds.
+"""
+from databricks_api.utils import fan_out, logger
+
+
+class CleanupAborted(ValueError):
+    """more deletions planned than the guard allows, nothing was deleted
+    """
+
+
+class CleanupGuard:
+    """limits of one cleanup
+    """
+
+    def __init__(self, max_deletions=None, max_percentage=None):
+        """
+        :param max_deletions: most objects deleted by one cleanup. None is unlimited
+        :type max_deletions: int
+        :param max_percentage: most percent of the existing objects of a kind
+            deleted by one cleanup. None is unlimited
+        :type max_percentage: float
+        """
+        self.max_deletions = max_deletions
+        self.max_percentage = max_percentage
+
+    def check(self, kind, count, total=None):
+        """raise CleanupAborted if deleting count of total objects exceeds a limit
+        """
+        self.check_all([(kind, count, total)])
+
+    def check_all(self, plans):
+        """raise CleanupAborted if the deletions of all plans together exceed max_deletions
+        or the deletions of one kind exceed max_percentage
+
+        :param plans: (kind, count, total) tuples
+        :type plans: list(tuple)
+        """
+        count = sum(c for _, c, _ in plans)
+        if self.max_deletions is not None and count > self.max_deletions:
+            planned = ", ".join(f"{c} {kind}" for kind, c, _ in plans)
+            raise CleanupAborted(
+                f"{planned} unmanaged objects planned for deletion, more than max_deletions "
+                f"{self.max_deletions}. nothing was deleted")
+        for kind, count, total in plans:
+            if (self.max_percentage is not None and total
+                    and count * 100 / total > self.max_percentage):
+                raise CleanupAborted(
+                    f"{count} of {total} {kind} planned for deletion, more than "
+                    f"{self.max_percentage}%. nothing was deleted")
+
+
+class CleanupExecutor:
+    """runs the planned deletions of unmanaged objects
+    """
+
+    def __init__(self, guard=None, max_workers=8, dry_run=False, defer=False):
+        """
+        :param guard: blast radius limits. Default is unlimited
+        :type guard: CleanupGuard
+        :param max_workers: concurrent deletions
+        :type max_workers: int
+        :param dry_run: only log the planned deletions
+        :type dry_run: bool
+        :param defer: run only plans deletions, execute() checks and deletes all of them
+        :type defer: bool
+        """
+        self.guard = guard or CleanupGuard()
+        self.max_workers = max_workers
+        self.dry_run = dry_run
+        self.defer = defer
+        self.plans = []
+        self.results = {}
+
+    def run(self, kind, items, delete, total=None, count=None):
+        """plan the deletion of items of one kind and, unless deferred, execute it
+
+        :param kind: object kind for logs and results, e.g. groups
+        :type kind: str
+        :param items: planned deletions, arguments of delete
+        :type items: list
+        :param delete: function deleting one item
+        :type delete: callable
+        :param total: existing objects of the kind, for the percentage limit
+        :type total: int
+        :param count: objects the items delete, e.g. scopes of scope ACL entries.
+            Default is one per item
+        :type count: int
+
+        :return: (item, error) tuples in completion order. error is None on success.
+            empty when deferred
+        :type return: list(tuple)
+        """
+        items = list(items)
+        if items:
+            self.plans.append((kind, items, delete, len(items) if count is None else count, total))
+        if self.defer:
+            return []
+        return self.execute()
+
+    def execute(self):
+        """check the planned deletions of all kinds against the guard, then delete them
+
+        :return: (item, error) tuples of all plans. error is None on success
+        :type return: list(tuple)
+        """
+        plans, self.plans = self.plans, []
+        self.guard.check_all([(kind, count, total) for kind, _, _, count, total in plans])
+
+        results = []
+        for kind, items, delete, _, _ in plans:
+            results.extend(self._delete(kind, items, delete))
+        return results
+
+    def _delete(self, kind, items, delete):
+        if self.dry_run:
+            for item in items:
+                logger.info(f"[dry run] would delete {kind} {item}")
+            return []
+
+        results = []
+        for item, _, err in fan_out(delete, items, max_workers=self.max_workers):
+            if err:
+                logger.error(f"deleting {kind} {item} failed: {repr(err)}")
+            else:
+                logger.warning(f"deleted {kind} {item}")
+            results.append((item, err))
+
+        failed = sum(1 for _, err in results if err)
+        logger.info(f"deleted {len(results) - failed} unmanaged {kind}, {failed} failed")
+        self.results.setdefault(kind, []).extend(results)
+        return results
+
+    def summary(self):
+        """deleted and failed counts per kind
+        """
+        return {kind: {"deleted": sum(1 for _, err in results if not err),
+                       "failed": sum(1 for _, err in results if err)}
+                for kind, results in self.results.items()}
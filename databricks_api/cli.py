@@ -0,0 +1,227 @@
+"""single command line entry point for the framework.
+subsystem modules and their heavy dependencies (databricks_cli, requests,
+mako, yaml) are only imported once a subcommand runs, keeping --help and
+argument errors fast for short CI steps.
+"""
+import argparse
+import sys
+
+from databricks_api.utils import add_arguments
+
+
+def _acl(args):
+    from databricks_api import acl
+    acl.run(args)
+
+
+def _cluster(args):
+    from databricks_api import cluster
+    cluster.run(args)
+
+
+def _watch(args):
+    from databricks_api import watch
+    watch.run(args)
+
+
+def _export(args):
+    from databricks_api import export
+    export.run(args)
+
+
+def _users_delete(args):
+    from databricks_api import delete_users
+    delete_users.run(args)
+
+
+def _report_merge(args):
+    import json
+    from databricks_api.report import merge_reports
+    from databricks_api.utils import logger
+
+    merged = merge_reports(args.reports)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(merged, f, indent=2)
+    else:
+        print(json.dumps(merged, indent=2))
+    if merged["missing_shards"]:
+        logger.warning(f"no report of shards {merged['missing_shards']}")
+    if merged["missing_shards"] or merged["incomplete"]:
+        return 1
+    return 0
+
+
+def _telemetry_summary(args):
+    import json
+    from databricks_api.telemetry import load_records, summarize
+
+    print(json.dumps(summarize(load_records(args.files), by=args.by), indent=2))
+    return 0
+
+
+def _replay_serve(args):
+    from databricks_api import replay
+    replay.serve(args)
+
+
+def _replay_load(args):
+    from databricks_api import replay
+    result = replay.load(args)
+    return 1 if result["errors"] else 0
+
+
+def _plan(args):
+    """render configuration files and print the managed objects without API calls
+    """
+    from databricks_api.utils import render_yaml, config_path, logger, logging, LOGGER_NAME
+
+    if args.debug:
+        logging.getLogger(LOGGER_NAME).setLevel(logging.DEBUG)
+
+    acl_config = render_yaml(config_path(args.acl_file)) or {}
+    cluster_config = render_yaml(config_path(args.cluster_config_file)) or []
+    cluster_libraries = render_yaml(config_path(args.cluster_library_file)) or []
+
+    for grp in acl_config.get("GROUPS") or []:
+        logger.info(f"group {grp['name']} ({grp.get('type')}): "
+                    f"{len(grp.get('members') or [])} members"
+                    f"{' + source ' + grp['source'] if grp.get('source') else ''}")
+    for secret in acl_config.get("SECRETS") or []:
+        logger.info(f"secret scope {secret['scope']}: {len(secret['acl'])} acl entries")
+    for cluster in acl_config.get("CLUSTERS") or []:
+        logger.info(f"cluster acl {cluster['name']}: {len(cluster['acl'])} acl entries")
+    for wsdir in acl_config.get("WORKSPACE") or []:
+        logger.info(f"folder {wsdir['folder']}: {len(wsdir['acl'])} acl entries")
+    for cluster_specs in cluster_config:
+        logger.info(f"cluster {cluster_specs['cluster_name']}: "
+                    f"{cluster_specs.get('spark_version')} "
+                    f"{cluster_specs.get('instance_pool_name') or cluster_specs.get('node_type_id')}")
+    logger.info(f"{len(cluster_libraries)} libraries on every cluster")
+    if args.pool_config_file:
+        for pool in render_yaml(config_path(args.pool_config_file)) or []:
+            logger.info(f"instance pool {pool['instance_pool_name']}: "
+                        f"{pool.get('node_type_id')} "
+                        f"min_idle_instances {pool.get('min_idle_instances', 0)}")
+
+
+def build_parser():
+    """argument parser with one subparser per subcommand
+
+    :return: parser
+    :type return: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(
+        prog="databricks-admin",
+        description="Databricks Platform Administration Framework")
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+    subparsers.required = True
+
+    acl_parser = subparsers.add_parser(
+        "acl", help="deploy groups, secret scope, cluster and folder ACLs")
+    add_arguments(acl_parser, cmd_type="ACL")
+    acl_parser.set_defaults(func=_acl)
+
+    cluster_parser = subparsers.add_parser(
+        "cluster", help="deploy clusters and cluster libraries")
+    add_arguments(cluster_parser, cmd_type="CLUSTER")
+    cluster_parser.set_defaults(func=_cluster)
+
+    watch_parser = subparsers.add_parser(
+        "watch", help="poll ACL state and reconcile drifted objects")
+    add_arguments(watch_parser, cmd_type="WATCH")
+    watch_parser.set_defaults(func=_watch)
+
+    export_parser = subparsers.add_parser(
+        "export", help="write ACL.yaml, clusterconf.yaml and clusterlib.yaml of a workspace")
+    add_arguments(export_parser, cmd_type="EXPORT")
+    export_parser.set_defaults(func=_export)
+
+    users_parser = subparsers.add_parser(
+        "users", help="user and service principal maintenance")
+    users_subparsers = users_parser.add_subparsers(dest="users_command",
+                                                   metavar="command")
+    users_subparsers.required = True
+    delete_parser = users_subparsers.add_parser(
+        "delete", help="bulk delete users and service principals")
+    add_arguments(delete_parser, cmd_type="DELETE")
+    delete_parser.set_defaults(func=_users_delete)
+
+    report_parser = subparsers.add_parser(
+        "report", help="run reports of sharded deployments")
+    report_subparsers = report_parser.add_subparsers(dest="report_command",
+                                                     metavar="command")
+    report_subparsers.required = True
+    merge_parser = report_subparsers.add_parser(
+        "merge", help="merge the shard reports of one run")
+    merge_parser.add_argument("reports", nargs="+", help="shard report files")
+    merge_parser.add_argument("-o", "--output", type=str, default=None,
+                              help="merged report file. Default is stdout")
+    merge_parser.set_defaults(func=_report_merge)
+
+    telemetry_parser = subparsers.add_parser(
+        "telemetry", help="cluster start phase telemetry (see cluster --telemetry)")
+    telemetry_subparsers = telemetry_parser.add_subparsers(dest="telemetry_command",
+                                                           metavar="command")
+    telemetry_subparsers.required = True
+    summary_parser = telemetry_subparsers.add_parser(
+        "summary", help="phase duration statistics over many runs")
+    summary_parser.add_argument("files", nargs="+", help="telemetry jsonl files")
+    summary_parser.add_argument("--by", type=str, default=None,
+                                help="group by a record field, e.g. instance_pool, "
+                                "spark_version, node_type_id or init_scripts")
+    summary_parser.set_defaults(func=_telemetry_summary)
+
+    replay_parser = subparsers.add_parser(
+        "replay", help="serve or load test captured API traffic (see --capture)")
+    replay_subparsers = replay_parser.add_subparsers(dest="replay_command",
+                                                     metavar="command")
+    replay_subparsers.required = True
+    serve_parser = replay_subparsers.add_parser(
+        "serve", help="serve a capture as a local API stub")
+    serve_parser.add_argument("capture", help="capture file")
+    serve_parser.add_argument("--host", type=str, default="127.0.0.1",
+                              help="listen address. Default is 127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8080,
+                              help="listen port. Default is 8080")
+    serve_parser.add_argument("--latency_scale", type=float, default=1.0,
+                              help="recorded latency multiplier, 0 answers immediately. "
+                              "Default is 1.0")
+    serve_parser.set_defaults(func=_replay_serve)
+    load_parser = replay_subparsers.add_parser(
+        "load", help="send the captured requests as load")
+    load_parser.add_argument("capture", help="capture file")
+    load_parser.add_argument("--target", type=str, default=None,
+                             help="base url receiving the load. "
+                             "Default is a local stub of the capture")
+    load_parser.add_argument("--concurrency", type=int, default=8,
+                             help="requests in flight. Default is 8")
+    load_parser.add_argument("--repeat", type=int, default=1,
+                             help="times the capture is sent. Default is 1")
+    load_parser.add_argument("--pace", action="store_true",
+                             help="keep the recorded request start times")
+    load_parser.add_argument("--latency_scale", type=float, default=1.0,
+                             help="latency multiplier of the default local stub. "
+                             "Default is 1.0")
+    load_parser.set_defaults(func=_replay_load)
+
+    plan_parser = subparsers.add_parser(
+        "plan", help="render configuration files and list the managed objects")
+    add_arguments(plan_parser, cmd_type="PLAN", workspace=False)
+    plan_parser.set_defaults(func=_plan)
+
+    return parser
+
+
+def main(argv=None):
+    """console entry point
+
+    :param argv: command line arguments without program name
+    :type argv: list(str)
+    """
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""databricks_cli ApiClient sending the shared credentials of its workspace,
+for scripts still calling databricks_cli APIs. the framework itself talks to
+the workspace through the APIBase classes of api.py only, so databricks_cli
+is not imported by a deploy.
+"""
+import requests
+from databricks_cli.sdk import ApiClient
+
+from databricks_api.auth import get_credentials
+from databricks_api.utils import logger
+
+
+class CredentialApiClient(ApiClient):
+    """databricks_cli ApiClient sending the shared credentials of its workspace
+    """
+
+    def __init__(self, token=None, host=None, **kwargs):
+        """
+        :param token: Personal Access Token. None uses the credentials set for host
+        :type token: str
+        :param host: Databricks workspace url
+        :type host: str
+        """
+        self.credentials = get_credentials(host, token)
+        super().__init__(host=host, **kwargs)
+
+    def perform_query(self, method, path, data={}, headers=None, files=None, version=None):
+        for attempt in range(2):
+            token = self.credentials.token()
+            request_headers = {"Authorization": f"Bearer {token}", "Content-Type": "text/json"}
+            request_headers.update(headers or {})
+            try:
+                return super().perform_query(method, path, data, request_headers, files, version)
+            except requests.exceptions.HTTPError as err:
+                status = getattr(err.response, "status_code", None)
+                if attempt or status != 401:
+                    raise
+                logger.debug(f"401 on {method} {path}, retrying with a refreshed token")
+                self.credentials.invalidate(token)
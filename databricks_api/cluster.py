@@ -1,81 +1,259 @@
 import time
 import multiprocessing
-
-from databricks_cli.sdk import ApiClient
-from databricks_cli.libraries.api import LibrariesApi
-from databricks_cli.clusters.api import ClusterApi
-
-from databricks_api.utils import render_yaml, parse_cmdline, CustomLogger, dir_path, logging
-# , dump_yaml
+from contextlib import nullcontext
+
+from databricks_api.api import (Clusters, Dbfs, InstancePools, InstancePoolPermissions,
+                                Libraries, Listings)
+from databricks_api.artifacts import stage_libraries
+from databricks_api.auth import register_args
+from databricks_api.base import configure_transport
+from databricks_api.capture import Recorder
+from databricks_api.cleanup import CleanupExecutor, CleanupGuard
+from databricks_api.journal import RunJournal, DEFAULT_JOURNAL_DIR
+from databricks_api.profiling import Profiler
+from databricks_api.report import shard_report, write_report
+from databricks_api.scheduler import ClusterStartScheduler, guess_node_type_cores, DEFAULT_PRIORITY
+from databricks_api.shard import Shard
+from databricks_api.telemetry import TelemetryCollector
+from databricks_api.utils import (render_yaml, parse_cmdline, CustomLogger, config_path, logging,
+                                  fan_out, dump_yaml)
+
+RUNNING_STATES = ["PENDING", "RUNNING", "RESTARTING", "RESIZING"]
+# library statuses still changing, see the Libraries API
+PENDING_LIBRARY_STATES = ["PENDING", "RESOLVING", "INSTALLING"]
 
 
 class ClusterManagement:
-    def __init__(self, logger, **kwargs):
+    def __init__(self, logger, scheduler=None, journal=None, profiler=None, cleanup=None,
+                 telemetry=None, start=True, keep_running=False, library_timeout=1200, **kwargs):
         """
+        :param scheduler: optional scheduler admitting cluster starts
+        :type scheduler: scheduler.ClusterStartScheduler
+        :param journal: optional run journal to skip clusters done by a resumed run
+        :type journal: journal.RunJournal
+        :param profiler: optional profiler timing create, wait and library phases
+        :type profiler: profiling.Profiler
+        :param cleanup: guarded executor deleting unmanaged clusters
+        :type cleanup: cleanup.CleanupExecutor
+        :param telemetry: optional collector of cluster start phase durations
+        :type telemetry: telemetry.TelemetryCollector
+        :param start: start terminated clusters. False requests library
+            changes on terminated clusters, they install on the next start
+        :type start: bool
+        :param keep_running: leave the clusters started by the deploy running
+        :type keep_running: bool
+        :param library_timeout: seconds to wait for library installs before terminating
+        :type library_timeout: int
         :param **kwargs:
             reserved python word for unlimited parameters
             keys should only include: token, host
         :type **kwargs: dict
         """
-        self.api_client = ApiClient(**kwargs)
-        self.cluster_client = ClusterApi(self.api_client)
-        self.libraries_client = LibrariesApi(self.api_client)
+        self.cluster_client = Clusters(**kwargs)
+        self.libraries_client = Libraries(**kwargs)
+        self.pool_client = InstancePools(**kwargs)
+        self.listings = Listings(**kwargs)
+        self.dbfs = Dbfs(**kwargs)
+        self.pool_perm = InstancePoolPermissions(**kwargs)
         self.logger = logger
+        self.scheduler = scheduler
+        self.journal = journal
+        self.profiler = profiler or Profiler()
+        self.cleanup = cleanup or CleanupExecutor()
+        self.telemetry = telemetry or TelemetryCollector()
+        self.start = start
+        self.keep_running = keep_running
+        self.library_timeout = library_timeout
+        # cluster name: state before the deploy, NEW for created clusters
+        self.state_before = {}
+        self.pool_node_types = {}
+        self._node_type_cores = None
+
+    def node_type_cores(self, node_type_id):
+        """cores of a node type from the node types API, guessed from the name otherwise
+        """
+        if self._node_type_cores is None:
+            try:
+                node_types = self.cluster_client.list_node_types()["node_types"]
+                self._node_type_cores = {n["node_type_id"]: int(n["num_cores"])
+                                         for n in node_types}
+            except Exception as error:
+                self.logger.warning(f"list node types error: {repr(error)}")
+                self._node_type_cores = {}
+
+        return (self._node_type_cores.get(node_type_id)
+                or guess_node_type_cores(node_type_id))
+
+    def estimate_cores(self, cluster_specs):
+        """cores a cluster needs to start: driver plus num_workers,
+        or autoscale min_workers. pool backed clusters use the pool node type
+
+        :param cluster_specs: cluster specs for the clusters API
+        :type cluster_specs: dict
+        """
+        worker_type = cluster_specs.get("node_type_id") or self.pool_node_types.get(
+            cluster_specs.get("instance_pool_id"))
+        driver_type = (cluster_specs.get("driver_node_type_id")
+                       or self.pool_node_types.get(cluster_specs.get("driver_instance_pool_id"))
+                       or worker_type)
+
+        if "autoscale" in cluster_specs:
+            workers = cluster_specs["autoscale"].get("min_workers", 0)
+        else:
+            workers = cluster_specs.get("num_workers", 0)
+
+        return self.node_type_cores(driver_type) + workers * self.node_type_cores(worker_type)
+
+    def deploy_pools(self, pool_config, apply=True):
+        """function to create/edit instance pools and apply their permissions.
+        run before clusters deploy so clusters can reference pools by name
+
+        :param pool_config: poolconf.yaml
+        :type pool_config: list(dict)
+        :param apply: create/edit pools and their permissions. False only
+            looks up existing pools, e.g. on shards other than the coordinator
+        :type apply: bool
+
+        :return: instance pool ids by instance_pool_name
+        :type return: dict
+        """
+        existing_pools = {p["instance_pool_name"]: p
+                          for p in self.pool_client.list_instance_pools()}
+        pool_ids = {}
+        for pool in pool_config:
+            pool_specs = {k: v for k, v in pool.items() if k != "acl"}
+            pool_name = pool_specs["instance_pool_name"]
+            existing = existing_pools.get(pool_name)
+
+            if not apply:
+                if not existing:
+                    self.logger.warning(f"instance pool {pool_name} doesn't exist yet")
+                    continue
+                pool_id = existing["instance_pool_id"]
+            elif existing:
+                pool_id = existing["instance_pool_id"]
+                self.logger.info(f"instance pool {pool_name} exists with id {pool_id}")
+                if not pool_specs.items() <= existing.items():
+                    self.logger.warning(
+                        "instance pool spec doesn't match existing pool")
+                    self.pool_client.edit_instance_pool(
+                        {**pool_specs, "instance_pool_id": pool_id})
+                else:
+                    self.logger.info("instance pool spec matches")
+            else:
+                pool_id = self.pool_client.create_instance_pool(
+                    pool_specs)["instance_pool_id"]
+                self.logger.info(f"created instance pool {pool_name} with id {pool_id}")
 
-    def create_cluster(self, cluster_specs):
-        """function to build/edit cluster and start
+            if apply and pool.get("acl"):
+                self.logger.info(
+                    self.pool_perm.replace_permissions(pool_id, pool["acl"]))
+
+            pool_ids[pool_name] = pool_id
+            self.pool_node_types[pool_id] = pool_specs.get("node_type_id")
+
+        return pool_ids
+
+    @staticmethod
+    def resolve_pools(cluster_specs, pool_ids):
+        """replace instance_pool_name and driver_instance_pool_name with pool ids.
+        node types come from the pool, so node_type_id and driver_node_type_id
+        are dropped for pool backed clusters
 
         :param cluster_specs: cluster specs in clusterconf.yaml
         :type cluster_specs: dict
+        :param pool_ids: instance pool ids by name, see deploy_pools
+        :type pool_ids: dict
+
+        :return: cluster specs for the clusters API
+        :type return: dict
         """
-        # self.cluster_client.get_cluster_by_name("unknown")
+        cluster_specs = dict(cluster_specs)
+        for name_key, id_key, node_key in [
+            ("instance_pool_name", "instance_pool_id", "node_type_id"),
+            ("driver_instance_pool_name", "driver_instance_pool_id",
+             "driver_node_type_id"),
+        ]:
+            if name_key not in cluster_specs:
+                continue
+
+            pool_name = cluster_specs.pop(name_key)
+            if pool_name not in pool_ids:
+                raise ValueError(
+                    f"cluster {cluster_specs['cluster_name']} references "
+                    f"unknown instance pool {pool_name}")
+            cluster_specs[id_key] = pool_ids[pool_name]
+            cluster_specs.pop(node_key, None)
 
-        try:
-            cluster = self.cluster_client.get_cluster_by_name(
-                cluster_specs["cluster_name"])
+        return cluster_specs
 
-            self.logger.info(
-                f"cluster {cluster['cluster_name']} exists "
-                f"with id {cluster['cluster_id']}")
-            self.logger.debug(cluster_specs)
-            self.logger.debug(cluster)
+    def create_cluster(self, cluster_specs):
+        """function to build/edit cluster and start
 
-            if not cluster_specs.items() <= cluster.items():
-                self.logger.warning(
-                    "cluster spec doesn't match existing cluster")
+        :param cluster_specs: cluster specs in clusterconf.yaml
+        :type cluster_specs: dict
 
-                cluster_specs['cluster_id'] = cluster['cluster_id']
-                self.cluster_client.edit_cluster(cluster_specs)
-            else:
-                self.logger.info("cluster spec matches")
-        except Exception:
-            cluster = self.cluster_client.create_cluster(cluster_specs)
-            self.logger.info(
-                f"the cluster {cluster} is being created")
-            time.sleep(30)
+        :return: cluster id and whether this deploy started the cluster
+        :type return: tuple(str, bool)
+        """
+        # self.cluster_client.get_cluster_by_name("unknown")
+        cluster_name = cluster_specs["cluster_name"]
+
+        with self.profiler.phase("cluster.create"):
+            try:
+                cluster = self.cluster_client.get_cluster_by_name(cluster_name)
+                self.state_before[cluster_name] = cluster.get("state")
+
+                self.logger.info(
+                    f"cluster {cluster['cluster_name']} exists "
+                    f"with id {cluster['cluster_id']}")
+                self.logger.debug(cluster_specs)
+                self.logger.debug(cluster)
+
+                if not cluster_specs.items() <= cluster.items():
+                    self.logger.warning(
+                        "cluster spec doesn't match existing cluster")
+
+                    cluster_specs['cluster_id'] = cluster['cluster_id']
+                    self.cluster_client.edit_cluster(cluster_specs)
+                else:
+                    self.logger.info("cluster spec matches")
+            except Exception:
+                cluster = self.cluster_client.create_cluster(cluster_specs)
+                self.state_before[cluster_name] = "NEW"
+                self.logger.info(
+                    f"the cluster {cluster} is being created")
+                time.sleep(30)
 
         cluster_id = cluster['cluster_id']
-        status = self._cluster_status(cluster_id)
+        # new clusters start on creation, running ones were started by someone else
+        was_running = self.state_before[cluster_name] in RUNNING_STATES
+        if not self.start and not was_running and self.state_before[cluster_name] != "NEW":
+            self.logger.info(f"cluster {cluster_name} is not running, not starting it")
+            return cluster_id, False
 
-        while status['state'] in ["RESTARTING", "RESIZING", "TERMINATING"]:
-            self.logger.info(
-                f"waiting for the cluster. status {status['state']}")
-            time.sleep(10)
+        with self.profiler.phase("cluster.wait"):
             status = self._cluster_status(cluster_id)
 
-        while status['state'] in ["TERMINATED", "PENDING"]:
-            self.logger.info(f"cluster status {status['state']}")
-            if status['state'] == "TERMINATED":
-                self.logger.info(f"starting cluster, status {status['state']}")
-                self.cluster_client.start_cluster(cluster_id)
+            while status['state'] in ["RESTARTING", "RESIZING", "TERMINATING"]:
+                self.logger.info(
+                    f"waiting for the cluster. status {status['state']}")
+                time.sleep(10)
+                status = self._cluster_status(cluster_id)
 
-            time.sleep(10)
-            status = self._cluster_status(cluster_id)
+            while status['state'] in ["TERMINATED", "PENDING"]:
+                self.logger.info(f"cluster status {status['state']}")
+                if status['state'] == "TERMINATED":
+                    self.logger.info(f"starting cluster, status {status['state']}")
+                    self.cluster_client.start_cluster(cluster_id)
+
+                time.sleep(10)
+                status = self._cluster_status(cluster_id)
 
         self.logger.info(
             f"cluster is up. final status: {status['state']}")
 
-        return cluster_id
+        return cluster_id, not was_running
 
     def install_cluster_library(self, cluster_id, cluster_libraries):
         """function to install libraries on cluster
@@ -84,6 +262,9 @@ class ClusterManagement:
         :type cluster_id: str
         :param cluster_libraries: clusterlib.yaml
         :type cluster_libraries: list(dict)
+
+        :return: True if the library changes were requested
+        :type return: bool
         """
         try:
             if not isinstance(cluster_libraries, list):
@@ -112,8 +293,69 @@ class ClusterManagement:
             self.libraries_client.uninstall_libraries(
                 cluster_id, uninstall_libs)
 
+            return True
         except Exception as error:
             self.logger.error(f"install_cluster_library error: {repr(error)}")
+            return False
+
+    def wait_for_libraries(self, cluster_id, interval=10):
+        """wait until no library of a cluster is pending, resolving or installing
+
+        :return: library statuses by state, e.g. {"INSTALLED": [...], "FAILED": [...]}
+        :type return: dict
+        """
+        deadline = time.monotonic() + self.library_timeout
+        while True:
+            statuses = self.libraries_client.cluster_status(cluster_id).get(
+                "library_statuses") or []
+            by_state = {}
+            for lib in statuses:
+                by_state.setdefault(lib["status"], []).append(lib["library"])
+            pending = sum(len(by_state.get(s, [])) for s in PENDING_LIBRARY_STATES)
+            if not pending:
+                return by_state
+            if time.monotonic() > deadline:
+                self.logger.warning(f"{pending} libraries of {cluster_id} still installing "
+                                    f"after {self.library_timeout}s")
+                return by_state
+            time.sleep(interval)
+
+    def finish(self, cluster_name, cluster_id, started):
+        """lifecycle after the deploy: wait for library installs to settle and
+        terminate the cluster if this deploy started it
+
+        :param started: this deploy started the cluster
+        :type started: bool
+
+        :return: True if the cluster was terminated
+        :type return: bool
+        """
+        if started:
+            # e.g. already terminated by the failed run a resumed run repeats
+            status = self._cluster_status(cluster_id) or {}
+            started = status.get("state") in RUNNING_STATES
+        terminate = started and not self.keep_running
+        try:
+            if started and self.start:
+                with self.profiler.phase("cluster.libraries_wait"):
+                    by_state = self.wait_for_libraries(cluster_id)
+                self.telemetry.libraries_settled(cluster_name)
+                if by_state.get("FAILED"):
+                    self.logger.error(f"libraries failed on {cluster_name}: {by_state['FAILED']}")
+
+            if terminate:
+                # https://docs.databricks.com/dev-tools/api/latest/clusters.html#delete-terminate
+                self.cluster_client.delete_cluster(cluster_id)
+                self.logger.info(f"terminated {cluster_name}, started by this deploy")
+        finally:
+            # clusters the deploy didn't leave running don't count against the core quota,
+            # the ones it left running do for the rest of the deploy
+            if self.scheduler and (terminate or not started):
+                self.scheduler.stopped(cluster_name)
+            elif self.scheduler:
+                self.scheduler.kept(cluster_name)
+
+        return terminate
 
     def _cluster_status(self, cluster_id):
         """internal method to get cluster status
@@ -133,53 +375,86 @@ class ClusterManagement:
         :param cluster_config: clusterconf.yaml
         :type cluster_config: list(dict)
         """
-        existing_clusters = self.cluster_client.list_clusters()
-        if existing_clusters.get("clusters"):
-            existing_clusters = [c for c in existing_clusters.get(
-                "clusters") if c["cluster_source"].upper() != "JOB"]
-        self.logger.debug(existing_clusters)
-
-        cluster_list = [c["cluster_name"] for c in cluster_config]
-        remove_cluster = [
-            (c["cluster_name"], c["cluster_id"]) for c in existing_clusters if c["cluster_name"] not in cluster_list
-        ]
+        # streamed, job clusters can be most of a large listing
+        cluster_list = {c["cluster_name"] for c in cluster_config}
+        existing_clusters = [(c["cluster_name"], c["cluster_id"])
+                             for c in self.listings.iter_clusters()
+                             if c["cluster_source"].upper() != "JOB"]
+        remove_cluster = [c for c in existing_clusters if c[0] not in cluster_list]
 
         self.logger.warning("removing unmanaged clusters:")
         self.logger.warning(remove_cluster)
 
-        for c in remove_cluster:
-            self.logger.debug(f"deleting {c[1]}")
-            self.cluster_client.permanent_delete(c[1])
-
-        return
+        return self.cleanup.run("clusters", remove_cluster,
+                                lambda c: self.cluster_client.permanent_delete(c[1]),
+                                total=len(existing_clusters))
 
     def main(self, cluster_specs, cluster_libraries):
         """main method to build/edit clusters and install libs
 
-        :cluster_spec: cluster spec in clusterconf.yaml
+        :cluster_spec: cluster spec in clusterconf.yaml.
+            optional priority key orders starts, lowest first
         :type cluster_spec: dict
         :param cluster_libraries: clusterlib.yaml
         :type cluster_libraries: list(dict)
         """
+        cluster_specs = dict(cluster_specs)
+        priority = cluster_specs.pop("priority", DEFAULT_PRIORITY)
+        cluster_name = cluster_specs["cluster_name"]
+
         # self.logger.info("=======================================================")
-        self.logger.info(
-            f"create/update cluster: {cluster_specs['cluster_name']}")
-        cluster_id = self.create_cluster(cluster_specs)
+        journal = self.journal
+        if journal and journal.skip(
+                "cluster", cluster_name, cluster_specs,
+                validate=lambda entry: self._cluster_status(entry["cluster_id"])):
+            entry = journal.details("cluster", cluster_name)
+            cluster_id, started = entry["cluster_id"], entry.get("started", False)
+        else:
+            self.logger.info(
+                f"create/update cluster: {cluster_name}")
+            if self.scheduler:
+                start_slot = self.scheduler.start_slot(
+                    cluster_name, self.estimate_cores(cluster_specs), priority)
+            else:
+                start_slot = nullcontext()
+
+            # the start slot is released as soon as the cluster is RUNNING
+            self.telemetry.touched(cluster_name, None, cluster_specs)
+            with start_slot:
+                cluster_id, started = self.create_cluster(cluster_specs)
+            self.telemetry.update(cluster_name, cluster_id=cluster_id,
+                                  state_before=self.state_before.get(cluster_name))
+            if journal:
+                journal.record("cluster", cluster_name, cluster_specs,
+                               cluster_id=cluster_id, started=started)
+
+        try:
+            if not (journal and journal.skip("library", cluster_name, cluster_libraries)):
+                self.logger.info("installing libraries")
+                with self.profiler.phase("cluster.libraries"):
+                    installed = self.install_cluster_library(cluster_id, cluster_libraries)
+                if installed and journal:
+                    journal.record("library", cluster_name, cluster_libraries,
+                                   cluster_id=cluster_id)
+        except Exception:
+            # finish isn't reached, other starts must not wait for these cores
+            if self.scheduler:
+                self.scheduler.stopped(cluster_name)
+            raise
 
-        self.logger.info("installing libraries")
-        self.install_cluster_library(cluster_id, cluster_libraries)
+        self.finish(cluster_name, cluster_id, started)
 
-        # self.logger.info("terminating cluster")
-        # https://docs.databricks.com/dev-tools/api/latest/clusters.html#delete-terminate
-        # self.cluster_client.delete_cluster(cluster_id)
 
+def run(args):
+    """render cluster configuration, deploy clusters and libraries
 
-if __name__ == "__main__":
+    :param args: command line arguments of parse_cmdline(cmd_type="CLUSTER")
+    :type args: argparse.Namespace
+    """
     mplogger = multiprocessing.log_to_stderr()
 
-    args = parse_cmdline(cmd_type="CLUSTER")
     if args.debug:
-       mplogger.setLevel(logging.DEBUG)
+        mplogger.setLevel(logging.DEBUG)
     else:
         mplogger.setLevel(logging.INFO)
 
@@ -191,33 +466,92 @@ DATABRICKS CLUSTER MANAGEMENT
 ++++++++++++++++++++++++++++++++++++++++
     """)
 
-    cluster_config = render_yaml(
-        f"{dir_path}\\configuration\\{args.cluster_config_file}")
-    cluster_libraries = render_yaml(
-        f"{dir_path}\\configuration\\{args.cluster_library_file}")
+    with Recorder(args.capture), Profiler(args.profile, mode=args.profile_mode) as profiler:
+        with profiler.phase("render"):
+            cluster_config = render_yaml(config_path(args.cluster_config_file))
+            cluster_libraries = render_yaml(config_path(args.cluster_library_file))
+
+        scheduler = ClusterStartScheduler(
+            max_concurrent_starts=args.max_concurrent_starts,
+            max_starting_cores=args.max_starting_cores,
+            core_quota=args.core_quota)
+
+        # journal of completed units, --resume skips them
+        journal = RunJournal(run_id=args.resume,
+                             directory=args.journal_dir or DEFAULT_JOURNAL_DIR,
+                             resume=bool(args.resume))
+        shard = Shard.from_arg(args.shard)
+        if shard.count > 1:
+            logger.info(f"deploying shard {shard}"
+                        f"{' (coordinator)' if shard.is_coordinator else ''}")
+
+        # one deploy thread per cluster, all on one connection pool and rate limit
+        transport = configure_transport(args.workspace_url, rate=args.max_requests_per_second,
+                                        pool_size=max(32, len(cluster_config)),
+                                        max_concurrency=args.max_concurrency)
+
+        # how I feel everyday
+        clusterfk = ClusterManagement(logger,
+                                      scheduler=scheduler,
+                                      journal=journal,
+                                      profiler=profiler,
+                                      cleanup=CleanupExecutor(guard=CleanupGuard(
+                                          args.max_deletions, args.max_delete_percentage)),
+                                      telemetry=TelemetryCollector(args.telemetry,
+                                                                   run_id=journal.run_id),
+                                      start=not args.no_start,
+                                      keep_running=args.keep_running,
+                                      library_timeout=args.library_timeout,
+                                      token=register_args(args),
+                                      host=args.workspace_url)
+
+        # local library files are uploaded once per content hash
+        with profiler.phase("stage_artifacts"):
+            cluster_libraries = stage_libraries(clusterfk.dbfs, cluster_libraries,
+                                                max_workers=args.upload_workers)
+        if args.staged_library_file:
+            dump_yaml(cluster_libraries, args.staged_library_file)
+
+        # warm instance pools first so clusters start from idle instances.
+        # pools are shared by all shards and only deployed by the coordinator
+        pool_ids = {}
+        if args.pool_config_file:
+            pool_config = render_yaml(config_path(args.pool_config_file))
+            with profiler.phase("deploy_pools"):
+                pool_ids = clusterfk.deploy_pools(pool_config, apply=shard.is_coordinator)
+
+        if shard.is_coordinator:
+            with profiler.phase("delete_unmanaged_clusters"):
+                clusterfk.delete_unmanaged_clusters(cluster_config)
+        cluster_config = [clusterfk.resolve_pools(c, pool_ids) for c in cluster_config
+                          if shard.owns("cluster", c["cluster_name"])]
+        # clusterfk.main(cluster_config[0], cluster_libraries)
+
+        # one thread per cluster, the scheduler admits the starts.
+        # threads share the scheduler state, the work is waiting on the API
+        def deploy(cluster_specs):
+            return clusterfk.main(cluster_specs, cluster_libraries)
+
+        with profiler.phase("clusters"):
+            for cluster_specs, _, err in fan_out(deploy, cluster_config,
+                                                 max_workers=max(len(cluster_config), 1)):
+                if err:
+                    logger.error(f"cluster {cluster_specs['cluster_name']} failed: {repr(err)}")
+                else:
+                    logger.info(f"cluster {cluster_specs['cluster_name']} done")
+
+        logger.info("all clusters done")
+        with profiler.phase("telemetry"):
+            clusterfk.telemetry.collect(clusterfk.cluster_client)
+        logger.info(f"request cache: {clusterfk.pool_client.request_cache.stats()}")
+        logger.info(f"concurrency limits: {transport.concurrency.summary()}")
+        concurrency = transport.concurrency.stats()
+
+        report_path = args.report or (
+            f"report-cluster-shard-{shard.index}-of-{shard.count}.json" if shard.count > 1 else None)
+        if report_path:
+            write_report(shard_report(shard, journal, concurrency), report_path)
 
-    # how I feel everyday
-    clusterfk = ClusterManagement(logger,
-                                  token=args.personal_access_token,
-                                  host=args.workspace_url)
 
-    clusterfk.delete_unmanaged_clusters(cluster_config)
-    # clusterfk.main(cluster_config[0], cluster_libraries)
-
-    # pools
-    if len(cluster_config) < 4:
-        p = multiprocessing.Pool(processes=len(cluster_config))
-    else:
-        p = multiprocessing.Pool()
-
-    args = (
-        (cluster_specs, cluster_libraries)
-        for cluster_specs in cluster_config
-    )
-    results = p.starmap_async(clusterfk.main, args)
-    # cleanup
-    p.close()
-    p.join()
-
-    logger.info(results.get())
-    logger.info("all processes done")
+if __name__ == "__main__":
+    run(parse_cmdline(cmd_type="CLUSTER"))
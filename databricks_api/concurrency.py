@@ -0,0 +1,165 @@
+"""adaptive concurrency limits of API requests, one per endpoint family.
+AIMD: while the callers keep a family at its limit, every response with a
+normal latency raises the limit by 1/limit (about one per round trip). a 429
+or 5xx halves it, a latency well above the baseline lowers it by 10%, at most
+once per round trip so one burst of failures counts once.
+fan-outs may run more workers than the limit, the surplus waits for a slot.
+"""
+import re
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+HISTORY_SIZE = 500
+# e.g. /api/2.0/ or /api/2.1/, the family is the path after it
+_API_PATH = re.compile(r"^.*?/api/\d+\.\d+/")
+
+
+def endpoint_family(url):
+    """e.g. scim, permissions, clusters, groups, secrets or jobs, for any API version
+    """
+    path = _API_PATH.sub("", urlparse(url).path, count=1).strip("/").split("/")
+    if path[0] == "preview" and len(path) > 1:
+        return path[1]
+    return path[0]
+
+
+class AdaptiveLimit:
+    """concurrency limit of one endpoint family
+    """
+
+    def __init__(self, family, initial=8, min_limit=1, max_limit=64, backoff=0.5,
+                 latency_backoff=0.9, tolerance=2.0):
+        """
+        :param initial: starting limit
+        :type initial: int
+        :param max_limit: highest limit, e.g. the connection pool size
+        :type max_limit: int
+        :param backoff: limit multiplier on a 429 or 5xx
+        :type backoff: float
+        :param latency_backoff: limit multiplier on latency above tolerance times the baseline
+        :type latency_backoff: float
+        :param tolerance: smoothed latency over baseline latency treated as overload
+        :type tolerance: float
+        """
+        self.family = family
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.backoff = backoff
+        self.latency_backoff = latency_backoff
+        self.tolerance = tolerance
+        self.in_flight = 0
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.smoothed = None
+        self.baseline = None
+        self._start = time.monotonic()
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self.max_reached = int(self.limit)
+        self.history = deque([(0.0, int(self.limit))], maxlen=HISTORY_SIZE)
+
+    def acquire(self):
+        """wait for a slot
+
+        :return: start time for release
+        :type return: float
+        """
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+        return time.monotonic()
+
+    def release(self, started, status=None):
+        """free the slot of a finished request and adapt the limit
+
+        :param started: return value of acquire
+        :type started: float
+        :param status: HTTP status code. None for connection errors
+        :type status: int
+        """
+        now = time.monotonic()
+        latency = now - started
+        with self._cond:
+            self.in_flight -= 1
+            self.requests += 1
+            before = int(self.limit)
+
+            if status == 429 or status is None or status >= 500:
+                if status == 429:
+                    self.throttled += 1
+                else:
+                    self.errors += 1
+                self._decrease(now, self.backoff)
+            else:
+                self.smoothed = latency if self.smoothed is None else 0.9 * self.smoothed + 0.1 * latency
+                if self.baseline is None or self.smoothed < self.baseline:
+                    self.baseline = self.smoothed
+                else:
+                    # a workspace that got slower for good becomes the new normal
+                    self.baseline += (self.smoothed - self.baseline) * 0.01
+                if self.smoothed > self.baseline * self.tolerance:
+                    self._decrease(now, self.latency_backoff)
+                elif self.in_flight + 1 >= before:
+                    # the limit, not the callers, bounded the concurrency
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+            if int(self.limit) != before:
+                self.max_reached = max(self.max_reached, int(self.limit))
+                self.history.append((round(now - self._start, 3), int(self.limit)))
+            self._cond.notify_all()
+
+    def _decrease(self, now, factor):
+        if now - self._last_decrease < (self.smoothed or 0.0):
+            return
+        self.limit = max(self.min_limit, self.limit * factor)
+        self._last_decrease = now
+
+    def stats(self):
+        with self._cond:
+            return {"limit": int(self.limit),
+                    "max_reached": self.max_reached,
+                    "requests": self.requests,
+                    "throttled": self.throttled,
+                    "errors": self.errors,
+                    "latency": round(self.smoothed, 4) if self.smoothed is not None else None,
+                    "history": [list(h) for h in self.history]}
+
+
+class ConcurrencyController:
+    """adaptive limits per endpoint family of a workspace
+    """
+
+    def __init__(self, initial=8, max_limit=64):
+        self.initial = initial
+        self.max_limit = max_limit
+        self._limits = {}
+        self._lock = threading.Lock()
+
+    def limit(self, url):
+        """limit of the endpoint family of url
+        """
+        family = endpoint_family(url)
+        with self._lock:
+            if family not in self._limits:
+                self._limits[family] = AdaptiveLimit(family, initial=self.initial,
+                                                     max_limit=self.max_limit)
+            return self._limits[family]
+
+    def stats(self):
+        """limits, counts and limit history per endpoint family, for the run report
+        """
+        with self._lock:
+            limits = dict(self._limits)
+        return {family: limit.stats() for family, limit in sorted(limits.items())}
+
+    def summary(self):
+        """one line of current and highest limit per endpoint family, for logs
+        """
+        return ", ".join(f"{family} {s['limit']} (max {s['max_reached']}, "
+                         f"{s['throttled']} throttled, {s['errors']} errors)"
+                         for family, s in self.stats().items())
@@ -1,16 +1,26 @@
-from databricks_api.api import SCIM
-from pprint import pprint
+"""script to delete ALL service principals. previews only unless --execute is given.
+use delete_users.py with --application_id to delete specific service principals.
+"""
 
-token = ""
-host = ""
-scim = SCIM(token=token, host=host)
+from databricks_api import delete_users
+from databricks_api.utils import add_arguments
+import argparse
 
-try:
-    all_spns = [spn["applicationId"] for spn in scim.get_sp()["Resources"]]
 
-    # for spn in all_spns:
-        # scim.delete_sp(spn)
-except Exception as err:
-    pprint(err)
-finally:
-    pprint(scim.get_sp())
+def parse_args(argv=None):
+    """delete_users arguments with --all_spn set and --execute to leave the dry run
+    """
+    parser = argparse.ArgumentParser(
+        description="Delete all Databricks service principals")
+    add_arguments(parser, cmd_type="DELETE")
+    parser.add_argument('--execute', action='store_true',
+                        help='actually delete (default: False, dry run)')
+    args = parser.parse_args(argv)
+    args.all_spn = True
+    args.dry_run = args.dry_run or not args.execute
+    return args
+
+
+if __name__ == "__main__":
+    # guard aborts and API failures propagate and exit non-zero
+    delete_users.run(parse_args())
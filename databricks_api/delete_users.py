@@ -1,53 +1,205 @@
-"""script to delete users in case they were added wrongly or with wrong domain
+"""script to delete users in case they were added wrongly or with wrong domain.
+also deletes service principals.
 """
 
 from databricks_api.api import SCIM
-from databricks_api.utils import parse_cmdline, logger, logging, LOGGER_NAME
+from databricks_api.auth import register_args
+from databricks_api.cleanup import CleanupGuard
+from databricks_api.utils import parse_cmdline, fan_out, logger, logging, LOGGER_NAME
 from timeit import default_timer as timer
 import datetime
 
+USERS = "Users"
+SERVICE_PRINCIPALS = "ServicePrincipals"
 
-def main(token, host, user_list=[], domain=""):
-    """main function to delete users. either list of users or domain to delete
+
+def _resource_info(scim, resource):
+    """SCIM url and unique attribute of a principal resource
+    """
+    if resource == USERS:
+        return scim.users_url, "userName"
+    elif resource == SERVICE_PRINCIPALS:
+        return scim.sp_url, "applicationId"
+
+    raise ValueError(f"unknown principal resource: {resource}")
+
+
+def iter_principals(scim, resource=USERS, names=None, scim_filter=None,
+                    batch_size=50):
+    """stream (name, id) of principals matching either names or a SCIM filter
+
+    :param scim: databricks SCIM API
+    :type scim: api.SCIM
+    :param resource: USERS or SERVICE_PRINCIPALS
+    :type resource: str
+    :param names: userName or applicationId values. resolved in batches
+    :type names: list(str)
+    :param scim_filter: SCIM filter, e.g. 'userName co @domain.ca'.
+        None together with no names matches every principal
+    :type scim_filter: str
+    :param batch_size: names resolved per request
+    :type batch_size: int
+    """
+    url, attribute = _resource_info(scim, resource)
+    if names:
+        yield from scim.resolve_ids(url, attribute, names, batch_size=batch_size)
+        return
+
+    for principal in scim.iter_resources(url, scim_filter=scim_filter,
+                                         attributes=f"id,{attribute}"):
+        yield principal[attribute], principal["id"]
+
+
+def _delete_concurrent(scim, principals, url, max_workers):
+    def delete(principal):
+        _, principal_id = principal
+        return scim.request(f"{url}/{principal_id}", request_type="delete")
+
+    results = []
+    for (name, _), _, err in fan_out(delete, principals, max_workers=max_workers):
+        if err:
+            logger.error(f"failed to delete {name}: {repr(err)}")
+        else:
+            logger.info(f"deleted {name}")
+        results.append((name, err))
+
+    return results
+
+
+def _delete_bulk(scim, principals, resource, batch_size):
+    results = []
+    for i in range(0, len(principals), batch_size):
+        batch = dict(
+            (principal_id, name) for name, principal_id in principals[i:i + batch_size]
+        )
+        operations = [
+            {"method": "DELETE",
+             "path": f"/{resource}/{principal_id}",
+             "bulkId": principal_id}
+            for principal_id in batch
+        ]
+        r = scim.bulk(operations)
+        for op in r.get("Operations", []):
+            name = batch.pop(op["bulkId"], None)
+            if name is None:
+                continue
+            err = None
+            if str(op.get("status")) not in ["200", "204"]:
+                err = ValueError(op.get("response", op.get("status")))
+                logger.error(f"failed to delete {name}: {repr(err)}")
+            else:
+                logger.info(f"deleted {name}")
+            results.append((name, err))
+        # e.g. skipped once the server stopped on failOnErrors
+        for name in batch.values():
+            err = ValueError("operation missing from the /Bulk response")
+            logger.error(f"failed to delete {name}: {repr(err)}")
+            results.append((name, err))
+
+    return results
+
+
+def bulk_delete(scim, principals, resource=USERS, dry_run=False,
+                max_deletions=100, bulk=False, batch_size=50, max_workers=8):
+    """delete principals through SCIM /Bulk requests or concurrent DELETE calls.
+    matches are collected before deleting since deleting while paging
+    shifts the SCIM startIndex.
+
+    :param scim: databricks SCIM API
+    :type scim: api.SCIM
+    :param principals: (name, id) tuples, e.g. from iter_principals
+    :type principals: iterable(tuple)
+    :param resource: USERS or SERVICE_PRINCIPALS
+    :type resource: str
+    :param dry_run: only log the principals that would be deleted
+    :type dry_run: bool
+    :param max_deletions: abort before deleting anything if more principals match
+    :type max_deletions: int
+    :param bulk: use SCIM /Bulk requests of batch_size operations
+    :type bulk: bool
+    :param batch_size: operations per /Bulk request
+    :type batch_size: int
+    :param max_workers: concurrent DELETE calls when not using bulk
+    :type max_workers: int
+
+    :return: (name, error) tuples. error is None on success
+    :type return: list(tuple)
+    """
+    url, _ = _resource_info(scim, resource)
+    principals = list(principals)
+    logger.warning(f"{len(principals)} {resource} matched for deletion")
+
+    CleanupGuard(max_deletions=max_deletions).check(resource, len(principals))
+
+    if dry_run:
+        for name, _ in principals:
+            logger.info(f"[dry run] would delete {name}")
+        return []
+
+    if bulk:
+        return _delete_bulk(scim, principals, resource, batch_size)
+
+    return _delete_concurrent(scim, principals, url, max_workers)
+
+
+def main(token, host, user_list=[], domain="", app_ids=[], all_spn=False,
+         dry_run=False, max_deletions=100, bulk=False, max_workers=8):
+    """main function to delete users and service principals.
+    either list of users or domain to delete users,
+    list of application ids or all_spn to delete service principals.
     """
     kwargs = {"token": token,
               "host": host}
     scim = SCIM(**kwargs)
-    if user_list and len(user_list > 0):
-        for user in user_list:
-            r = scim.delete_user(user)
-            logger.debug(r)
-            logger.info(f"deleted user {user}")
+    delete_kwargs = {"dry_run": dry_run,
+                     "max_deletions": max_deletions,
+                     "bulk": bulk,
+                     "max_workers": max_workers}
+
+    if user_list:
+        bulk_delete(scim, iter_principals(scim, USERS, names=user_list),
+                    USERS, **delete_kwargs)
     elif domain:
         if not isinstance(domain, str):
             raise ValueError("domain provided but not a string.")
 
-        user_list = scim.get_multiple_users(domain)
-        for user in user_list:
-            username = user["userName"]
-            userid = user["id"]
-            r = scim.delete_user(None, userid=userid)
-            logger.debug(r)
-            logger.info(f"deleted user {username}")
+        bulk_delete(scim, iter_principals(scim, USERS,
+                                          scim_filter=f"userName co {domain}"),
+                    USERS, **delete_kwargs)
 
+    if app_ids or all_spn:
+        bulk_delete(scim, iter_principals(scim, SERVICE_PRINCIPALS, names=app_ids),
+                    SERVICE_PRINCIPALS, **delete_kwargs)
 
-if __name__ == "__main__":
+
+def run(args):
+    """delete users and service principals from command line arguments
+
+    :param args: command line arguments of parse_cmdline(cmd_type="DELETE")
+    :type args: argparse.Namespace
+    """
     start = timer()
 
-    args = parse_cmdline()
     if args.debug:
         logging.getLogger(LOGGER_NAME).setLevel(logging.DEBUG)
 
-    user_list = []
-    # WARNING: include the @ symbol for domain. 
+    # WARNING: include the @ symbol for domain.
     # otherwise you will delete bocqa users in dev by accident
-    domain = "@domain.ca"
-
-    main(token=args.personal_access_token,
+    main(token=register_args(args),
          host=args.workspace_url,
-         user_list=user_list,
-         domain=domain)
+         user_list=args.user,
+         domain=args.domain,
+         app_ids=args.application_id,
+         all_spn=args.all_spn,
+         dry_run=args.dry_run,
+         max_deletions=args.max_deletions,
+         bulk=args.bulk,
+         max_workers=args.max_workers)
 
     end = timer()
     runtime = str(datetime.timedelta(seconds=end-start))
     logger.info(f"EXECUTION TIME = {runtime}") # Time in seconds, e.g. 5.38091952400282
+
+
+if __name__ == "__main__":
+    run(parse_cmdline(cmd_type="DELETE"))
@@ -0,0 +1,313 @@
+"""export of an existing workspace as ACL.yaml, clusterconf.yaml and clusterlib.yaml.
+groups with their members, service principals, secret scope ACLs, clusters with
+their permissions and libraries, and root folder permissions are read with
+concurrent paginated listings. the files have the shape acl.main and
+ClusterManagement.main consume, so the first deploy of an onboarded workspace
+changes and deletes nothing. server defaults and generated fields are stripped.
+"""
+import datetime
+import json
+import os
+from collections import defaultdict
+from timeit import default_timer as timer
+
+from databricks_api.acl import IGNORED_FOLDERS
+from databricks_api.api import (SCIM, Listings, Secrets, Libraries, Workspace,
+                                ClusterPermissions, DirectoryPermissions)
+from databricks_api.auth import register_args
+from databricks_api.base import configure_transport
+from databricks_api.permissions import permission_state
+from databricks_api.utils import (parse_cmdline, dump_yaml, fan_out, logger, logging,
+                                  LOGGER_NAME)
+
+# clusters/create fields, everything else of clusters/list is generated
+CLUSTER_KEYS = ["cluster_name", "spark_version", "node_type_id", "driver_node_type_id",
+                "num_workers", "autoscale", "instance_pool_id", "driver_instance_pool_id",
+                "policy_id", "spark_conf", "spark_env_vars", "custom_tags",
+                "autotermination_minutes", "init_scripts", "cluster_log_conf",
+                "ssh_public_keys", "single_user_name", "data_security_mode",
+                "runtime_engine", "enable_elastic_disk", "enable_local_disk_encryption",
+                "azure_attributes", "aws_attributes", "gcp_attributes", "docker_image"]
+# values the server sets when a field is not given
+CLUSTER_DEFAULTS = {"autotermination_minutes": 0,
+                    "enable_elastic_disk": True,
+                    "enable_local_disk_encryption": False,
+                    "data_security_mode": "NONE",
+                    "runtime_engine": "STANDARD",
+                    "azure_attributes": {"first_on_demand": 1,
+                                         "availability": "ON_DEMAND_AZURE",
+                                         "spot_bid_max_price": -1.0}}
+# ACL.yaml key of the principals of a Permissions API principal type
+ACL_KEYS = {"group_name": "group", "user_name": "user",
+            "service_principal_name": "service_principal"}
+IGNORED_GROUPS = ["users"]
+
+
+def cluster_spec(cluster):
+    """clusterconf.yaml entry of a clusters/list item
+    """
+    spec = {k: cluster[k] for k in CLUSTER_KEYS
+            if k in cluster and cluster[k] not in (None, {}, [])
+            and cluster[k] != CLUSTER_DEFAULTS.get(k)}
+    if "autoscale" in spec:
+        spec.pop("num_workers", None)
+    if spec.get("driver_node_type_id") == spec.get("node_type_id"):
+        spec.pop("driver_node_type_id", None)
+    if spec.get("driver_instance_pool_id") == spec.get("instance_pool_id"):
+        spec.pop("driver_instance_pool_id", None)
+    if "instance_pool_id" in spec:
+        # node types come from the pools
+        spec.pop("node_type_id", None)
+        spec.pop("driver_node_type_id", None)
+    return spec
+
+
+def acl_config(state):
+    """acl of an ACL.yaml entry, e.g. [{"permission": "CAN_MANAGE", "group": [...]}]
+
+    :param state: non inherited entries, see permissions.permission_state
+    :type state: frozenset(principals.AclEntry)
+    """
+    grouped = defaultdict(list)
+    for entry in state:
+        grouped[(entry.permission, ACL_KEYS[entry.principal_type])].append(entry.principal)
+    return [{"permission": permission, key: sorted(principals)}
+            for (permission, key), principals in sorted(grouped.items())]
+
+
+def scope_acl_config(items):
+    """acl of a SECRETS entry of a Secrets API list-acls response
+    """
+    grouped = defaultdict(list)
+    for item in items or []:
+        grouped[item["permission"]].append(item["principal"])
+    return [{"permission": permission, "group": sorted(principals)}
+            for permission, principals in sorted(grouped.items())]
+
+
+def group_config(group, users, spns, groups):
+    """GROUPS entry of a SCIM group
+
+    :param group: SCIM group with id, displayName and members
+    :type group: dict
+    :param users: userName by SCIM id
+    :type users: dict
+    :param spns: (applicationId, displayName) by SCIM id
+    :type spns: dict
+    :param groups: displayName of exported groups by SCIM id
+    :type groups: dict
+    """
+    name = group["displayName"]
+    user_members, spn_members, group_members = [], [], []
+    for member in group.get("members") or []:
+        member_id = member.get("value")
+        if member_id in users:
+            user_members.append({"user_name": users[member_id]})
+        elif member_id in spns:
+            app_id, display_name = spns[member_id]
+            spn_members.append({"application_id": app_id, "display_name": display_name})
+        elif member_id in groups:
+            group_members.append({"group_name": groups[member_id]})
+        else:
+            logger.warning(f"group {name}: member {member.get('display') or member_id} not exported")
+
+    if spn_members and not user_members:
+        group_type, members = "spn", spn_members
+    elif user_members or not group_members:
+        group_type, members = "user", user_members
+        if spn_members:
+            # a group has one member type, deploys would remove the others
+            logger.warning(f"group {name} has users and service principals, "
+                           f"service principals not exported: "
+                           f"{[m['application_id'] for m in spn_members]}")
+    else:
+        group_type, members = "group", []
+
+    members = sorted(members, key=lambda m: m.get("user_name") or m.get("application_id"))
+    return {"name": name, "type": group_type,
+            "members": members + sorted(group_members, key=lambda m: m["group_name"])}
+
+
+class WorkspaceExporter:
+    """reads the state of a workspace managed by acl.py and cluster.py
+    """
+
+    def __init__(self, max_workers=16, **kwargs):
+        """
+        :param max_workers: concurrent requests per listing
+        :type max_workers: int
+        :param **kwargs: token, host
+        :type **kwargs: dict
+        """
+        self.max_workers = max_workers
+        self.scim = SCIM(**kwargs)
+        self.listings = Listings(**kwargs)
+        self.secrets = Secrets(**kwargs)
+        self.libraries = Libraries(**kwargs)
+        self.workspace = Workspace(**kwargs)
+        self.cluster_perm = ClusterPermissions(**kwargs)
+        self.directory_perm = DirectoryPermissions(**kwargs)
+
+    def _fan_out(self, func, items, kind):
+        """{item: func(item)}. any failure fails the export, a missing
+        folder or scope would be deleted or cleared by the next deploy
+        """
+        results, errors = {}, []
+        for item, result, err in fan_out(func, items, max_workers=self.max_workers):
+            if err:
+                errors.append(f"{item}: {repr(err)}")
+            else:
+                results[item] = result
+        if errors:
+            raise ValueError(f"reading {kind} failed: {errors}")
+        return results
+
+    def groups(self):
+        """GROUPS of ACL.yaml
+        """
+        scim = self.scim
+        attributes = {scim.groups_url: "id,displayName,members",
+                      scim.users_url: "id,userName",
+                      scim.sp_url: "id,applicationId,displayName"}
+        listings = self._fan_out(
+            lambda url: scim.list_resources(url, attributes[url], max_workers=self.max_workers),
+            list(attributes), "SCIM listing")
+        scim_groups = [g for g in listings[scim.groups_url]
+                       if g["displayName"] not in IGNORED_GROUPS]
+        users = {u["id"]: u["userName"] for u in listings[scim.users_url]}
+        spns = {s["id"]: (s["applicationId"], s.get("displayName"))
+                for s in listings[scim.sp_url]}
+        groups = {g["id"]: g["displayName"] for g in scim_groups}
+
+        return sorted((group_config(g, users, spns, groups) for g in scim_groups),
+                      key=lambda g: g["name"])
+
+    def secret_scopes(self):
+        """SECRETS of ACL.yaml
+        """
+        scopes = [s["name"] for s in self.listings.iter_scopes()]
+        acls = self._fan_out(lambda scope: self.secrets.list_acls(scope).get("items"),
+                             scopes, "scope ACL")
+        return [{"scope": scope, "acl": scope_acl_config(acls[scope])}
+                for scope in sorted(acls)]
+
+    def clusters(self):
+        """clusterconf.yaml, CLUSTERS of ACL.yaml and clusterlib.yaml
+
+        :return: cluster config, cluster ACL section and cluster libraries
+        :type return: tuple(list, list, list)
+        """
+        clusters = [c for c in self.listings.iter_clusters()
+                    if c.get("cluster_source", "").upper() != "JOB"]
+        by_id = {c["cluster_id"]: c for c in clusters}
+        names = [c["cluster_name"] for c in clusters]
+        duplicates = sorted({n for n in names if names.count(n) > 1})
+        if duplicates:
+            logger.warning(f"cluster names used more than once, deploys manage one of each: {duplicates}")
+
+        permissions = self._fan_out(
+            lambda cluster_id: permission_state(self.cluster_perm.get_permissions(cluster_id)),
+            list(by_id), "cluster permissions")
+        cluster_config = sorted((cluster_spec(c) for c in clusters),
+                                key=lambda c: c["cluster_name"])
+        cluster_acl = [{"name": by_id[i]["cluster_name"], "acl": acl_config(state)}
+                       for i, state in permissions.items() if state]
+
+        return (cluster_config, sorted(cluster_acl, key=lambda c: c["name"]),
+                self.cluster_libraries(by_id))
+
+    def cluster_libraries(self, clusters):
+        """clusterlib.yaml. it is installed on every cluster, so it is the
+        union of the libraries of the clusters
+        """
+        statuses = self.libraries.all_cluster_statuses().get("statuses") or []
+        installed = {}
+        for status in statuses:
+            if status["cluster_id"] not in clusters:
+                continue
+            installed[status["cluster_id"]] = [
+                lib["library"] for lib in status.get("library_statuses") or []
+                if not lib.get("is_library_for_all_clusters")
+                and lib.get("status") != "UNINSTALL_ON_RESTART"]
+
+        union = {}
+        for libraries in installed.values():
+            for lib in libraries:
+                union.setdefault(json.dumps(lib, sort_keys=True), lib)
+        gaining = sorted(clusters[i]["cluster_name"] for i in clusters
+                         if len(installed.get(i, [])) < len(union))
+        if gaining:
+            logger.warning(f"clusterlib.yaml is installed on every cluster, "
+                           f"these clusters gain libraries on deploy: {gaining}")
+        return list(union.values())
+
+    def folders(self):
+        """WORKSPACE of ACL.yaml: the root folder if it has an ACL and every
+        folder under it. unlisted root folders are deleted by acl deploys
+        """
+        objects = [o for o in self.listings.iter_objects("/")
+                   if o["path"].rsplit("/", 1)[-1] not in IGNORED_FOLDERS]
+        others = [o["path"] for o in objects if o.get("object_type") != "DIRECTORY"]
+        if others:
+            logger.warning(f"root objects that are not folders are deleted by acl deploys: {others}")
+
+        folders = {o["path"]: o["object_id"] for o in objects if o.get("object_type") == "DIRECTORY"}
+        folders["/"] = self.workspace.get_status("/")["object_id"]
+        states = self._fan_out(
+            lambda path: permission_state(self.directory_perm.get_permissions(folders[path])),
+            list(folders), "folder permissions")
+        return [{"folder": path, "acl": acl_config(states[path])}
+                for path in sorted(states) if path != "/" or states[path]]
+
+    def export(self):
+        """read the workspace, the sections concurrently
+
+        :return: ACL.yaml, clusterconf.yaml and clusterlib.yaml content
+        :type return: tuple(dict, list, list)
+        """
+        sections = {"GROUPS": self.groups, "SECRETS": self.secret_scopes,
+                    "CLUSTERS": self.clusters, "WORKSPACE": self.folders}
+        results = {}
+        for section, result, err in fan_out(lambda s: sections[s](), list(sections),
+                                            max_workers=len(sections)):
+            if err:
+                raise ValueError(f"exporting {section} failed: {repr(err)}")
+            results[section] = result
+
+        cluster_config, cluster_acl, cluster_libraries = results.pop("CLUSTERS")
+        acl = {"GROUPS": results["GROUPS"], "SECRETS": results["SECRETS"],
+               "CLUSTERS": cluster_acl, "WORKSPACE": results["WORKSPACE"]}
+        return acl, cluster_config, cluster_libraries
+
+
+def run(args):
+    """export a workspace to configuration files
+
+    :param args: command line arguments of parse_cmdline(cmd_type="EXPORT")
+    :type args: argparse.Namespace
+    """
+    start = timer()
+    if args.debug:
+        logging.getLogger(LOGGER_NAME).setLevel(logging.DEBUG)
+
+    configure_transport(args.workspace_url, pool_size=max(32, args.max_workers),
+                        max_concurrency=args.max_workers)
+    exporter = WorkspaceExporter(max_workers=args.max_workers,
+                                 token=register_args(args), host=args.workspace_url)
+    acl, cluster_config, cluster_libraries = exporter.export()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for filename, data in [(args.acl_file, acl),
+                           (args.cluster_config_file, cluster_config),
+                           (args.cluster_library_file, cluster_libraries)]:
+        dump_yaml(data, os.path.join(args.output_dir, filename))
+    logger.info(f"exported {len(acl['GROUPS'])} groups, {len(acl['SECRETS'])} scopes, "
+                f"{len(cluster_config)} clusters, {len(acl['WORKSPACE'])} folders "
+                f"to {args.output_dir}")
+
+    runtime = str(datetime.timedelta(seconds=timer() - start))
+    logger.info(f"EXECUTION TIME = {runtime}")
+
+
+if __name__ == "__main__":
+    run(parse_cmdline(cmd_type="EXPORT"))
@@ -0,0 +1,120 @@
+"""durable run journal for resumable deployments.
+every completed unit of work (group synced, scope reconciled, cluster ready,
+library installed) is appended to a jsonl file named after the run id.
+"""
+import datetime
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+from databricks_api.utils import logger
+
+DEFAULT_JOURNAL_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "databricks_api", "runs")
+
+
+def fingerprint(config):
+    """stable hash of the desired configuration of a unit
+    """
+    return hashlib.sha256(
+        json.dumps(config, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+class RunJournal:
+    """append-only journal of completed units of one run
+
+    a unit is skipped on resume when it was recorded with the same configuration
+    fingerprint and its optional validation still passes.
+    """
+
+    def __init__(self, run_id=None, directory=DEFAULT_JOURNAL_DIR, resume=False):
+        """
+        :param run_id: id of the run. a new id is generated if not given
+        :type run_id: str
+        :param directory: folder of the journal files
+        :type directory: str
+        :param resume: load the completed units of run_id
+        :type resume: bool
+        """
+        if resume and not run_id:
+            raise ValueError("resume needs a run id")
+
+        self.run_id = run_id or (
+            datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:8])
+        self.path = os.path.join(directory, f"{self.run_id}.jsonl")
+        self._lock = threading.Lock()
+        self._done = {}
+
+        if resume:
+            if not os.path.exists(self.path):
+                raise ValueError(f"no journal for run {self.run_id} in {directory}")
+            with open(self.path) as f:
+                for line in f:
+                    # a crash can leave a partially written last line
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._done[(entry["kind"], entry["name"])] = entry
+            logger.info(f"resuming run {self.run_id}: {len(self._done)} units completed")
+        else:
+            os.makedirs(directory, exist_ok=True)
+            logger.info(f"run id {self.run_id}. resume with --resume {self.run_id}")
+
+    def details(self, kind, name):
+        """recorded entry of a completed unit, None if not completed
+        """
+        return self._done.get((kind, name))
+
+    def completed(self):
+        """entries of all completed units
+        """
+        return list(self._done.values())
+
+    def skip(self, kind, name, config=None, validate=None):
+        """True if the unit completed with the same configuration and validate() passes
+
+        :param kind: unit type, e.g. group, scope, cluster
+        :type kind: str
+        :param name: unit name
+        :type name: str
+        :param config: desired configuration of the unit
+        :type config: any
+        :param validate: cheap check the unit result still exists, gets the entry
+        :type validate: callable
+        """
+        entry = self.details(kind, name)
+        if not entry or entry["fingerprint"] != fingerprint(config):
+            return False
+
+        if validate:
+            try:
+                if not validate(entry):
+                    return False
+            except Exception as err:
+                logger.debug(f"journal validation of {kind} {name} failed: {repr(err)}")
+                return False
+
+        logger.info(f"skipping completed {kind} {name} of run {self.run_id}")
+        return True
+
+    def record(self, kind, name, config=None, **details):
+        """durably record a completed unit
+
+        :param details: json serializable results needed on resume, e.g. cluster_id
+        :type details: dict
+        """
+        entry = {"kind": kind,
+                 "name": name,
+                 "fingerprint": fingerprint(config),
+                 "completed_at": datetime.datetime.now().isoformat(),
+                 **details}
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._done[(kind, name)] = entry
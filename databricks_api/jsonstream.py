@@ -0,0 +1,133 @@
+"""incremental decoding of large JSON list responses.
+the items of one top-level array field, e.g. clusters, objects or Resources,
+are yielded one at a time while the body is read in chunks, so neither the raw
+body nor the whole list is held in memory. the other top-level fields, e.g.
+totalResults or has_more, are collected into meta.
+"""
+import codecs
+import json
+
+# consumed characters are dropped from the buffer once they exceed this
+COMPACT_SIZE = 1 << 16
+WHITESPACE = " \t\n\r"
+
+
+class ArrayStream:
+    """iterator over the items of a top-level array field of a JSON object
+
+    a missing field yields nothing. meta holds the other top-level fields
+    read so far, all of them once the iterator is exhausted.
+    """
+
+    def __init__(self, chunks, field):
+        """
+        :param chunks: body chunks, bytes or str
+        :type chunks: iterable
+        :param field: top-level array field, e.g. clusters
+        :type field: str
+        """
+        self.field = field
+        self.meta = {}
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._items = self._parse()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._items)
+
+    # -- buffer
+
+    def _fill(self):
+        """read one more chunk. False at the end of the body
+        """
+        if self._eof:
+            return False
+        if self._pos > COMPACT_SIZE:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        for chunk in self._chunks:
+            if isinstance(chunk, bytes):
+                chunk = self._decoder.decode(chunk)
+            if chunk:
+                self._buf += chunk
+                return True
+        self._buf += self._decoder.decode(b"", final=True)
+        self._eof = True
+        return False
+
+    def _peek(self):
+        """next non-whitespace character, None at the end of the body
+        """
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return None
+
+    def _expect(self, chars):
+        char = self._peek()
+        if char is None or char not in chars:
+            raise ValueError(f"expected {chars!r} at {self._pos} of the {self.field} "
+                             f"response, got {char!r}")
+        self._pos += 1
+        return char
+
+    def _value(self):
+        """decode the next JSON value. a value ending with the buffer, e.g. a
+        number, may continue in the next chunk, so it is decoded again after
+        reading more
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            if end == len(self._buf) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    # -- parser
+
+    def _parse(self):
+        yield from self._object()
+        # read to the end of the body so the chunk source finishes, e.g. a
+        # capture records the listing once its body is complete
+        while self._fill():
+            pass
+
+    def _object(self):
+        if self._peek() is None:
+            return
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key == self.field and self._peek() == "[":
+                self._pos += 1
+                if self._peek() == "]":
+                    self._pos += 1
+                else:
+                    while True:
+                        yield self._value()
+                        if self._expect(",]") == "]":
+                            break
+            else:
+                self.meta[key] = self._value()
+            if self._expect(",}") == "}":
+                return
@@ -0,0 +1,178 @@
+"""group membership graph for nested groups.
+nodes are (kind, name) tuples: ("group", name), ("user", user_name) or
+("spn", application_id). edges point from a group to its direct members.
+"""
+from collections import defaultdict
+
+from databricks_api.principals import principal
+
+GROUP = "group"
+USER = "user"
+SPN = "spn"
+
+
+class CycleError(ValueError):
+    """groups are members of each other
+    """
+
+
+def member_node(member, kind=USER):
+    """graph node of a member entry of ACL.yaml or of GroupsApi.list_members
+
+    :param member: e.g. {"user_name": "a"}, {"application_id": "b"}, {"group_name": "c"}
+    :type member: dict
+    :param kind: kind of user_name entries. list_members returns
+        service principals as user_name
+    :type kind: str
+    """
+    if member.get("group_name"):
+        return principal(GROUP, member["group_name"])
+    if member.get("application_id"):
+        return principal(SPN, member["application_id"])
+    return principal(kind, member["user_name"])
+
+
+class MembershipGraph:
+    """direct membership edges with cycle detection and a cached transitive closure
+    """
+
+    def __init__(self):
+        self._members = defaultdict(set)
+        self._closure = {}
+
+    @classmethod
+    def from_config(cls, groups_config):
+        """graph of GROUPS in ACL.yaml
+
+        :param groups_config: GROUPS in ACL.yaml
+        :type groups_config: list(dict)
+        """
+        graph = cls()
+        for grp in groups_config:
+            graph.add_group(grp["name"])
+            kind = SPN if grp.get("type") == SPN else USER
+            for member in grp.get("members") or []:
+                graph.add_member(grp["name"], member_node(member, kind))
+
+        return graph
+
+    def add_group(self, group):
+        self._members[group]
+        self._closure.clear()
+
+    def add_member(self, group, node):
+        self._members[group].add(node)
+        if node[0] == GROUP:
+            self._members[node[1]]
+        self._closure.clear()
+
+    def remove_member(self, group, node):
+        self._members[group].discard(node)
+        self._closure.clear()
+
+    @property
+    def groups(self):
+        return list(self._members)
+
+    def direct_members(self, group):
+        return set(self._members.get(group, ()))
+
+    def child_groups(self, group):
+        return sorted(name for kind, name in self._members.get(group, ()) if kind == GROUP)
+
+    def components(self):
+        """groups connected through nesting, ignoring the edge direction
+
+        :return: sets of group names
+        :type return: list(set)
+        """
+        neighbours = defaultdict(set)
+        for group in self._members:
+            for child in self.child_groups(group):
+                neighbours[group].add(child)
+                neighbours[child].add(group)
+
+        components, seen = [], set()
+        for root in sorted(self._members):
+            if root in seen:
+                continue
+            component, stack = set(), [root]
+            while stack:
+                group = stack.pop()
+                if group in component:
+                    continue
+                component.add(group)
+                stack.extend(neighbours[group] - component)
+            seen |= component
+            components.append(component)
+
+        return components
+
+    def check_cycles(self):
+        """raise CycleError naming the groups of the first cycle found
+        """
+        self.topological_order()
+
+    def topological_order(self):
+        """groups ordered so every child group comes before its parents
+
+        :return: group names
+        :type return: list(str)
+        """
+        order = []
+        state = {}
+        for root in sorted(self._members):
+            if root in state:
+                continue
+
+            # iterative depth first search, state 1 = on the stack, 2 = done
+            stack = [(root, iter(self.child_groups(root)))]
+            state[root] = 1
+            while stack:
+                group, children = stack[-1]
+                child = next(children, None)
+                if child is None:
+                    stack.pop()
+                    state[group] = 2
+                    order.append(group)
+                elif state.get(child) == 1:
+                    path = [g for g, _ in stack]
+                    cycle = path[path.index(child):] + [child]
+                    raise CycleError(f"nested group cycle: {' -> '.join(cycle)}")
+                elif child not in state:
+                    state[child] = 1
+                    stack.append((child, iter(self.child_groups(child))))
+
+        return order
+
+    def effective_members(self, group):
+        """users and service principals of group and all its nested groups.
+        closures are cached until the graph changes
+
+        :return: (kind, name) nodes
+        :type return: frozenset
+        """
+        if not self._closure:
+            for g in self.topological_order():
+                members = set()
+                for node in self._members[g]:
+                    if node[0] == GROUP:
+                        members |= self._closure[node[1]]
+                    else:
+                        members.add(node)
+                self._closure[g] = frozenset(members)
+
+        return self._closure.get(group, frozenset())
+
+    def effective_diff(self, current, group):
+        """effective members to gain and lose when current becomes this graph
+
+        :param current: graph of the current workspace memberships
+        :type current: MembershipGraph
+
+        :return: (added, removed) sets of (kind, name) nodes
+        :type return: tuple
+        """
+        desired = self.effective_members(group)
+        existing = current.effective_members(group)
+        return desired - existing, existing - desired
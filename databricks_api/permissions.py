@@ -0,0 +1,366 @@
+"""permissions engine for every object type of the Permissions API.
+each ACL.yaml section goes through one pipeline: resolve object ids in bulk,
+fetch the current ACLs concurrently, diff, and apply only the objects that changed.
+"""
+import threading
+import time
+
+from databricks_api.api import (ClusterPermissions, DirectoryPermissions, NotebookPermissions,
+                                JobPermissions, InstancePools, InstancePoolPermissions,
+                                ClusterPolicyPermissions, TokenPermissions)
+from databricks_api.base import APIBase
+from databricks_api.principals import acl_entry
+from databricks_api.utils import fan_out, logger
+
+PRINCIPAL_KEYS = ["group_name", "user_name", "service_principal_name"]
+
+
+def entry_state(entry):
+    """AclEntry of one parsed access control list entry, None without principal
+    """
+    for key in PRINCIPAL_KEYS:
+        if entry.get(key):
+            return acl_entry(key, entry[key], entry["permission_level"])
+    return None
+
+
+def acl_state(acl):
+    """frozenset of principals.AclEntry of a parsed access control list
+    """
+    return frozenset(s for s in map(entry_state, acl) if s)
+
+
+def permission_state(permissions):
+    """frozenset of non inherited principals.AclEntry of a Permissions API response
+    """
+    state = []
+    for acl in permissions.get("access_control_list", []):
+        key = next((key for key in PRINCIPAL_KEYS if acl.get(key)), None)
+        if key is None:
+            continue
+        for perm in acl.get("all_permissions", []):
+            if not perm.get("inherited"):
+                state.append(acl_entry(key, acl[key], perm["permission_level"]))
+    return frozenset(state)
+
+
+class ObjectType:
+    """an ACL.yaml section managed by the engine
+    """
+
+    def __init__(self, section, kind, name_key, permissions_class, resolver,
+                 cache_kind=None):
+        """
+        :param section: ACL.yaml section, e.g. JOBS
+        :type section: str
+        :param kind: journal and shard unit type
+        :type kind: str
+        :param name_key: key of the object name in a section entry
+        :type name_key: str
+        :param permissions_class: PermissionsBase subclass of the object type
+        :type permissions_class: type
+        :param resolver: PermissionsEngine method resolving names to object ids
+        :type resolver: str
+        :param cache_kind: object kind in the inventory cache. None is not cached
+        :type cache_kind: str
+        """
+        self.section = section
+        self.kind = kind
+        self.name_key = name_key
+        self.permissions_class = permissions_class
+        self.resolver = resolver
+        self.cache_kind = cache_kind
+
+
+# deployed in this order
+OBJECT_TYPES = {t.section: t for t in [
+    ObjectType("CLUSTERS", "cluster_acl", "name", ClusterPermissions,
+               "_resolve_clusters", cache_kind="cluster"),
+    ObjectType("WORKSPACE", "folder", "folder", DirectoryPermissions,
+               "_resolve_directories", cache_kind="directory"),
+    ObjectType("NOTEBOOKS", "notebook", "path", NotebookPermissions,
+               "_resolve_notebooks", cache_kind="notebook"),
+    ObjectType("JOBS", "job", "name", JobPermissions, "_resolve_jobs"),
+    ObjectType("INSTANCE_POOLS", "instance_pool", "name", InstancePoolPermissions,
+               "_resolve_instance_pools"),
+    ObjectType("CLUSTER_POLICIES", "cluster_policy", "name", ClusterPolicyPermissions,
+               "_resolve_cluster_policies"),
+    ObjectType("TOKENS", "tokens", "name", TokenPermissions, "_resolve_tokens"),
+]}
+
+
+class PermissionsEngine(APIBase):
+    """deploys the ACL of any section in OBJECT_TYPES with shared
+    concurrency and retry settings
+    """
+
+    def __init__(self, max_workers=8, retries=3, backoff=1.0, cache=None, **kwargs):
+        """
+        :param max_workers: concurrent requests per pipeline step
+        :type max_workers: int
+        :param retries: retries of a failed request
+        :type retries: int
+        :param backoff: seconds before the first retry, doubled on every retry
+        :type backoff: float
+        :param cache: optional inventory cache for object ids
+        :type cache: cache.InventoryCache
+        """
+        super().__init__(**kwargs)
+        self._kwargs = {"token": self.token, "host": self.host}
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.cache = cache
+        self._clients = {}
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def client(self, section):
+        """permissions client of a section, created on first use
+        """
+        with self._lock:
+            if section not in self._clients:
+                self._clients[section] = OBJECT_TYPES[section].permissions_class(
+                    request_cache=self.request_cache, **self._kwargs)
+            return self._clients[section]
+
+    def retry(self, func, *args):
+        """func(*args), retried with exponential backoff
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                return func(*args)
+            except Exception as err:
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                logger.debug(f"{repr(err)}, retrying in {delay}s")
+                time.sleep(delay)
+
+    @staticmethod
+    def entries(section, config):
+        """entries of an ACL.yaml section. TOKENS is a plain acl list of the
+        single tokens object
+        """
+        if section == "TOKENS":
+            return [{"name": "tokens", "acl": config}]
+        return config or []
+
+    # -- id resolution. one list call per object type where the API has one
+
+    def _list_all(self, url, field, params=None):
+        # streamed, only the ids of the named objects are kept
+        return self.stream(url, field, params=params)
+
+    def _resolve_clusters(self, names):
+        clusters = self._list_all(f"{self.api_url}/clusters/list", "clusters")
+        return {c["cluster_name"]: c["cluster_id"] for c in clusters
+                if c["cluster_name"] in names}
+
+    def _workspace_status(self, path):
+        return self.request(f"{self.api_url}/workspace/get-status",
+                            params={"path": path}, request_type="get")
+
+    def _resolve_paths(self, names, object_type, create=False):
+        def status(path):
+            try:
+                return self._workspace_status(path)
+            except Exception as err:
+                if not create:
+                    raise
+                logger.info(f"creating folder {path} ({repr(err)})")
+                self.request(f"{self.api_url}/workspace/mkdirs",
+                             body={"path": path}, request_type="post")
+                return self._workspace_status(path)
+
+        ids = {}
+        for path, result, err in fan_out(status, names, max_workers=self.max_workers):
+            if err:
+                logger.error(f"{path}: {repr(err)}")
+            elif result.get("object_type") != object_type:
+                logger.error(f"path {path} is not a {object_type.lower()}")
+            else:
+                ids[path] = result["object_id"]
+        return ids
+
+    def _resolve_directories(self, names):
+        return self._resolve_paths(names, "DIRECTORY", create=True)
+
+    def _resolve_notebooks(self, names):
+        return self._resolve_paths(names, "NOTEBOOK")
+
+    def _resolve_jobs(self, names):
+        ids, offset = {}, 0
+        while True:
+            page = self.request(f"{self.host}/api/2.1/jobs/list",
+                                params={"limit": 25, "offset": offset},
+                                request_type="get", memoize=False)
+            for job in page.get("jobs") or []:
+                name = job.get("settings", {}).get("name")
+                if name in names:
+                    if name in ids:
+                        logger.warning(f"several jobs named {name}, using job {ids[name]}")
+                        continue
+                    ids[name] = job["job_id"]
+            if not page.get("has_more"):
+                return ids
+            offset += len(page.get("jobs") or [])
+
+    def _resolve_instance_pools(self, names):
+        pools = InstancePools(request_cache=self.request_cache, **self._kwargs)
+        return {p["instance_pool_name"]: p["instance_pool_id"]
+                for p in pools.list_instance_pools() if p["instance_pool_name"] in names}
+
+    def _resolve_cluster_policies(self, names):
+        policies = self._list_all(f"{self.api_url}/policies/clusters/list", "policies")
+        return {p["name"]: p["policy_id"] for p in policies if p["name"] in names}
+
+    def _resolve_tokens(self, names):
+        return {"tokens": "tokens"} if "tokens" in names else {}
+
+    def resolve(self, section, names):
+        """object ids by name. names that don't resolve are left out
+
+        :return: object ids by name
+        :type return: dict
+        """
+        object_type = OBJECT_TYPES[section]
+        ids = {n: self._ids[(section, n)] for n in names if (section, n) in self._ids}
+        if self.cache and object_type.cache_kind:
+            for name in names:
+                if name not in ids:
+                    object_id = self.cache.get_object_id(object_type.cache_kind, name)
+                    if object_id:
+                        ids[name] = object_id
+
+        missing = [n for n in names if n not in ids]
+        if missing:
+            resolved = self.retry(getattr(self, object_type.resolver), missing)
+            if self.cache and object_type.cache_kind:
+                for name, object_id in resolved.items():
+                    self.cache.put_object(object_type.cache_kind, name, object_id)
+            ids.update(resolved)
+
+        for name in names:
+            if name not in ids:
+                logger.error(f"{object_type.kind} {name} not found")
+        self._ids.update({(section, n): i for n, i in ids.items()})
+        return ids
+
+    def forget(self, section, name):
+        """drop the resolved id of an object, e.g. after it was recreated
+        """
+        self._ids.pop((section, name), None)
+        object_type = OBJECT_TYPES[section]
+        if self.cache and object_type.cache_kind:
+            self.cache.invalidate_object(object_type.cache_kind, name)
+
+    # -- diff and apply
+
+    def current(self, section, object_id):
+        """current permissions response of an object
+        """
+        return self.retry(self.client(section).get_permissions, object_id)
+
+    def desired(self, section, entry, existing):
+        """parsed acl and state of an entry. current entries of preserved
+        permission levels, e.g. the job owner, are kept unless the entry names one
+
+        :param existing: current state, see permission_state
+        :type existing: set
+
+        :return: (acl, state)
+        :type return: tuple
+        """
+        client = self.client(section)
+        acl = client._parse_acl(entry["acl"])
+        desired = acl_state(acl)
+        levels = {d.permission for d in desired}
+        preserved = [e for e in sorted(existing)
+                     if e.permission in client.preserved_permissions
+                     and e.permission not in levels]
+        for key, name, level in preserved:
+            acl.append({key: name, "permission_level": level})
+        return acl, desired | frozenset(preserved)
+
+    def plan(self, section, entry, current):
+        """change of one object
+
+        :param entry: section entry with an acl
+        :type entry: dict
+        :param current: current permissions response of the object
+        :type current: dict
+
+        :return: None if unchanged, else (request_type, acl, added, removed)
+        :type return: tuple
+        """
+        existing = permission_state(current)
+        acl, desired = self.desired(section, entry, existing)
+
+        added, removed = desired - existing, existing - desired
+        if not added and not removed:
+            return None
+        if removed:
+            return "put", acl, added, removed
+        # only additions: patch the new entries
+        return "patch", [e for e in acl if entry_state(e) in added], added, removed
+
+    def deploy(self, section, config, journal=None, shard=None):
+        """resolve, fetch, diff and apply the ACL of one section
+
+        :param section: ACL.yaml section in OBJECT_TYPES
+        :type section: str
+        :param config: the section in ACL.yaml
+        :type config: list(dict)
+        :param journal: optional run journal to skip objects done by a resumed run
+        :type journal: journal.RunJournal
+        :param shard: optional shard. only its objects are deployed
+        :type shard: shard.Shard
+
+        :return: names by outcome: unchanged, applied, failed, missing
+        :type return: dict
+        """
+        object_type = OBJECT_TYPES[section]
+        logger.info(f"""
+++++++++++++++++++++++++++++++++++++++++
+{section} ACL
+++++++++++++++++++++++++++++++++++++++++
+        """)
+        entries = {}
+        for entry in self.entries(section, config):
+            name = entry[object_type.name_key]
+            if shard and not shard.owns(object_type.kind, name):
+                continue
+            if journal and journal.skip(object_type.kind, name, entry):
+                continue
+            entries[name] = entry
+
+        result = {"unchanged": [], "applied": [], "failed": [], "missing": []}
+        ids = self.resolve(section, list(entries))
+        result["missing"] = [n for n in entries if n not in ids]
+
+        def apply(name):
+            change = self.plan(section, entries[name], self.current(section, ids[name]))
+            if change:
+                request_type, acl, added, removed = change
+                logger.info({f"{object_type.kind} {name}": {
+                    "added": sorted(added), "removed": sorted(removed)}})
+                self.retry(self.client(section).apply_permissions,
+                           ids[name], acl, request_type)
+            return change
+
+        for name, change, err in fan_out(apply, [n for n in entries if n in ids],
+                                         max_workers=self.max_workers):
+            if err:
+                logger.error(f"{object_type.kind} {name} failed: {repr(err)}")
+                self.forget(section, name)
+                result["failed"].append(name)
+                continue
+
+            result["applied" if change else "unchanged"].append(name)
+            if journal:
+                journal.record(object_type.kind, name, entries[name],
+                               object_id=ids[name])
+
+        logger.info(f"{section}: " + ", ".join(f"{len(v)} {k}" for k, v in result.items()))
+        return result
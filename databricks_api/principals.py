@@ -0,0 +1,67 @@
+"""compact hashable records of principals and ACL entries for diffs.
+records are named tuples (no per instance dict) with interned strings, so the
+many copies of a principal name across groups, scopes and workspaces share one
+string, and sets of them give O(1) membership tests. being tuples they compare
+equal to the plain (kind, name) membership graph nodes.
+"""
+import sys
+from typing import NamedTuple
+
+
+def intern(name):
+    """interned name, None stays None
+    """
+    return sys.intern(name) if isinstance(name, str) else name
+
+
+class Principal(NamedTuple):
+    """member of a group: kind is group, user or spn, see membership.py
+    """
+    kind: str
+    name: str
+
+
+class AclEntry(NamedTuple):
+    """permission of a principal on a Permissions API object.
+    principal_type is group_name, user_name or service_principal_name
+    """
+    principal_type: str
+    principal: str
+    permission: str
+
+
+class ScopeAcl(NamedTuple):
+    """permission of a principal on a secret scope
+    """
+    principal: str
+    permission: str
+
+
+def principal(kind, name):
+    return Principal(intern(kind), intern(name))
+
+
+def acl_entry(principal_type, name, permission):
+    return AclEntry(intern(principal_type), intern(name), intern(permission))
+
+
+def scope_acl(name, permission):
+    return ScopeAcl(intern(name), intern(permission))
+
+
+def names(values):
+    """frozenset of interned names
+    """
+    return frozenset(intern(v) for v in values)
+
+
+def scope_acl_set(acl_config):
+    """ACL of a scope in SECRETS of ACL.yaml, e.g. [{"permission": "READ", "group": [...]}]
+    """
+    return frozenset(scope_acl(g, acl["permission"]) for acl in acl_config for g in acl["group"])
+
+
+def scope_acl_items(items):
+    """ACL of a scope in a Secrets API list-acls response
+    """
+    return frozenset(scope_acl(i["principal"], i["permission"]) for i in items or [])
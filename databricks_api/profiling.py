@@ -0,0 +1,257 @@
+"""profiling mode for acl and cluster deploys.
+phases are timed and their wall time is split into network wait (time spent
+in APIBase._send, reading streamed listings in APIBase._stream_chunks and in
+databricks_cli ApiClient.perform_query), CPU and other waits. optionally each phase is profiled with cProfile (.pstats files) or the
+whole run with a sampling profiler that also covers worker threads.
+"""
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+
+from databricks_api.utils import logger
+
+CPROFILE = "cprofile"
+SAMPLING = "sampling"
+
+
+class _PhaseStats:
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.network = 0.0
+        self.requests = 0
+        self.cpu = 0.0
+
+
+class _Sampler(threading.Thread):
+    """samples the stacks of all threads on an interval
+    """
+
+    def __init__(self, interval=0.01):
+        super().__init__(name="profiler-sampler", daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class Profiler:
+    """phase timers with network vs CPU accounting
+
+    a disabled profiler costs a nullcontext per phase, so call sites can
+    always use profiler.phase(name).
+    """
+
+    def __init__(self, output_dir=None, mode=CPROFILE):
+        """
+        :param output_dir: folder of summary and profile files. None disables profiling
+        :type output_dir: str
+        :param mode: cprofile for .pstats per phase, sampling for one
+            collapsed stack file of all threads, anything else for timers only
+        :type mode: str
+        """
+        self.enabled = output_dir is not None
+        self.output_dir = output_dir
+        self.mode = mode
+        self.phases = defaultdict(_PhaseStats)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._network = 0.0
+        self._requests = 0
+        self._cprofile_active = False
+        self._patched = []
+        self._sampler = None
+        self._start = None
+        self._start_cpu = None
+
+    # -- network accounting
+
+    def _record_network(self, seconds):
+        with self._lock:
+            self._network += seconds
+            self._requests += 1
+        self._local.network = getattr(self._local, "network", 0.0) + seconds
+        self._local.requests = getattr(self._local, "requests", 0) + 1
+
+    def _timed(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._record_network(time.perf_counter() - start)
+        return wrapper
+
+    def _timed_chunks(self, func):
+        """only the time spent reading chunks counts, not decoding them between reads
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            chunks = func(*args, **kwargs)
+            elapsed = 0.0
+            try:
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        chunk = next(chunks)
+                    except StopIteration:
+                        return
+                    finally:
+                        elapsed += time.perf_counter() - start
+                    yield chunk
+            finally:
+                chunks.close()
+                self._record_network(elapsed)
+        return wrapper
+
+    def _patch(self, cls, name, timed=None):
+        original = getattr(cls, name)
+        setattr(cls, name, (timed or self._timed)(original))
+        self._patched.append((cls, name, original))
+
+    def start(self):
+        if not self.enabled:
+            return self
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        from databricks_api.base import APIBase
+        self._patch(APIBase, "_send")
+        self._patch(APIBase, "_stream_chunks", self._timed_chunks)
+        try:
+            from databricks_cli.sdk.api_client import ApiClient
+            self._patch(ApiClient, "perform_query")
+        except ImportError:
+            pass
+
+        if self.mode == SAMPLING:
+            self._sampler = _Sampler()
+            self._sampler.start()
+        self._start = time.perf_counter()
+        self._start_cpu = time.process_time()
+        return self
+
+    def stop(self):
+        if not self.enabled:
+            return
+        for cls, name, original in reversed(self._patched):
+            setattr(cls, name, original)
+        self._patched = []
+        if self._sampler:
+            self._sampler.stop()
+            path = os.path.join(self.output_dir, "samples.collapsed")
+            with open(path, "w") as f:
+                for stack, count in self._sampler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            logger.info(f"sampled stacks written to {path}")
+
+        self.phases["total"].calls = 1
+        self.phases["total"].wall = time.perf_counter() - self._start
+        self.phases["total"].network = self._network
+        self.phases["total"].requests = self._requests
+        self.phases["total"].cpu = time.process_time() - self._start_cpu
+        self.write_summary()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # -- phases
+
+    @contextmanager
+    def _phase(self, name):
+        # phases on the main thread include the network and CPU time of the
+        # worker threads they start, phases on worker threads only their own
+        main = threading.current_thread() is threading.main_thread()
+        if main:
+            network, requests, cpu = self._network, self._requests, time.process_time()
+        else:
+            network = getattr(self._local, "network", 0.0)
+            requests = getattr(self._local, "requests", 0)
+            cpu = time.thread_time()
+
+        profile = None
+        if self.mode == CPROFILE and main and not self._cprofile_active:
+            profile = cProfile.Profile()
+            self._cprofile_active = True
+            profile.enable()
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start
+            if profile:
+                profile.disable()
+                self._cprofile_active = False
+                profile.dump_stats(os.path.join(self.output_dir, f"{name}.pstats"))
+
+            if main:
+                network, requests = self._network - network, self._requests - requests
+                cpu = time.process_time() - cpu
+            else:
+                network = getattr(self._local, "network", 0.0) - network
+                requests = getattr(self._local, "requests", 0) - requests
+                cpu = time.thread_time() - cpu
+
+            with self._lock:
+                stats = self.phases[name]
+                stats.calls += 1
+                stats.wall += wall
+                stats.network += network
+                stats.requests += requests
+                stats.cpu += cpu
+
+    def phase(self, name):
+        """context manager timing one phase. repeated phases are summed
+        """
+        if not self.enabled:
+            return nullcontext()
+        return self._phase(name)
+
+    # -- report
+
+    def summary(self):
+        """summary table. network is summed over threads, so it can exceed
+        wall time for concurrent phases. other is wall - network - cpu, e.g. sleeps
+        """
+        lines = [f"{'phase':<32}{'calls':>7}{'wall s':>10}{'network s':>11}"
+                 f"{'requests':>10}{'cpu s':>9}{'other s':>9}"]
+        for name, s in self.phases.items():
+            other = max(s.wall - s.network - s.cpu, 0.0)
+            lines.append(f"{name:<32}{s.calls:>7}{s.wall:>10.2f}{s.network:>11.2f}"
+                         f"{s.requests:>10}{s.cpu:>9.2f}{other:>9.2f}")
+        return "\n".join(lines)
+
+    def write_summary(self):
+        table = self.summary()
+        logger.info("profile summary\n" + table)
+        with open(os.path.join(self.output_dir, "summary.txt"), "w") as f:
+            f.write(table + "\n")
+        with open(os.path.join(self.output_dir, "summary.json"), "w") as f:
+            json.dump({name: vars(s) for name, s in self.phases.items()}, f, indent=2)
+        logger.info(f"profile written to {self.output_dir}")
@@ -0,0 +1,194 @@
+"""replay of captured API traffic, see capture.py.
+serve: a local stub answering requests with the recorded responses at the
+recorded latency times a scale factor.
+load: sends the captured requests to a target at a given concurrency and
+reports throughput and latency percentiles.
+"""
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from databricks_api.capture import load_capture, request_key
+from databricks_api.utils import logger
+
+
+class ReplayStore:
+    """recorded responses per request, handed out in recorded order.
+    the last response of a request is repeated once its queue is exhausted
+    """
+
+    def __init__(self, records):
+        self._lock = threading.Lock()
+        self._queues = defaultdict(deque)
+        self._last = {}
+        for r in records:
+            self._queues[(r["method"], r["path"], r["query"])].append(r)
+
+    def next(self, method, url):
+        key = request_key(method, url)
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue:
+                self._last[key] = queue.popleft()
+            return self._last.get(key)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+
+        record = self.server.store.next(self.command, self.path)
+        if record is None:
+            status, body, delay = 404, {"error_code": "NOT_CAPTURED",
+                                        "message": f"{self.command} {self.path}"}, 0
+        else:
+            status, body = record["status"], record["response"]
+            delay = record["duration"] * self.server.latency_scale
+        if delay:
+            time.sleep(delay)
+
+        payload = json.dumps(body).encode("utf-8") if body not in (None, "") else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _reply
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class StubServer(ThreadingHTTPServer):
+    """threaded http stub serving a capture
+    """
+    daemon_threads = True
+
+    def __init__(self, records, host="127.0.0.1", port=8080, latency_scale=1.0):
+        """
+        :param records: capture records, see capture.load_capture
+        :type records: list(dict)
+        :param latency_scale: recorded duration multiplier. 0 answers immediately
+        :type latency_scale: float
+        """
+        super().__init__((host, port), _StubHandler)
+        self.store = ReplayStore(records)
+        self.latency_scale = latency_scale
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+
+def run_load(records, target, concurrency=8, repeat=1, token="replay", pace=False):
+    """send the captured requests to target
+
+    :param target: base url, e.g. the url of a StubServer
+    :type target: str
+    :param concurrency: requests in flight
+    :type concurrency: int
+    :param repeat: times the capture is sent
+    :type repeat: int
+    :param pace: keep the recorded start offsets instead of sending as fast as possible
+    :type pace: bool
+
+    :return: requests, errors, seconds, requests_per_second and latency percentiles
+    :type return: dict
+    """
+    import requests
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies, errors = [], []
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def send(item):
+        offset, r = item
+        if pace:
+            delay = offset - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+        url = f"{target.rstrip('/')}{r['path']}" + (f"?{r['query']}" if r["query"] else "")
+        sent = time.perf_counter()
+        response = session.request(r["method"], url, json=r["body"], headers=headers)
+        with lock:
+            latencies.append(time.perf_counter() - sent)
+            if response.status_code != r["status"]:
+                errors.append(f"{r['method']} {r['path']}: {response.status_code}")
+
+    items = []
+    duration = records[-1]["t"] if records else 0
+    for i in range(repeat):
+        items.extend((i * duration + r["t"], r) for r in records)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(send, item) for item in items]:
+            try:
+                future.result()
+            except Exception as err:
+                errors.append(repr(err))
+
+    seconds = time.perf_counter() - start
+    result = {"requests": len(items),
+              "errors": len(errors),
+              "seconds": round(seconds, 3),
+              "requests_per_second": round(len(items) / seconds, 1) if seconds else 0.0,
+              "p50": round(percentile(latencies, 50), 4),
+              "p95": round(percentile(latencies, 95), 4),
+              "p99": round(percentile(latencies, 99), 4)}
+    for error in errors[:10]:
+        logger.warning(error)
+    return result
+
+
+def serve(args):
+    server = StubServer(load_capture(args.capture), host=args.host, port=args.port,
+                        latency_scale=args.latency_scale)
+    logger.info(f"serving {args.capture} on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def load(args):
+    records = load_capture(args.capture)
+    server = None
+    target = args.target
+    if not target:
+        # no target: replay against a local stub of the capture itself
+        server = StubServer(records, port=0, latency_scale=args.latency_scale)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        target = server.url
+
+    try:
+        result = run_load(records, target, concurrency=args.concurrency,
+                          repeat=args.repeat, pace=args.pace)
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+    logger.info(f"replay load against {target}: {result}")
+    return result
@@ -0,0 +1,86 @@
+"""run reports of sharded deployments.
+every shard writes the units it owned and completed, merge_reports combines
+the shard reports of one run into a single report.
+"""
+import datetime
+import json
+from collections import defaultdict
+
+from databricks_api.utils import logger
+
+
+def shard_report(shard, journal, concurrency=None):
+    """report of one shard
+
+    :param shard: shard of this process
+    :type shard: shard.Shard
+    :param journal: run journal with the completed units
+    :type journal: journal.RunJournal
+    :param concurrency: concurrency limits and their history per endpoint family,
+        see concurrency.ConcurrencyController.stats
+    :type concurrency: dict
+
+    :return: json serializable report
+    :type return: dict
+    """
+    completed = defaultdict(list)
+    for entry in journal.completed():
+        completed[entry["kind"]].append(entry["name"])
+
+    incomplete = {kind: sorted(set(names) - set(completed.get(kind, [])))
+                  for kind, names in shard.assigned.items()}
+    return {"run_id": journal.run_id,
+            "shard": str(shard),
+            "coordinator": shard.is_coordinator,
+            "finished_at": datetime.datetime.now().isoformat(),
+            "assigned": {k: sorted(v) for k, v in shard.assigned.items()},
+            "completed": {k: sorted(v) for k, v in completed.items()},
+            "incomplete": {k: v for k, v in incomplete.items() if v},
+            "concurrency": concurrency or {}}
+
+
+def write_report(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"run report written to {path}")
+
+
+def merge_reports(paths):
+    """merge the shard reports of one run
+
+    :param paths: shard report files
+    :type paths: list(str)
+
+    :return: merged report. missing_shards lists shards without a report
+    :type return: dict
+    """
+    reports = []
+    for path in paths:
+        with open(path) as f:
+            reports.append(json.load(f))
+    if not reports:
+        raise ValueError("no reports to merge")
+
+    counts = {int(r["shard"].split("/")[1]) for r in reports}
+    if len(counts) > 1:
+        raise ValueError(f"reports of different shard counts: {sorted(counts)}")
+    count = counts.pop()
+
+    merged = {"run_ids": sorted({r["run_id"] for r in reports}),
+              "shards": sorted(r["shard"] for r in reports),
+              "missing_shards": [f"{i}/{count}" for i in range(count)
+                                 if f"{i}/{count}" not in {r["shard"] for r in reports}]}
+    for section in ["assigned", "completed", "incomplete"]:
+        combined = defaultdict(set)
+        for r in reports:
+            for kind, names in r.get(section, {}).items():
+                combined[kind].update(names)
+        merged[section] = {k: sorted(v) for k, v in combined.items()}
+
+    # limits adapt per process, they are kept per shard
+    merged["concurrency"] = {r["shard"]: r.get("concurrency", {}) for r in reports}
+    merged["summary"] = {kind: {"assigned": len(names),
+                                "completed": len(merged["completed"].get(kind, [])),
+                                "incomplete": len(merged["incomplete"].get(kind, []))}
+                         for kind, names in merged["assigned"].items()}
+    return merged
@@ -0,0 +1,174 @@
+"""cluster start scheduler. limits concurrent cluster starts and cores against
+configurable quotas so large rollouts don't fail on cloud vCPU quotas or
+Databricks cluster start rate limits.
+"""
+import heapq
+import itertools
+import re
+import threading
+from contextlib import contextmanager
+
+from databricks_api.utils import logger
+
+DEFAULT_PRIORITY = 100
+
+# vCPUs of Azure Dv2/DSv2 sizes, whose size number is not the core count
+AZURE_V2_CORES = {
+    "1": 1, "2": 2, "3": 4, "4": 8, "5": 16,
+    "11": 2, "12": 4, "13": 8, "14": 16, "15": 20,
+}
+
+
+def guess_node_type_cores(node_type_id, default=4):
+    """estimate cores from the node type name when the node types API has no answer
+
+    :param node_type_id: e.g. Standard_DS3_v2, Standard_E8s_v3, i3.xlarge
+    :type node_type_id: str
+    :param default: cores of unknown node types
+    :type default: int
+    """
+    if not node_type_id:
+        return default
+
+    # aws, e.g. i3.xlarge, r5.4xlarge
+    aws = re.match(r"^[a-z0-9-]+\.(\d*)x?large$", node_type_id)
+    if aws:
+        if node_type_id.endswith(".large"):
+            return 2
+        return 4 * int(aws.group(1) or 1)
+
+    # azure, e.g. Standard_DS3_v2, Standard_D8s_v3, Standard_NC6s_v3
+    azure = re.match(r"^Standard_[A-Z]+?(\d+)[a-z]*(_v(\d+))?", node_type_id)
+    if azure:
+        size, version = azure.group(1), azure.group(3)
+        if version == "2" and size in AZURE_V2_CORES:
+            return AZURE_V2_CORES[size]
+        return int(size)
+
+    return default
+
+
+class ClusterStartScheduler:
+    """admits cluster starts in priority order (lowest number first) while
+    the number of starts in flight, the cores being provisioned and the total
+    cores of clusters started by this deploy stay under their limits.
+
+    a start stays in flight until the cluster reaches RUNNING, see started().
+    its cores count against core_quota until stopped() or kept() is called.
+    cores of kept clusters are never freed, so a start that only fits once
+    they are raises ValueError instead of waiting forever.
+    """
+
+    def __init__(self, max_concurrent_starts=4, max_starting_cores=None,
+                 core_quota=None):
+        """
+        :param max_concurrent_starts: cluster starts in flight
+        :type max_concurrent_starts: int
+        :param max_starting_cores: cores of clusters in flight. None is unlimited
+        :type max_starting_cores: int
+        :param core_quota: cores of all clusters started and still running. None is unlimited
+        :type core_quota: int
+        """
+        self.max_concurrent_starts = max_concurrent_starts
+        self.max_starting_cores = max_starting_cores
+        self.core_quota = core_quota
+
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._starting = {}
+        self._running = {}
+        self._kept = {}
+
+    @property
+    def starting_cores(self):
+        return sum(self._starting.values())
+
+    @property
+    def total_cores(self):
+        return (sum(self._starting.values()) + sum(self._running.values())
+                + sum(self._kept.values()))
+
+    def _fits(self, cores):
+        if len(self._starting) >= self.max_concurrent_starts:
+            return False
+        if (self.max_starting_cores is not None and self._starting
+                and self.starting_cores + cores > self.max_starting_cores):
+            return False
+        if (self.core_quota is not None
+                and self.total_cores + cores > self.core_quota):
+            return False
+        return True
+
+    def acquire(self, name, cores, priority=DEFAULT_PRIORITY):
+        """block until the start of cluster name is admitted
+
+        :param name: cluster name
+        :type name: str
+        :param cores: estimated cores of the cluster
+        :type cores: int
+        :param priority: lower starts first
+        :type priority: int
+        """
+        if self.core_quota is not None and cores > self.core_quota:
+            raise ValueError(
+                f"cluster {name} needs {cores} cores, more than core_quota {self.core_quota}")
+
+        ticket = (priority, next(self._sequence))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            while self._waiting[0] != ticket or not self._fits(cores):
+                kept = sum(self._kept.values())
+                if self.core_quota is not None and kept + cores > self.core_quota:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                    raise ValueError(
+                        f"cluster {name} needs {cores} cores, core_quota {self.core_quota} "
+                        f"has {self.core_quota - kept} left after the clusters left running")
+                self._cond.wait()
+
+            heapq.heappop(self._waiting)
+            self._starting[name] = cores
+            self._cond.notify_all()
+
+        logger.info(f"scheduler: starting {name} ({cores} cores). "
+                    f"in flight {len(self._starting)}, total cores {self.total_cores}")
+
+    def started(self, name):
+        """cluster reached RUNNING. frees its start slot, its cores stay reserved
+        """
+        with self._cond:
+            cores = self._starting.pop(name, None)
+            if cores is not None:
+                self._running[name] = cores
+            self._cond.notify_all()
+
+    def stopped(self, name):
+        """cluster terminated, failed to start or failed to deploy. frees its cores
+        """
+        with self._cond:
+            self._starting.pop(name, None)
+            self._running.pop(name, None)
+            self._cond.notify_all()
+
+    def kept(self, name):
+        """cluster is left running after the deploy, its cores are never freed
+        """
+        with self._cond:
+            cores = self._running.pop(name, None)
+            if cores is not None:
+                self._kept[name] = cores
+            self._cond.notify_all()
+
+    @contextmanager
+    def start_slot(self, name, cores, priority=DEFAULT_PRIORITY):
+        """admit a start, mark it started on exit or stopped on error
+        """
+        self.acquire(name, cores, priority)
+        try:
+            yield
+        except Exception:
+            self.stopped(name)
+            raise
+        self.started(name)
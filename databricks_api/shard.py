@@ -0,0 +1,107 @@
+"""deterministic sharding of managed objects across CI agents.
+objects are assigned to shards with a consistent hash ring, so every agent
+computes the same partition and changing the shard count only moves the
+objects of the added or removed shards.
+"""
+import bisect
+import hashlib
+from collections import defaultdict
+
+COORDINATOR = 0
+
+
+def parse_shard(value):
+    """parse a --shard argument
+
+    :param value: i/N, e.g. 0/4. shards are numbered from 0
+    :type value: str
+
+    :return: (index, count)
+    :type return: tuple
+    """
+    try:
+        index, count = (int(v) for v in value.split("/"))
+    except (AttributeError, ValueError):
+        raise ValueError(f"shard must look like i/N, e.g. 0/4, got {value}")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"shard index must be in 0..N-1, got {value}")
+    return index, count
+
+
+def _hash(key):
+    return int(hashlib.sha1(key.encode("utf-8")).hexdigest()[:16], 16)
+
+
+class HashRing:
+    """consistent hash ring of shard indexes with virtual nodes
+    """
+
+    def __init__(self, count, vnodes=64):
+        """
+        :param count: number of shards
+        :type count: int
+        :param vnodes: points per shard on the ring, more points spread objects more evenly
+        :type vnodes: int
+        """
+        points = sorted((_hash(f"shard-{i}-{v}"), i)
+                        for i in range(count) for v in range(vnodes))
+        self._keys = [p[0] for p in points]
+        self._shards = [p[1] for p in points]
+
+    def owner(self, key):
+        """shard index owning key
+        """
+        pos = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._shards[pos]
+
+
+class Shard:
+    """one partition of the managed objects
+
+    shard 0 is the coordinator and runs the cross-shard steps, e.g. removing
+    unmanaged groups, scopes, folders and clusters. objects owned by this shard
+    are remembered for the run report.
+    """
+
+    def __init__(self, index=0, count=1, vnodes=64):
+        """
+        :param index: shard of this process, 0..count-1
+        :type index: int
+        :param count: number of shards
+        :type count: int
+        """
+        self.index = index
+        self.count = count
+        self.ring = HashRing(count, vnodes=vnodes)
+        self.assigned = defaultdict(list)
+
+    @classmethod
+    def from_arg(cls, value):
+        """shard of a --shard i/N argument, a single shard if value is None
+        """
+        if value is None:
+            return cls()
+        return cls(*parse_shard(value))
+
+    def __str__(self):
+        return f"{self.index}/{self.count}"
+
+    @property
+    def is_coordinator(self):
+        return self.index == COORDINATOR
+
+    def owns(self, kind, name, key=None):
+        """True if the object belongs to this shard
+
+        :param kind: object type, e.g. group, scope, cluster_acl, folder, cluster
+        :type kind: str
+        :param name: object name
+        :type name: str
+        :param key: name to hash instead of name, e.g. to keep
+            nested groups of one component on the same shard
+        :type key: str
+        """
+        owned = self.ring.owner(f"{kind}:{key or name}") == self.index
+        if owned:
+            self.assigned[kind].append(name)
+        return owned
@@ -0,0 +1,201 @@
+"""external membership sources for large groups.
+a group in ACL.yaml can reference a CSV or JSONL file with `source`. the file is
+streamed in chunks into a disk backed diff against the current members and the
+changes are written in batched SCIM requests, so memory stays bounded by the
+chunk size instead of the group size.
+"""
+import csv
+import json
+import os
+import sqlite3
+import tempfile
+
+from databricks_api.utils import config_path, logger
+
+CHUNK_SIZE = 1000
+WRITE_BATCH_SIZE = 100
+MEMBER_KEYS = ["user_name", "application_id", "display_name"]
+
+
+def iter_members(path, chunk_size=CHUNK_SIZE):
+    """stream members of a CSV (with a header row) or JSONL file in chunks
+
+    :param path: file with user_name or application_id and optional display_name
+        columns/keys
+    :type path: str
+    :param chunk_size: members per chunk
+    :type chunk_size: int
+
+    :return: lists of member dicts
+    :type return: generator
+    """
+    if not path.endswith((".csv", ".jsonl", ".ndjson")):
+        raise ValueError(f"membership source must be .csv or .jsonl: {path}")
+
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+
+        chunk = []
+        for row in rows:
+            member = {k: row[k].strip() for k in MEMBER_KEYS if row.get(k)}
+            if not member.get("user_name") and not member.get("application_id"):
+                continue
+            chunk.append(member)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+class MemberDiff:
+    """desired and current member keys of one group in a temporary sqlite file
+    """
+
+    def __init__(self):
+        fd, self.path = tempfile.mkstemp(prefix="members-", suffix=".sqlite")
+        os.close(fd)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.executescript("""
+            CREATE TABLE desired (key TEXT PRIMARY KEY COLLATE NOCASE, display_name TEXT);
+            CREATE TABLE current (key TEXT PRIMARY KEY COLLATE NOCASE);
+        """)
+
+    def add_desired(self, members):
+        """
+        :param members: (key, display_name) tuples
+        :type members: iterable(tuple)
+        """
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO desired VALUES (?, ?)", members)
+
+    def add_current(self, keys):
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO current VALUES (?)", ((k,) for k in keys))
+
+    def _chunks(self, query, chunk_size):
+        cursor = self._conn.execute(query)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield rows
+
+    def additions(self, chunk_size=WRITE_BATCH_SIZE):
+        """(key, display_name) chunks of desired members that aren't current
+        """
+        return self._chunks("""SELECT d.key, d.display_name FROM desired d
+                               LEFT JOIN current c ON d.key = c.key
+                               WHERE c.key IS NULL ORDER BY d.key""", chunk_size)
+
+    def removals(self, chunk_size=WRITE_BATCH_SIZE):
+        """(key,) chunks of current members that aren't desired
+        """
+        return self._chunks("""SELECT c.key FROM current c
+                               LEFT JOIN desired d ON c.key = d.key
+                               WHERE d.key IS NULL ORDER BY c.key""", chunk_size)
+
+    def close(self):
+        self._conn.close()
+        os.remove(self.path)
+
+
+def _create_principals(scim, members, group_id, spn=False):
+    """create missing users or service principals in the group with one /Bulk request
+    """
+    operations = []
+    for key, display_name in members:
+        if spn:
+            data = {"applicationId": key, **scim.sp_schema}
+        else:
+            data = {"userName": key, **scim.user_schema}
+        if display_name:
+            data["displayName"] = display_name
+        data["groups"] = [{"value": group_id}]
+        operations.append({"method": "POST",
+                           "path": "/ServicePrincipals" if spn else "/Users",
+                           "bulkId": key,
+                           "data": data})
+
+    pending = {op["bulkId"]: op for op in operations}
+    r = scim.bulk(operations)
+    created, failed = 0, []
+    for op in (r or {}).get("Operations", []):
+        if pending.pop(op.get("bulkId"), None) is None:
+            continue
+        if str(op.get("status", "201"))[0] == "2":
+            created += 1
+        else:
+            failed.append(op.get("bulkId"))
+    if failed:
+        logger.error(f"failed to create {failed}")
+    # e.g. skipped once the server stopped on failOnErrors
+    for bulk_id in pending:
+        logger.error(f"failed to create {bulk_id}: operation missing from the /Bulk response")
+    return created
+
+
+def sync_source_members(groups_client, scim, grp, remove_unmanaged=False,
+                        chunk_size=CHUNK_SIZE, current_members=None):
+    """sync the users or service principals of a group with its `source` file
+    and its inline members. nested groups are synced by deploy_group
+
+    :param groups_client: databricks Groups API
+    :type groups_client: api.Groups
+    :param scim: databricks SCIM API
+    :type scim: api.SCIM
+    :param grp: group in GROUPS of ACL.yaml with a source
+    :type grp: dict
+    :param current_members: GroupsApi.list_members members if already fetched
+    :type current_members: list(dict)
+
+    :return: counts of added, created and removed members
+    :type return: dict
+    """
+    principal = grp["name"]
+    spn = grp["type"] == "spn"
+    key = "application_id" if spn else "user_name"
+    url, attribute = (scim.sp_url, "applicationId") if spn else (scim.users_url, "userName")
+    path = config_path(grp["source"])
+    counts = {"added": 0, "created": 0, "removed": 0, "unmanaged": 0}
+
+    diff = MemberDiff()
+    try:
+        inline = [m for m in grp.get("members") or [] if m.get(key)]
+        diff.add_desired((m[key], m.get("display_name")) for m in inline)
+        for chunk in iter_members(path, chunk_size):
+            diff.add_desired((m[key], m.get("display_name")) for m in chunk if m.get(key))
+
+        # the Groups API returns service principals as user_name too
+        if current_members is None:
+            current_members = groups_client.list_members(principal).get("members") or []
+        diff.add_current(m["user_name"] for m in current_members if m.get("user_name"))
+
+        group_id = dict(scim.resolve_ids(scim.groups_url, "displayName", [principal]))[principal]
+
+        for chunk in diff.additions():
+            ids = dict(scim.resolve_ids(url, attribute, [k for k, _ in chunk]))
+            if ids:
+                scim.patch_group_members(group_id, add=list(ids.values()))
+                counts["added"] += len(ids)
+            found = {k.lower() for k in ids}
+            missing = [(k, name) for k, name in chunk if k.lower() not in found]
+            if missing:
+                counts["created"] += _create_principals(scim, missing, group_id, spn=spn)
+
+        for chunk in diff.removals():
+            if not remove_unmanaged:
+                counts["unmanaged"] += len(chunk)
+                continue
+            ids = dict(scim.resolve_ids(url, attribute, [k for k, in chunk]))
+            if ids:
+                scim.patch_group_members(group_id, remove=list(ids.values()))
+                counts["removed"] += len(ids)
+    finally:
+        diff.close()
+
+    logger.info({f"source members of {principal}": counts})
+    return counts
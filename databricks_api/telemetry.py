@@ -0,0 +1,200 @@
+"""cluster start phase telemetry from the cluster events API.
+the deploy notes when it touched each cluster and when its libraries settled.
+afterwards the events of those clusters are paged through and turned into
+phase durations, appended as one json line per cluster and run, and
+summarize aggregates the lines of many runs per phase.
+
+phases, in seconds:
+requested_to_running: first CREATING, STARTING or RESTARTING to RUNNING
+init_scripts: INIT_SCRIPTS_STARTED to INIT_SCRIPTS_FINISHED
+running_to_libraries: last RUNNING to libraries settled, see ClusterManagement.finish
+edit_restarts: RESTARTING after EDITED to RUNNING, edit_restart_count is their number
+"""
+import datetime
+import json
+import threading
+import time
+from collections import defaultdict
+
+from databricks_api.replay import percentile
+from databricks_api.utils import fan_out, logger
+
+EVENT_TYPES = ["CREATING", "STARTING", "RESTARTING", "RUNNING", "EDITED", "TERMINATING",
+               "INIT_SCRIPTS_STARTED", "INIT_SCRIPTS_FINISHED"]
+PHASES = ["requested_to_running", "init_scripts", "running_to_libraries", "edit_restarts"]
+# events of a touched cluster are read from this long before it was touched
+CLOCK_MARGIN_MS = 5000
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def phase_durations(events, libraries_settled=None):
+    """phase durations of a cluster
+
+    :param events: cluster events, dicts with timestamp (epoch ms) and type
+    :type events: list(dict)
+    :param libraries_settled: epoch ms when no library was pending any more
+    :type libraries_settled: int
+
+    :return: seconds per phase and edit_restart_count. phases that did not happen are missing
+    :type return: dict
+    """
+    phases = {}
+    start = edit_start = init_start = running = None
+    edited = False
+
+    def add(phase, begin, end):
+        phases[phase] = round(phases.get(phase, 0.0) + (end - begin) / 1000, 3)
+
+    for event in sorted(events, key=lambda e: e["timestamp"]):
+        t, kind = event["timestamp"], event["type"]
+        if kind == "EDITED":
+            edited = True
+        elif kind == "RESTARTING" and edited:
+            edit_start = t
+            phases["edit_restart_count"] = phases.get("edit_restart_count", 0) + 1
+        elif kind in ["CREATING", "STARTING", "RESTARTING"]:
+            if start is None and "requested_to_running" not in phases:
+                start = t
+        elif kind == "INIT_SCRIPTS_STARTED":
+            init_start = t
+        elif kind == "INIT_SCRIPTS_FINISHED" and init_start is not None:
+            add("init_scripts", init_start, t)
+            init_start = None
+        elif kind == "RUNNING":
+            running = t
+            if edit_start is not None:
+                add("edit_restarts", edit_start, t)
+                edit_start = None
+            elif start is not None:
+                add("requested_to_running", start, t)
+                start = None
+            edited = False
+        elif kind == "TERMINATING":
+            start = edit_start = init_start = None
+            edited = False
+
+    if running is not None and libraries_settled and libraries_settled >= running:
+        add("running_to_libraries", running, libraries_settled)
+    return phases
+
+
+class TelemetryCollector:
+    """clusters touched by a deploy and their phase durations.
+    disabled (every method a no-op) unless path is given
+    """
+
+    def __init__(self, path=None, run_id=None):
+        """
+        :param path: jsonl file the records of this run are appended to
+        :type path: str
+        :param run_id: id of the run, e.g. the run journal id
+        :type run_id: str
+        """
+        self.path = path
+        self.run_id = run_id
+        self.enabled = path is not None
+        self.records = []
+        self._clusters = {}
+        self._lock = threading.Lock()
+
+    def touched(self, cluster_name, cluster_id, cluster_specs, state_before=None):
+        """note a cluster the deploy is about to create, edit or start
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._clusters[cluster_name] = {
+                "cluster_id": cluster_id,
+                "since": now_ms() - CLOCK_MARGIN_MS,
+                "state_before": state_before,
+                "spark_version": cluster_specs.get("spark_version"),
+                "node_type_id": cluster_specs.get("node_type_id"),
+                "instance_pool": bool(cluster_specs.get("instance_pool_id")),
+                "init_scripts": len(cluster_specs.get("init_scripts") or []),
+                "libraries_settled": None}
+
+    def update(self, cluster_name, **details):
+        """e.g. cluster_id once created or state_before once known
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if cluster_name in self._clusters:
+                self._clusters[cluster_name].update(details)
+
+    def libraries_settled(self, cluster_name):
+        self.update(cluster_name, libraries_settled=now_ms())
+
+    def collect(self, clusters, max_workers=4):
+        """page through the events of the touched clusters and append their records
+
+        :param clusters: Clusters API
+        :type clusters: api.Clusters
+
+        :return: records of this run
+        :type return: list(dict)
+        """
+        if not self.enabled or not self._clusters:
+            return []
+
+        def events(item):
+            return list(clusters.iter_events(item[1]["cluster_id"], start_time=item[1]["since"],
+                                             event_types=EVENT_TYPES))
+
+        recorded_at = datetime.datetime.now().isoformat()
+        touched = [(name, c) for name, c in self._clusters.items() if c["cluster_id"]]
+        for (name, cluster), cluster_events, err in fan_out(events, touched,
+                                                            max_workers=max_workers):
+            if err:
+                logger.error(f"events of cluster {name} failed: {repr(err)}")
+                continue
+            record = {"run_id": self.run_id, "recorded_at": recorded_at, "cluster_name": name,
+                      **{k: v for k, v in cluster.items() if k not in ["since", "libraries_settled"]},
+                      "events": len(cluster_events),
+                      "phases": phase_durations(cluster_events, cluster["libraries_settled"])}
+            self.records.append(record)
+
+        with open(self.path, "a") as f:
+            for record in self.records:
+                f.write(json.dumps(record) + "\n")
+        logger.info(f"telemetry of {len(self.records)} clusters appended to {self.path}")
+        return self.records
+
+
+def load_records(paths):
+    records = []
+    for path in paths:
+        with open(path) as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    return records
+
+
+def summarize(records, by=None):
+    """phase statistics over the records of many runs
+
+    :param records: telemetry records, see load_records
+    :type records: list(dict)
+    :param by: record field to group by, e.g. instance_pool, spark_version or init_scripts.
+        Default is one group, all
+    :type by: str
+
+    :return: {group: {phase: {count, mean, p50, p95, max}}}
+    :type return: dict
+    """
+    values = defaultdict(lambda: defaultdict(list))
+    for record in records:
+        group = str(record.get(by)) if by else "all"
+        for phase in PHASES:
+            if phase in record["phases"]:
+                values[group][phase].append(record["phases"][phase])
+
+    return {group: {phase: {"count": len(v),
+                            "mean": round(sum(v) / len(v), 3),
+                            "p50": percentile(v, 50),
+                            "p95": percentile(v, 95),
+                            "max": max(v)}
+                    for phase, v in phases.items()}
+            for group, phases in sorted(values.items())}
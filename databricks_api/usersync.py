@@ -0,0 +1,145 @@
+"""user attribute and entitlement sync.
+display_name, active and entitlements of the user members in ACL.yaml are
+compared against one SCIM snapshot of all users. only users with changed
+attributes get a PATCH, holding just the changed attributes, and the PATCH
+operations are sent in SCIM /Bulk requests of BATCH_SIZE users.
+
+attributes missing in ACL.yaml are left alone. entitlements, when given,
+are the complete list: missing ones are added, others removed.
+"""
+from databricks_api.cache import USER
+from databricks_api.utils import logger
+
+BATCH_SIZE = 50
+SNAPSHOT_ATTRIBUTES = "id,userName,displayName,active,entitlements"
+ENTITLEMENTS = ["workspace-access", "databricks-sql-access", "allow-cluster-create",
+                "allow-instance-pool-create"]
+USER_KEYS = {"display_name": "displayName", "active": "active", "entitlements": "entitlements"}
+
+
+def desired_users(groups_config):
+    """managed attributes of the inline user members of GROUPS
+
+    :param groups_config: GROUPS in ACL.yaml
+    :type groups_config: list(dict)
+
+    :return: {lower case user_name: {display_name, active, entitlements}}, only the given keys
+    :type return: dict
+    """
+    users = {}
+    for grp in groups_config:
+        if grp.get("type") != "user":
+            continue
+        for member in grp.get("members") or []:
+            if not member.get("user_name"):
+                continue
+            attributes = {k: member[k] for k in USER_KEYS if member.get(k) is not None}
+            if "entitlements" in attributes:
+                unknown = [e for e in attributes["entitlements"] if e not in ENTITLEMENTS]
+                if unknown:
+                    raise ValueError(f"unknown entitlements of {member['user_name']}: {unknown}")
+                attributes["entitlements"] = sorted(set(attributes["entitlements"]))
+
+            user = users.setdefault(member["user_name"].lower(), {})
+            for key, value in attributes.items():
+                if key in user and user[key] != value:
+                    raise ValueError(f"conflicting {key} of {member['user_name']} "
+                                     f"in group {grp['name']}: {user[key]} and {value}")
+                user[key] = value
+    return {name: user for name, user in users.items() if user}
+
+
+def user_operations(current, desired):
+    """SCIM PatchOp operations turning current into desired
+
+    :param current: SCIM user of the snapshot
+    :type current: dict
+    :param desired: managed attributes, see desired_users
+    :type desired: dict
+
+    :return: operations, empty if nothing changed
+    :type return: list(dict)
+    """
+    operations = []
+    if "display_name" in desired and current.get("displayName") != desired["display_name"]:
+        operations.append({"op": "replace", "path": "displayName",
+                           "value": desired["display_name"]})
+    # users without the attribute are active
+    if "active" in desired and current.get("active", True) != desired["active"]:
+        operations.append({"op": "replace", "path": "active", "value": desired["active"]})
+    if "entitlements" in desired:
+        have = {e["value"] for e in current.get("entitlements") or []}
+        add = [e for e in desired["entitlements"] if e not in have]
+        if add:
+            operations.append({"op": "add", "path": "entitlements",
+                               "value": [{"value": e} for e in add]})
+        for e in sorted(have - set(desired["entitlements"])):
+            operations.append({"op": "remove", "path": f"entitlements[value eq \"{e}\"]"})
+    return operations
+
+
+def sync_users(scim, groups_config, batch_size=BATCH_SIZE, max_workers=8):
+    """patch the changed attributes of the user members of GROUPS.
+    runs after the members were created, users still missing are skipped
+
+    :param scim: databricks SCIM API
+    :type scim: api.SCIM
+    :param groups_config: GROUPS in ACL.yaml
+    :type groups_config: list(dict)
+    :param batch_size: users per /Bulk request
+    :type batch_size: int
+    :param max_workers: concurrent snapshot pages
+    :type max_workers: int
+
+    :return: (user_name, error) tuples of the patched users. error is None on success
+    :type return: list(tuple)
+    """
+    desired = desired_users(groups_config)
+    if not desired:
+        return []
+
+    snapshot = {u["userName"].lower(): u
+                for u in scim.list_resources(scim.users_url, attributes=SNAPSHOT_ATTRIBUTES,
+                                             max_workers=max_workers)}
+    if scim.cache:
+        for user in snapshot.values():
+            scim.cache.put_principal(USER, user["userName"], user["id"])
+
+    missing = sorted(name for name in desired if name not in snapshot)
+    if missing:
+        logger.warning(f"users not found, attributes not synced: {missing}")
+
+    patches = []
+    for name, attributes in sorted(desired.items()):
+        if name not in snapshot:
+            continue
+        operations = user_operations(snapshot[name], attributes)
+        if operations:
+            patches.append((snapshot[name], operations))
+    logger.info(f"user attributes: {len(desired)} managed users, {len(patches)} changed")
+
+    results = []
+    for i in range(0, len(patches), batch_size):
+        batch = {user["id"]: (user["userName"], operations)
+                 for user, operations in patches[i:i + batch_size]}
+        r = scim.bulk([{"method": "PATCH",
+                        "path": f"/Users/{user_id}",
+                        "bulkId": user_id,
+                        "data": {"Operations": operations, **scim.patchop_schema}}
+                       for user_id, (_, operations) in batch.items()])
+        for op in r.get("Operations", []):
+            if op["bulkId"] not in batch:
+                continue
+            user_name, operations = batch.pop(op["bulkId"])
+            err = None
+            if str(op.get("status")) not in ["200", "204"]:
+                err = ValueError(op.get("response", op.get("status")))
+                logger.error(f"failed to update {user_name}: {repr(err)}")
+            else:
+                logger.info(f"UPDATED user {user_name}: {operations}")
+            results.append((user_name, err))
+        for user_name, _ in batch.values():
+            err = ValueError("operation missing from the /Bulk response")
+            logger.error(f"failed to update {user_name}: {repr(err)}")
+            results.append((user_name, err))
+    return results
@@ -1,8 +1,6 @@
 import argparse
-import yaml
 import logging
 from pprint import pformat
-from mako.template import Template
 import os
 
 dir_path = os.path.dirname(os.path.realpath(__file__))
@@ -98,6 +96,10 @@ def render_yaml(filepath, kwargs={}):
     :return: yaml contents
     :type return: dict
     """
+    # yaml and mako are imported lazily to keep cli startup fast
+    import yaml
+    from mako.template import Template
+
     try:
         if kwargs:
             return yaml.safe_load(
@@ -110,6 +112,15 @@ def render_yaml(filepath, kwargs={}):
         logger.error(exc)
 
 
+def config_path(filename):
+    """path of a file in the configuration folder. absolute paths are kept
+
+    :param filename: e.g. ACL.yaml
+    :type filename: str
+    """
+    return os.path.join(dir_path, "configuration", filename)
+
+
 def parse_cmdline(cmd_type=None):
     """function for command line args
 
@@ -118,39 +129,227 @@ def parse_cmdline(cmd_type=None):
     """
     parser = argparse.ArgumentParser(
         description="Databricks Workspace ACL Configuration")
-    parser.add_argument('-pat', '--personal_access_token', type=str,
-                        required=True,
-                        help='Personal Access Token from Admin Console')
-    parser.add_argument('-wu', '--workspace_url', type=str,
-                        required=True, help='Workspace URL')
+    add_arguments(parser, cmd_type=cmd_type)
+
+    return parser.parse_args()
+
+
+def add_arguments(parser, cmd_type=None, workspace=True):
+    """add command line args of a command type to a parser
+
+    :param parser: parser or subparser
+    :type parser: argparse.ArgumentParser
+    :param cmd_type: ACL, CLUSTER, DELETE, EXPORT, PLAN or WATCH
+    :type cmd_type: str
+    :param workspace: add the required workspace url and token args
+    :type workspace: bool
+    """
+    if workspace:
+        parser.add_argument('-pat', '--personal_access_token', type=str,
+                            default=None,
+                            help='Personal Access Token from Admin Console. Required with --auth pat')
+        parser.add_argument('-wu', '--workspace_url', type=str,
+                            required=True, help='Workspace URL')
+        parser.add_argument('--auth', type=str, default='pat',
+                            choices=['pat', 'aad', 'env'],
+                            help='pat: -pat token, aad: AAD service principal token of --tenant_id, '
+                            '--client_id and $AZURE_CLIENT_SECRET refreshed before it expires, '
+                            'env: $DATABRICKS_TOKEN or --token_file re-read after a 401. Default is pat')
+        parser.add_argument('--tenant_id', type=str, default=None,
+                            help='AAD tenant id of --auth aad. Default is $AZURE_TENANT_ID')
+        parser.add_argument('--client_id', type=str, default=None,
+                            help='AAD application id of --auth aad. Default is $AZURE_CLIENT_ID')
+        parser.add_argument('--token_file', type=str, default=None,
+                            help='token file of --auth env. Default is $DATABRICKS_TOKEN')
     parser.add_argument('--debug', action='store_true',
                         help='enable debug logging (default: False)')
 
-    if cmd_type == "ACL":
-        parser.add_argument('--remove', action='store_true',
-                        help='remove unmanaged groups or users (default: False)')
+    if cmd_type in ["ACL", "PLAN", "WATCH"]:
         parser.add_argument('-af', '--acl_file', type=str,
                             default="ACL.yaml",
                             help="Default is ACL.yaml")
+
+    if cmd_type in ["CLUSTER", "PLAN"]:
+        parser.add_argument('-ccf', '--cluster_config_file', type=str,
+                            default="clusterconf.yaml",
+                            help="Default is clusterconf.yaml")
+        parser.add_argument('-clf', '--cluster_library_file', type=str,
+                            default="clusterlib.yaml",
+                            help="Default is clusterlib.yaml")
+        parser.add_argument('-pcf', '--pool_config_file', type=str,
+                            default=None,
+                            help="instance pool configuration, e.g. poolconf.yaml. "
+                            "Default is no pool management")
+
+    if cmd_type == "CLUSTER":
+        parser.add_argument('--max_concurrent_starts', type=int, default=4,
+                            help='clusters starting at once. Default is 4')
+        parser.add_argument('--max_starting_cores', type=int, default=None,
+                            help='cores of clusters starting at once. Default is unlimited')
+        parser.add_argument('--core_quota', type=int, default=None,
+                            help='cores of all clusters started by the deploy. '
+                            'Default is unlimited')
+        parser.add_argument('--keep_running', action='store_true',
+                            help='leave clusters started by the deploy running. By default '
+                            'they are terminated once their libraries are installed')
+        parser.add_argument('--no_start', action='store_true',
+                            help='do not start terminated clusters, their libraries install '
+                            'on the next start (default: False)')
+        parser.add_argument('--upload_workers', type=int, default=4,
+                            help='concurrent uploads of local library files. Default is 4')
+        parser.add_argument('--staged_library_file', type=str, default=None,
+                            help='write the cluster libraries with staged DBFS paths to this '
+                            'yaml file. Default is not written')
+        parser.add_argument('--library_timeout', type=int, default=1200,
+                            help='seconds to wait for library installs before terminating '
+                            'a cluster. Default is 1200')
+        parser.add_argument('--telemetry', type=str, default=None, metavar='FILE',
+                            help='append the start phase durations of the deployed clusters, '
+                            'read from the cluster events API, to this jsonl file. '
+                            'Summarize with databricks-admin telemetry summary FILE')
+
+    if cmd_type in ["ACL", "CLUSTER"]:
+        parser.add_argument('--profile', type=str, nargs='?', const='profile',
+                            default=None, metavar='DIR',
+                            help='time each phase, split network wait and CPU and write '
+                            'summary and profile files to DIR (default DIR: profile)')
+        parser.add_argument('--profile_mode', type=str, default='cprofile',
+                            choices=['cprofile', 'sampling', 'timers'],
+                            help='cprofile: .pstats per phase, sampling: stack samples of '
+                            'all threads, timers: summary only. Default is cprofile')
+        parser.add_argument('--capture', type=str, default=None, metavar='FILE',
+                            help='record sanitized API requests, responses and timings '
+                            'to FILE (gzipped if it ends with .gz) for databricks-admin replay')
+        parser.add_argument('--max_deletions', type=int, default=100,
+                            help='abort the cleanup of unmanaged objects before deleting anything '
+                            'if it would delete more objects of all kinds together. Default is 100')
+        parser.add_argument('--max_delete_percentage', type=float, default=50,
+                            help='abort the cleanup of unmanaged objects before deleting anything '
+                            'if it would delete more percent of the existing objects of a kind. '
+                            'Default is 50, 100 disables the limit')
+        parser.add_argument('--shard', type=str, default=None, metavar='i/N',
+                            help='deploy only shard i of N, numbered from 0. '
+                            'shard 0 also removes unmanaged objects. Default is no sharding')
+        parser.add_argument('--report', type=str, default=None,
+                            help='run report json. Default is report-<command>-shard-i-of-N.json '
+                            'when sharded')
+        parser.add_argument('--resume', type=str, default=None, metavar='RUN_ID',
+                            help='resume a failed run, skipping its completed units')
+        parser.add_argument('--journal_dir', type=str, default=None,
+                            help='run journal folder. '
+                            'Default is ~/.cache/databricks_api/runs')
+        parser.add_argument('--max_requests_per_second', type=float, default=None,
+                            help='rate limit of all API requests of the run, throttled '
+                            'requests (429) are retried either way. Default is unlimited')
+        parser.add_argument('--max_concurrency', type=int, default=64,
+                            help='highest adaptive concurrency limit of an endpoint family '
+                            '(SCIM, permissions, clusters, ...). Limits start at 8 and adapt to '
+                            'latency, 429 and 5xx responses. Default is 64')
+
+    if cmd_type == "ACL":
+        parser.add_argument('--remove', action='store_true',
+                        help='remove unmanaged groups or users (default: False)')
+        parser.add_argument('--skip_groups', action='store_true',
+                            help='skip group and member deployment (default: False)')
+        parser.add_argument('--cache', action='store_true',
+                            help='use the local inventory cache for lookups (default: False)')
+        parser.add_argument('--cache_path', type=str, default=None,
+                            help='inventory cache sqlite file. '
+                            'Default is ~/.cache/databricks_api/inventory.sqlite')
+        parser.add_argument('--refresh_cache', '--refresh-cache', action='store_true',
+                            help='fully refresh the inventory cache (default: False)')
+        parser.add_argument('--max_workers', type=int, default=8,
+                            help='concurrent permission requests. Default is 8')
+        parser.add_argument('--retries', type=int, default=3,
+                            help='retries of a failed permission request. Default is 3')
         # parser.add_argument('-d', '--domain', type=str, required=True,
         #                     help='FQDN of environment')
 
-    if cmd_type == "CLUSTER":
+    if cmd_type == "WATCH":
+        parser.add_argument('--remove', action='store_true',
+                            help='remove unmanaged members of drifted groups (default: False)')
+        parser.add_argument('--interval', type=int, default=300,
+                            help='seconds between polls. Default is 300')
+        parser.add_argument('--max_workers', type=int, default=4,
+                            help='objects checked and reconciled at once. Default is 4')
+        parser.add_argument('--drift_report', type=str, default=None,
+                            help='append one json line per poll to this file')
+        parser.add_argument('--full_check_every', type=int, default=12,
+                            help='polls between fetches of every scope and object ACL, which '
+                            'have no version to compare. Default is 12')
+        parser.add_argument('--iterations', type=int, default=None,
+                            help='stop after this many polls. Default is forever')
+
+    if cmd_type == "EXPORT":
+        parser.add_argument('-o', '--output_dir', type=str, default=".",
+                            help='folder the configuration files are written to. Default is .')
+        parser.add_argument('-af', '--acl_file', type=str, default="ACL.yaml",
+                            help="Default is ACL.yaml")
         parser.add_argument('-ccf', '--cluster_config_file', type=str,
                             default="clusterconf.yaml",
                             help="Default is clusterconf.yaml")
         parser.add_argument('-clf', '--cluster_library_file', type=str,
                             default="clusterlib.yaml",
                             help="Default is clusterlib.yaml")
-
-    return parser.parse_args()
+        parser.add_argument('--max_workers', type=int, default=16,
+                            help='concurrent requests per listing. Default is 16')
+
+    if cmd_type == "DELETE":
+        parser.add_argument('-u', '--user', type=str, nargs='*', default=[],
+                            help='user names to delete')
+        parser.add_argument('-d', '--domain', type=str, default="",
+                            help='delete users whose userName contains domain. '
+                            'include the @ symbol, e.g. @domain.ca')
+        parser.add_argument('-spn', '--application_id', type=str, nargs='*',
+                            default=[],
+                            help='application ids of service principals to delete')
+        parser.add_argument('--all_spn', action='store_true',
+                            help='delete ALL service principals (default: False)')
+        parser.add_argument('--dry_run', action='store_true',
+                            help='only preview the principals to delete (default: False)')
+        parser.add_argument('--max_deletions', type=int, default=100,
+                            help='abort if more principals match. Default is 100')
+        parser.add_argument('--bulk', action='store_true',
+                            help='delete through SCIM /Bulk requests instead of '
+                            'concurrent DELETE calls (default: False)')
+        parser.add_argument('--max_workers', type=int, default=8,
+                            help='concurrent DELETE calls. Default is 8')
+
+    return parser
 
 
 def dump_yaml(data, filename="myfile.yaml"):
+    import yaml
+
     with open(filename, "w") as f:
         yaml.dump(data, f, indent=2)
 
 
+def fan_out(func, items, max_workers=8):
+    """run func on every item with a bounded thread pool
+
+    :param func: function taking one item
+    :type func: callable
+    :param items: items to process
+    :type items: iterable
+    :param max_workers: maximum concurrent calls
+    :type max_workers: int
+
+    :return: (item, result, error) tuples in completion order
+    :type return: generator
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(func, item): item for item in items}
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                yield item, future.result(), None
+            except Exception as err:
+                yield item, None, err
+
+
 def trycatch(func):
     """decorator to catch exception
     """
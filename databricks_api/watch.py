@@ -0,0 +1,271 @@
+"""continuous drift watch of the ACL configuration.
+the rendered desired state stays in memory, remote state is polled on an
+interval and only objects that drifted from the desired state are reconciled.
+objects are only fetched when a listing shows they may have changed, or on
+the periodic full check of the objects the APIs don't version.
+"""
+import datetime
+import hashlib
+import json
+import time
+
+from databricks_api.acl import deploy_group, deploy_scope_acl
+from databricks_api.api import SCIM, Groups, Secrets
+from databricks_api.auth import register_args
+from databricks_api.membership import MembershipGraph, member_node, USER, SPN
+from databricks_api.permissions import PermissionsEngine, OBJECT_TYPES, permission_state
+from databricks_api.principals import scope_acl_set, scope_acl_items
+from databricks_api.utils import (fan_out, logger, logging, LOGGER_NAME, render_yaml,
+                                  config_path, parse_cmdline)
+
+
+def _hash(state):
+    return hashlib.sha256(
+        json.dumps(sorted(state), default=str).encode("utf-8")).hexdigest()
+
+
+class DriftWatcher:
+    """poll remote state and reconcile drifted groups, secret scopes and
+    the ACL of every permissions engine section
+
+    groups are only fetched when their SCIM meta.lastModified changed.
+    scope and object ACLs have no version: they are fetched on the first poll,
+    every full_check_every polls, when the scope listing changed (scopes only)
+    and while they are drifted or failed. an unchanged fetched state is not
+    compared again.
+    without remove_unmanaged a group is in sync when it has all configured
+    members, members that aren't configured are not drift.
+    """
+
+    def __init__(self, config, token, host, interval=300, max_workers=4,
+                 report_path=None, remove_unmanaged=False, full_check_every=12):
+        """
+        :param config: rendered ACL configuration
+        :type config: dict
+        :param interval: seconds between polls
+        :type interval: int
+        :param max_workers: objects observed and reconciled concurrently
+        :type max_workers: int
+        :param report_path: jsonl drift report, one line per poll
+        :type report_path: str
+        :param remove_unmanaged: remove unmanaged group members when reconciling
+        :type remove_unmanaged: bool
+        :param full_check_every: polls between fetches of every scope and object ACL
+        :type full_check_every: int
+        """
+        self.config = config
+        self.interval = interval
+        self.max_workers = max_workers
+        self.report_path = report_path
+        self.remove_unmanaged = remove_unmanaged
+        self.full_check_every = max(1, full_check_every)
+
+        kwargs = {"token": token, "host": host}
+        self.groups_client = Groups(**kwargs)
+        self.secret_client = Secrets(**kwargs)
+        self.scim = SCIM(**kwargs)
+        self.engine = PermissionsEngine(max_workers=max_workers, retries=1, **kwargs)
+
+        self.graph = MembershipGraph.from_config(config.get("GROUPS") or [])
+        self._group_stamps = {}
+        self._scopes_hash = None
+        self._in_sync = {}
+        self._polls = 0
+
+    def _objects(self):
+        """(kind, name, item). kind is group, scope or a permissions engine section
+        """
+        for grp in self.config.get("GROUPS") or []:
+            # members of source groups are only streamed by acl deploys
+            if not grp.get("source"):
+                yield "group", grp["name"], grp
+        for secret in self.config.get("SECRETS") or []:
+            yield "scope", secret["scope"], secret
+        for section, object_type in OBJECT_TYPES.items():
+            if self.config.get(section):
+                for item in self.engine.entries(section, self.config[section]):
+                    yield section, item[object_type.name_key], item
+
+    def desired_state(self, kind, item, observed=frozenset()):
+        if kind == "group":
+            return self.graph.direct_members(item["name"])
+        if kind == "scope":
+            return scope_acl_set(item["acl"])
+
+        return self.engine.desired(kind, item, observed)[1]
+
+    def observed_state(self, kind, item):
+        if kind == "group":
+            kind_of_users = SPN if item["type"] == "spn" else USER
+            members = self.groups_client.list_members(item["name"]).get("members") or []
+            return {member_node(m, kind_of_users) for m in members}
+        if kind == "scope":
+            return scope_acl_items(self.secret_client.list_acls(item["scope"]).get("items"))
+
+        name = item[OBJECT_TYPES[kind].name_key]
+        object_id = self.engine.resolve(kind, [name]).get(name)
+        if object_id is None:
+            return frozenset()
+        try:
+            return permission_state(self.engine.current(kind, object_id))
+        except Exception:
+            # object may have been recreated with a new id
+            self.engine.forget(kind, name)
+            raise
+
+    def reconcile(self, kind, item):
+        if kind == "group":
+            deploy_group(self.groups_client, self.scim, item,
+                         remove_unmanaged=self.remove_unmanaged)
+        elif kind == "scope":
+            deploy_scope_acl(self.secret_client, item)
+        elif kind == "TOKENS":
+            self.engine.deploy(kind, item["acl"])
+        else:
+            self.engine.deploy(kind, [item])
+
+    def _changed_groups(self):
+        """groups whose SCIM meta.lastModified changed since the last poll
+        """
+        stamps = {g["displayName"]: g.get("meta", {}).get("lastModified")
+                  for g in self.scim.iter_resources(self.scim.groups_url,
+                                                    attributes="displayName,meta")}
+        changed = {name for name, stamp in stamps.items()
+                   if stamp is None or self._group_stamps.get(name) != stamp}
+        changed |= {g for g in self.graph.groups if g not in stamps}
+        self._group_stamps = stamps
+        return changed
+
+    def _scopes_changed(self):
+        """True if scopes were created or deleted since the last poll
+        """
+        scopes_hash = _hash(s["name"] for s in self.secret_client.list_scopes().get("scopes") or [])
+        changed = scopes_hash != self._scopes_hash
+        self._scopes_hash = scopes_hash
+        return changed
+
+    def _due(self, obj, changed_groups, scopes_changed, full_check):
+        kind, name, _ = obj
+        if (kind, name) not in self._in_sync:
+            return True
+        if kind == "group":
+            return changed_groups is None or name in changed_groups
+        if kind == "scope" and scopes_changed:
+            return True
+        return full_check
+
+    def check(self, obj):
+        """observe one object and reconcile it if it drifted
+
+        :return: drift entry or None if in sync
+        :type return: dict
+        """
+        kind, name, item = obj
+        observed = self.observed_state(kind, item)
+        observed_hash = _hash(observed)
+        if self._in_sync.get((kind, name)) == observed_hash:
+            return None
+
+        desired = self.desired_state(kind, item, observed)
+        # members that aren't configured are only managed with remove_unmanaged
+        unexpected = observed - desired
+        if kind == "group" and not self.remove_unmanaged:
+            unexpected = set()
+        if not unexpected and desired <= observed:
+            self._in_sync[(kind, name)] = observed_hash
+            return None
+
+        drift = {"kind": kind,
+                 "name": name,
+                 "missing": sorted(desired - observed),
+                 "unexpected": sorted(unexpected)}
+        logger.warning({"drift": drift})
+        self.reconcile(kind, item)
+        self._in_sync.pop((kind, name), None)
+        return drift
+
+    def poll_once(self):
+        """one poll over all managed objects
+
+        :return: drift report of this poll
+        :type return: dict
+        """
+        start = time.time()
+        # polls must see fresh remote state, not memoized GETs
+        self.scim.request_cache.clear()
+
+        changed_groups = None
+        try:
+            changed_groups = self._changed_groups()
+        except Exception as err:
+            logger.debug(f"group lastModified listing failed: {repr(err)}")
+        scopes_changed = True
+        if self.config.get("SECRETS"):
+            try:
+                scopes_changed = self._scopes_changed()
+            except Exception as err:
+                logger.debug(f"scope listing failed: {repr(err)}")
+        full_check = self._polls % self.full_check_every == 0
+        self._polls += 1
+
+        objects = [obj for obj in self._objects()
+                   if self._due(obj, changed_groups, scopes_changed, full_check)]
+
+        drifted, errors = [], []
+        for (kind, name, _), drift, err in fan_out(self.check, objects,
+                                                   max_workers=self.max_workers):
+            if err:
+                logger.error(f"drift check of {kind} {name} failed: {repr(err)}")
+                errors.append({"kind": kind, "name": name, "error": repr(err)})
+            elif drift:
+                drifted.append(drift)
+
+        report = {"time": datetime.datetime.now().isoformat(),
+                  "checked": len(objects),
+                  "drifted": drifted,
+                  "errors": errors,
+                  "seconds": round(time.time() - start, 3)}
+        logger.info(f"drift watch: checked {len(objects)}, drifted {len(drifted)}, "
+                    f"errors {len(errors)}")
+        if self.report_path:
+            with open(self.report_path, "a") as f:
+                f.write(json.dumps(report, default=str) + "\n")
+
+        return report
+
+    def run(self, iterations=None):
+        """poll until interrupted or for a number of iterations
+        """
+        count = 0
+        try:
+            while iterations is None or count < iterations:
+                self.poll_once()
+                count += 1
+                if iterations is None or count < iterations:
+                    time.sleep(self.interval)
+        except KeyboardInterrupt:
+            logger.info("drift watch stopped")
+
+
+def run(args):
+    """render ACL configuration and watch it for drift
+
+    :param args: command line arguments of parse_cmdline(cmd_type="WATCH")
+    :type args: argparse.Namespace
+    """
+    if args.debug:
+        logging.getLogger(LOGGER_NAME).setLevel(logging.DEBUG)
+
+    watcher = DriftWatcher(render_yaml(config_path(args.acl_file)),
+                           token=register_args(args),
+                           host=args.workspace_url,
+                           interval=args.interval,
+                           max_workers=args.max_workers,
+                           report_path=args.drift_report,
+                           remove_unmanaged=args.remove,
+                           full_check_every=args.full_check_every)
+    watcher.run(iterations=args.iterations)
+
+
+if __name__ == "__main__":
+    run(parse_cmdline(cmd_type="WATCH"))
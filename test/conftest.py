@@ -0,0 +1,31 @@
+import json
+
+import pytest
+
+
+class FakeResponse:
+    """requests response with a json body, optionally streamed in chunks
+    """
+
+    def __init__(self, body=None, status_code=200, chunks=None):
+        self.body = body
+        self.status_code = status_code
+        self.chunks = chunks if chunks is not None else [json.dumps(body).encode("utf-8")]
+        self.text = json.dumps(body)
+
+    def json(self):
+        return self.body
+
+    def iter_content(self, chunk_size=None):
+        yield from self.chunks
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_response():
+    """factory of FakeResponse(body, status_code, chunks), e.g. as the return
+    value of a monkeypatched api.transport.session.get
+    """
+    return FakeResponse
@@ -0,0 +1,81 @@
+import pytest
+
+from databricks_api.api import SCIM, Clusters, Groups, Workspace
+from databricks_api.base import RequestCache
+from databricks_api.cache import InventoryCache, USER, GROUP
+
+
+def fake(cls, responses):
+    """API of cls answering from responses by url suffix, recording requests
+    """
+    api = cls(token="t", host="https://host", request_cache=RequestCache())
+    api.sent = []
+
+    def send(url, body=None, request_type="get", params=None):
+        api.sent.append((request_type, url[len(api.api_url):], body, params))
+        return responses.get(url[len(api.api_url):], {})
+
+    api._send = send
+    return api
+
+
+def test_groups_requests():
+    groups = fake(Groups, {"/groups/list-members": {"members": [{"user_name": "a@x.ca"}]}})
+    groups.add_member("eng", "a@x.ca", None)
+    groups.remove_member("eng", None, "ops")
+    assert groups.list_members("eng")["members"] == [{"user_name": "a@x.ca"}]
+    assert groups.sent == [
+        ("post", "/groups/add-member", {"parent_name": "eng", "user_name": "a@x.ca"}, None),
+        ("post", "/groups/remove-member", {"parent_name": "eng", "group_name": "ops"}, None),
+        ("get", "/groups/list-members", None, {"group_name": "eng"})]
+
+
+def test_cluster_by_name():
+    clusters = fake(Clusters, {
+        "/clusters/list": {"clusters": [{"cluster_name": "etl", "cluster_id": "c1"}]},
+        "/clusters/get": {"cluster_id": "c1", "state": "RUNNING"}})
+    assert clusters.get_cluster_ids_by_name("etl") == ["c1"]
+    assert clusters.get_cluster_by_name("etl")["state"] == "RUNNING"
+    with pytest.raises(ValueError):
+        clusters.get_cluster_by_name("missing")
+    # cluster state is never memoized, the listing is
+    clusters.get_cluster("c1")
+    assert [s[1] for s in clusters.sent] == ["/clusters/list", "/clusters/get", "/clusters/get"]
+
+
+def test_workspace_objects():
+    workspace = fake(Workspace, {"/workspace/list": {"objects": [
+        {"path": "/Shared", "object_type": "DIRECTORY"}]}})
+    assert workspace.list_objects("/") == [{"path": "/Shared", "object_type": "DIRECTORY"}]
+    workspace.delete("/old", True)
+    assert workspace.sent[-1] == ("post", "/workspace/delete", {"path": "/old", "recursive": True}, None)
+
+
+def test_stale_cached_ids_are_dropped_on_404(tmp_path):
+    scim = fake(SCIM, {"/preview/scim/v2/Groups?filter=displayName+eq+eng":
+                       {"Resources": [{"id": "new"}]}})
+    scim.cache = InventoryCache("https://host", path=str(tmp_path / "inv.sqlite"))
+    scim.cache.put_principal(GROUP, "eng", "deleted")
+    scim.cache.put_principal(USER, "a@x.ca", "1")
+    send = scim._send
+
+    def send_stale(url, body=None, request_type="get", params=None):
+        if request_type == "post" and body["groups"] == [{"value": "deleted"}]:
+            send(url, body, request_type, params)
+            raise ValueError({"status": "404", "detail": "Group deleted not found"})
+        return send(url, body, request_type, params)
+
+    scim._send = send_stale
+    scim.add_user("b@x.ca", "B", ["eng"])
+    assert [body["groups"] for method, _, body, _ in scim.sent if method == "post"] == [
+        [{"value": "deleted"}], [{"value": "new"}]]
+    assert scim.cache.get_id(GROUP, "eng") == "new"
+
+    # other errors keep the cached ids
+    def send_error(url, body=None, request_type="get", params=None):
+        raise ValueError({"status": "500"})
+
+    scim._send = send_error
+    with pytest.raises(ValueError):
+        scim.delete_user("a@x.ca")
+    assert scim.cache.get_id(USER, "a@x.ca") == "1"
@@ -0,0 +1,57 @@
+from databricks_api import artifacts
+from databricks_api.artifacts import stage_libraries, is_local
+
+
+class FakeDbfs:
+    def __init__(self):
+        self.files = {}
+        self.handles = {}
+        self.blocks = 0
+
+    def get_status(self, path):
+        if path not in self.files:
+            raise ValueError({"error_code": "RESOURCE_DOES_NOT_EXIST"})
+        return {"path": path, "file_size": len(self.files[path])}
+
+    def create(self, path, overwrite=False):
+        handle = len(self.handles) + 1
+        self.handles[handle] = (path, [])
+        return handle
+
+    def add_block(self, handle, data):
+        self.blocks += 1
+        self.handles[handle][1].append(data)
+
+    def close(self, handle):
+        path, blocks = self.handles[handle]
+        self.files[path] = b"".join(blocks)
+
+
+def test_is_local():
+    assert is_local("dist/pkg.whl")
+    assert is_local("/tmp/pkg.jar")
+    assert not is_local("dbfs:/FileStore/pkg.whl")
+    assert not is_local("abfss://c@a.dfs.core.windows.net/pkg.jar")
+
+
+def test_stage_libraries(monkeypatch, tmp_path):
+    monkeypatch.setattr(artifacts, "BLOCK_SIZE", 4)
+    wheel = tmp_path / "pkg-1.0-py3-none-any.whl"
+    wheel.write_bytes(b"0123456789")
+    libraries = [{"whl": str(wheel)}, {"jar": "dbfs:/jars/x.jar"},
+                 {"pypi": {"package": "pandas==1.2.0"}}]
+    dbfs = FakeDbfs()
+
+    staged = stage_libraries(dbfs, libraries)
+    uri = staged[0]["whl"]
+    assert uri.startswith("dbfs:/FileStore/artifacts/") and uri.endswith("/pkg-1.0-py3-none-any.whl")
+    assert staged[1:] == libraries[1:]
+    assert libraries[0] == {"whl": str(wheel)}
+    assert dbfs.files[uri[len("dbfs:"):]] == b"0123456789"
+    assert dbfs.blocks == 3
+
+    # unchanged content is not uploaded again, changed content gets a new path
+    assert stage_libraries(dbfs, libraries) == staged
+    assert dbfs.blocks == 3
+    wheel.write_bytes(b"changed")
+    assert stage_libraries(dbfs, libraries)[0]["whl"] != uri
@@ -0,0 +1,77 @@
+import threading
+import time
+
+import requests
+
+from databricks_api.auth import TokenCache, set_credentials
+from databricks_api.cli_client import CredentialApiClient
+from databricks_api.base import APIBase, RequestCache
+
+
+class CountingProvider:
+    """provider handing out tok1, tok2, ... valid for ttl seconds
+    """
+
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self.calls = 0
+
+    def fetch(self):
+        self.calls += 1
+        time.sleep(0.02)
+        return f"tok{self.calls}", time.time() + self.ttl
+
+
+def test_single_flight_refresh():
+    provider = CountingProvider()
+    credentials = TokenCache(provider, refresh_margin=60)
+    tokens = []
+    threads = [threading.Thread(target=lambda: tokens.append(credentials.token()))
+               for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert provider.calls == 1
+    assert set(tokens) == {"tok1"}
+
+    # within the refresh margin the current token stays usable
+    provider.ttl = 30
+    credentials.invalidate("tok1")
+    assert credentials.token() == "tok2"
+    assert credentials.token() == "tok3"
+    credentials.invalidate("tok2")  # stale 401, already refreshed
+    assert credentials._state[0] == "tok3"
+
+
+def test_retry_401_once(monkeypatch, fake_response):
+    sent = []
+
+    def get(url, headers, **kwargs):
+        sent.append(headers["Authorization"])
+        status = 401 if headers["Authorization"] == "Bearer tok1" else 200
+        return fake_response({"status": status}, status_code=status)
+
+    credentials = TokenCache(CountingProvider())
+    api = APIBase(token=None, host="https://host", request_cache=RequestCache(),
+                  credentials=credentials)
+    monkeypatch.setattr(api.transport.session, "get", get)
+    assert api.request(f"{api.api_url}/clusters/list") == {"status": 200}
+    assert sent == ["Bearer tok1", "Bearer tok2"]
+
+
+def test_api_client_uses_shared_credentials(monkeypatch):
+    set_credentials("https://aad-host", TokenCache(CountingProvider()))
+    client = CredentialApiClient(host="https://aad-host")
+    sent = []
+
+    def request(method, url, headers=None, **kwargs):
+        sent.append(headers["Authorization"])
+        response = requests.Response()
+        response.status_code = 401 if len(sent) == 1 else 200
+        response._content = b"{}"
+        return response
+
+    monkeypatch.setattr(client.session, "request", request)
+    assert client.perform_query("GET", "/clusters/list") == {}
+    assert sent == ["Bearer tok1", "Bearer tok2"]
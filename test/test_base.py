@@ -0,0 +1,74 @@
+from databricks_api.base import (APIBase, RequestCache, RateLimiter, get_transport,
+                                  configure_transport)
+
+import threading
+import time
+
+
+class FakeAPI(APIBase):
+    def __init__(self):
+        super().__init__(token="token", host="https://host",
+                         request_cache=RequestCache())
+        self.sent = []
+
+    def _send(self, url, body=None, request_type="get", params=None):
+        self.sent.append((request_type, url))
+        time.sleep(0.02)
+        return {"url": url, "items": [1, 2]}
+
+
+def test_memoize_and_invalidate():
+    api = FakeAPI()
+    users = f"{api.api_url}/preview/scim/v2/Users?filter=userName+eq+a"
+    clusters = f"{api.api_url}/clusters/list"
+
+    first = api.request(users)
+    first["items"].append(3)
+    assert api.request(users) == {"url": users, "items": [1, 2]}
+    api.request(clusters)
+    assert len(api.sent) == 2
+
+    # a SCIM write drops SCIM lookups only
+    api.request(f"{api.api_url}/preview/scim/v2/Groups/1", {"a": 1}, request_type="patch")
+    api.request(users)
+    api.request(clusters)
+    assert [s[1] for s in api.sent].count(users) == 2
+    assert [s[1] for s in api.sent].count(clusters) == 1
+
+    assert api.request(users, memoize=False)
+    assert api.request_cache.stats()["hits"] == 2
+
+
+def test_single_flight():
+    api = FakeAPI()
+    url = f"{api.api_url}/clusters/list"
+    threads = [threading.Thread(target=api.request, args=(url,)) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(api.sent) == 1
+    stats = api.request_cache.stats()
+    assert stats["misses"] == 1
+    assert stats["coalesced"] + stats["hits"] == 4
+
+
+def test_rate_limiter():
+    limiter = RateLimiter(rate=50, burst=2)
+    start = time.monotonic()
+    waits = [limiter.acquire() for _ in range(6)]
+    assert waits[:2] == [0.0, 0.0]
+    # 4 requests beyond the burst at 50 per second
+    assert time.monotonic() - start >= 0.07
+    assert RateLimiter().acquire() == 0.0
+
+
+def test_transport_shared_per_host():
+    first = FakeAPI()
+    assert first.transport is get_transport("https://host")
+    transport = configure_transport("https://host", rate=10)
+    assert FakeAPI().transport is transport
+    assert transport.limiter.rate == 10
+    assert first.transport is not transport
+    configure_transport("https://host")
@@ -0,0 +1,56 @@
+from databricks_api.cache import InventoryCache, USER, GROUP
+
+
+class FakeSCIM:
+    users_url = "users"
+    sp_url = "sps"
+    groups_url = "groups"
+
+    def __init__(self):
+        self.filters = []
+        self.resources = {
+            "users": [{"id": "1", "userName": "a@domain.ca",
+                       "meta": {"lastModified": "2021-01-01T00:00:00Z"},
+                       "groups": [{"value": "10"}]}],
+            "sps": [],
+            "groups": [{"id": "10", "displayName": "grp",
+                        "meta": {"lastModified": "2021-01-02T00:00:00Z"},
+                        "members": [{"value": "1"}]}],
+        }
+
+    def iter_resources(self, url, scim_filter=None, attributes=None):
+        self.filters.append((url, scim_filter))
+        return iter(self.resources[url] if not scim_filter else [])
+
+
+def test_refresh_and_lookup(tmp_path):
+    cache = InventoryCache("https://host/", path=str(tmp_path / "inv.sqlite"))
+    scim = FakeSCIM()
+    cache.refresh(scim)
+
+    assert cache.get_id(USER, "a@domain.ca") == "1"
+    assert cache.get_id(GROUP, "grp") == "10"
+    assert cache.member_groups("1") == ["10"]
+    assert cache.group_members("10") == ["1"]
+
+    # second refresh is incremental from the last lastModified
+    cache.refresh(scim)
+    assert (scim.users_url, 'meta.lastModified gt "2021-01-01T00:00:00Z"') in scim.filters
+    assert cache.get_id(USER, "a@domain.ca") == "1"
+
+    cache.refresh(scim, full=True)
+    assert scim.filters[-1] == (scim.groups_url, None)
+
+
+def test_object_ttl(tmp_path):
+    cache = InventoryCache("https://host", path=str(tmp_path / "inv.sqlite"),
+                           object_ttl=-1)
+    cache.put_object("cluster", "c", "abc")
+    cache.put_scope_acl("scope", [{"principal": "grp", "permission": "READ"}])
+    assert cache.get_object_id("cluster", "c") is None
+    assert cache.scope_acl("scope") is None
+
+    cache.object_ttl = 60
+    assert cache.get_object_id("cluster", "c") == "abc"
+    assert cache.scope_acl("scope") == {
+        "items": [{"principal": "grp", "permission": "READ"}]}
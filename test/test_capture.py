@@ -0,0 +1,69 @@
+import threading
+import time
+
+import requests
+
+from databricks_api.base import APIBase
+from databricks_api.capture import Recorder, load_capture, sanitize, REDACTED
+from databricks_api.replay import StubServer, run_load
+
+
+def test_sanitize():
+    body = {"scope": "kv", "string_value": "s3cr3t",
+            "acl": [{"principal": "users", "Token": "x"}]}
+    assert sanitize(body) == {"scope": "kv", "string_value": REDACTED,
+                              "acl": [{"principal": "users", "Token": REDACTED}]}
+
+
+def test_capture_and_replay(monkeypatch, tmp_path, fake_response):
+    api = APIBase(token="t", host="https://host")
+    response = fake_response({"token_value": "dapi123", "token_info": {"comment": "ci"}})
+    monkeypatch.setattr(api.transport.session, "post", lambda **kwargs: response)
+    original = APIBase._send
+    path = str(tmp_path / "capture.jsonl.gz")
+
+    with Recorder(path) as recorder:
+        api.request("https://host/api/2.0/token/create", body={"comment": "ci"},
+                    request_type="post")
+
+    monkeypatch.undo()
+    assert APIBase._send is original
+    assert recorder.count == 1
+    records = load_capture(path)
+    assert records[0]["method"] == "POST"
+    assert records[0]["path"] == "/api/2.0/token/create"
+    assert records[0]["response"]["token_value"] == REDACTED
+
+    records[0]["duration"] = 0.05
+    server = StubServer(records, port=0, latency_scale=2.0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        start = time.perf_counter()
+        response = requests.post(f"{server.url}/api/2.0/token/create", json={})
+        assert time.perf_counter() - start >= 0.1
+        assert response.json()["token_info"] == {"comment": "ci"}
+        assert requests.get(f"{server.url}/api/2.0/clusters/list").status_code == 404
+
+        server.latency_scale = 0
+        result = run_load(records, server.url, concurrency=4, repeat=10)
+        assert result["requests"] == 10
+        assert result["errors"] == 0
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_capture_streamed_listing(monkeypatch, tmp_path, fake_response):
+    api = APIBase(token="t", host="https://host")
+    response = fake_response(chunks=[b'{"clusters": [{"cluster_id": "c1"},',
+                                     b' {"cluster_id": "c2"}], "has_more": false}'])
+    monkeypatch.setattr(api.transport.session, "get", lambda **kwargs: response)
+    path = str(tmp_path / "capture.jsonl")
+
+    with Recorder(path):
+        clusters = list(api.stream("https://host/api/2.0/clusters/list", "clusters"))
+
+    assert [c["cluster_id"] for c in clusters] == ["c1", "c2"]
+    records = load_capture(path)
+    assert records[0]["path"] == "/api/2.0/clusters/list"
+    assert records[0]["response"]["clusters"] == clusters
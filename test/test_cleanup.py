@@ -0,0 +1,82 @@
+import threading
+import time
+
+from databricks_api.acl import remove_scope_acls
+from databricks_api.cleanup import CleanupAborted, CleanupExecutor, CleanupGuard
+
+import pytest
+
+
+class FakeSecrets:
+    def __init__(self, acls):
+        self.acls = acls
+        self.deleted = []
+
+    def list_acls(self, scope):
+        return {"items": [{"principal": p, "permission": "READ"} for p in self.acls[scope]]}
+
+    def delete_acl(self, scope, principal):
+        if principal == "locked":
+            raise ValueError("PERMISSION_DENIED")
+        self.deleted.append((scope, principal))
+
+
+def test_guard_aborts_before_any_deletion():
+    deleted = []
+    cleanup = CleanupExecutor(guard=CleanupGuard(max_deletions=5, max_percentage=50))
+
+    with pytest.raises(CleanupAborted):
+        cleanup.run("groups", [f"g{i}" for i in range(6)], deleted.append, total=100)
+    with pytest.raises(CleanupAborted):
+        cleanup.run("groups", ["a", "b", "c"], deleted.append, total=4)
+    assert deleted == []
+
+    assert len(cleanup.run("groups", ["a", "b"], deleted.append, total=4)) == 2
+    assert sorted(deleted) == ["a", "b"]
+
+
+def test_concurrent_deletions_with_per_item_results():
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def delete(item):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+
+    cleanup = CleanupExecutor(max_workers=3)
+    results = cleanup.run("folders", [f"/f{i}" for i in range(9)], delete)
+    assert len(results) == 9 and all(err is None for _, err in results)
+    assert peak[0] == 3
+
+    secrets = FakeSecrets({"kv1": ["eng", "locked"], "kv2": [], "kv3": ["ops"]})
+    results = dict(remove_scope_acls(secrets, ["kv1", "kv2", "kv3"], cleanup, total=4))
+    assert sorted(secrets.deleted) == [("kv1", "eng"), ("kv3", "ops")]
+    assert isinstance(results[("kv1", "locked")], ValueError)
+    assert cleanup.summary()["scope ACL entries"] == {"deleted": 2, "failed": 1}
+
+    # two of four scopes affected
+    with pytest.raises(CleanupAborted):
+        remove_scope_acls(secrets, ["kv1", "kv3"], CleanupExecutor(
+            guard=CleanupGuard(max_percentage=25)), total=4)
+
+
+def test_deferred_plans_are_checked_together():
+    deleted = []
+    cleanup = CleanupExecutor(guard=CleanupGuard(max_deletions=4), defer=True)
+    assert cleanup.run("groups", ["g1", "g2"], deleted.append) == []
+    assert cleanup.run("folders", ["/a", "/b", "/c"], deleted.append) == []
+    assert deleted == []
+
+    # each kind is under the limit, together they are not
+    with pytest.raises(CleanupAborted, match="2 groups, 3 folders"):
+        cleanup.execute()
+    assert deleted == [] and cleanup.plans == []
+
+    cleanup.run("groups", ["g1", "g2"], deleted.append)
+    cleanup.run("folders", ["/a"], deleted.append)
+    assert len(cleanup.execute()) == 3
+    assert sorted(deleted) == ["/a", "g1", "g2"]
@@ -0,0 +1,97 @@
+from databricks_api.cluster import ClusterManagement
+from databricks_api.scheduler import ClusterStartScheduler
+from databricks_api.utils import fan_out, logger
+
+import pytest
+
+
+def test_resolve_pools():
+    specs = {"cluster_name": "c",
+             "instance_pool_name": "pool",
+             "node_type_id": "Standard_DS3_v2",
+             "num_workers": 1}
+    resolved = ClusterManagement.resolve_pools(specs, {"pool": "0101-abc"})
+
+    assert resolved == {"cluster_name": "c",
+                        "instance_pool_id": "0101-abc",
+                        "num_workers": 1}
+    # config is not modified
+    assert specs["instance_pool_name"] == "pool"
+
+    assert ClusterManagement.resolve_pools({"cluster_name": "c"}, {}) == {"cluster_name": "c"}
+    with pytest.raises(ValueError):
+        ClusterManagement.resolve_pools(specs, {})
+
+
+class FakeClusters:
+    def __init__(self, state):
+        self.state = state
+        self.started = []
+        self.terminated = []
+
+    def get_cluster_by_name(self, name):
+        return {"cluster_name": name, "cluster_id": "c1", "state": self.state}
+
+    def get_cluster(self, cluster_id):
+        return {"cluster_id": cluster_id, "state": self.state}
+
+    def start_cluster(self, cluster_id):
+        self.started.append(cluster_id)
+        self.state = "RUNNING"
+
+    def delete_cluster(self, cluster_id):
+        self.terminated.append(cluster_id)
+
+
+class FakeLibraries:
+    def __init__(self):
+        self.polls = 0
+
+    def cluster_status(self, cluster_id):
+        self.polls += 1
+        status = "INSTALLING" if self.polls < 3 else "INSTALLED"
+        return {"library_statuses": [{"library": {"pypi": {"package": "x"}}, "status": status}]}
+
+
+def make_management(state, **kwargs):
+    management = ClusterManagement(logger, token="token", host="https://host", **kwargs)
+    management.cluster_client = FakeClusters(state)
+    management.libraries_client = FakeLibraries()
+    return management
+
+
+def test_terminate_only_clusters_started_by_the_deploy(monkeypatch):
+    monkeypatch.setattr("databricks_api.cluster.time.sleep", lambda s: None)
+    specs = {"cluster_name": "etl"}
+
+    running = make_management("RUNNING")
+    cluster_id, started = running.create_cluster(specs)
+    assert not started
+    assert not running.finish("etl", cluster_id, started)
+    assert running.cluster_client.terminated == []
+
+    stopped = make_management("TERMINATED")
+    cluster_id, started = stopped.create_cluster(specs)
+    assert started and stopped.cluster_client.started == ["c1"]
+    assert stopped.finish("etl", cluster_id, started)
+    assert stopped.libraries_client.polls == 3
+    assert stopped.cluster_client.terminated == ["c1"]
+
+    no_start = make_management("TERMINATED", start=False)
+    assert no_start.create_cluster(specs) == ("c1", False)
+    assert no_start.cluster_client.started == []
+
+
+def test_core_quota_reached_by_clusters_left_running(monkeypatch):
+    monkeypatch.setattr("databricks_api.cluster.time.sleep", lambda s: None)
+    scheduler = ClusterStartScheduler(max_concurrent_starts=2, core_quota=12)
+    management = make_management("TERMINATED", scheduler=scheduler, keep_running=True)
+    monkeypatch.setattr(management, "estimate_cores", lambda specs: 8)
+
+    # the second cluster only fits once the first is terminated, which never happens
+    results = {specs["cluster_name"]: err for specs, _, err in fan_out(
+        lambda specs: management.main(specs, []),
+        [{"cluster_name": "etl"}, {"cluster_name": "ml"}], max_workers=2)}
+    assert sum(err is None for err in results.values()) == 1
+    assert sum(isinstance(err, ValueError) for err in results.values()) == 1
+    assert scheduler.total_cores == 8
@@ -0,0 +1,75 @@
+import io
+import threading
+import time
+
+import requests
+
+from databricks_api.base import Transport
+from databricks_api.concurrency import AdaptiveLimit, ConcurrencyController, endpoint_family
+
+
+def test_endpoint_family():
+    api = "https://host/api/2.0"
+    assert endpoint_family(f"{api}/preview/scim/v2/Users?filter=x") == "scim"
+    assert endpoint_family(f"{api}/preview/permissions/clusters/1") == "permissions"
+    assert endpoint_family(f"{api}/clusters/list") == "clusters"
+    assert endpoint_family("https://host/api/2.1/jobs/list") == "jobs"
+    assert endpoint_family("https://host/api/2.1/unity-catalog/catalogs") == "unity-catalog"
+
+
+def test_aimd():
+    limit = AdaptiveLimit("clusters", initial=2, max_limit=4)
+    # saturated: every success adds 1/limit. requests take 100ms
+    for _ in range(4):
+        limit.acquire()
+        limit.acquire()
+        limit.release(time.monotonic() - 0.1, 200)
+        limit.release(time.monotonic() - 0.1, 200)
+    assert limit.stats()["limit"] >= 3
+
+    limit.acquire()
+    limit.release(time.monotonic() - 0.1, 429)
+    stats = limit.stats()
+    assert stats["limit"] == 1 and stats["throttled"] == 1
+    assert stats["max_reached"] >= 3
+    assert [h[1] for h in stats["history"]][0] == 2
+
+    # an unsaturated family keeps its limit
+    idle = AdaptiveLimit("scim", initial=4)
+    for _ in range(10):
+        idle.acquire()
+        idle.release(time.monotonic() - 0.1, 200)
+    assert idle.stats()["limit"] == 4
+
+
+def test_limit_blocks_surplus_workers():
+    limit = AdaptiveLimit("groups", initial=1, max_limit=1)
+    first = limit.acquire()
+    acquired = threading.Event()
+    t = threading.Thread(target=lambda: (limit.acquire(), acquired.set()))
+    t.start()
+    assert not acquired.wait(0.05)
+    limit.release(first, 200)
+    assert acquired.wait(1)
+    t.join()
+
+
+def test_transport_retries_throttled(monkeypatch):
+    monkeypatch.setattr("databricks_api.base.time.sleep", lambda s: sleeps.append(s))
+    sleeps = []
+    transport = Transport(max_concurrency=4)
+    statuses = [429, 429, 200]
+
+    def get(**kwargs):
+        response = requests.Response()
+        response.status_code = statuses.pop(0)
+        response.raw = io.BytesIO()
+        response.headers["Retry-After"] = "3"
+        return response
+
+    monkeypatch.setattr(transport.session, "get", get)
+    assert transport.send("get", url="https://host/api/2.0/clusters/list").status_code == 200
+    assert sleeps == [3.0, 3.0]
+    stats = transport.concurrency.stats()["clusters"]
+    assert stats["throttled"] == 2 and stats["requests"] == 3
+    assert ConcurrencyController().summary() == ""
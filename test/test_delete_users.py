@@ -0,0 +1,92 @@
+import json
+
+from databricks_api.api import SCIM
+from databricks_api.delete_users import bulk_delete, iter_principals, USERS
+from databricks_api.jsonstream import ArrayStream
+
+import pytest
+
+
+class FakeSCIM(SCIM):
+    """SCIM with canned responses instead of http calls
+    """
+
+    def __init__(self, users):
+        super().__init__(token="token", host="https://host")
+        self.users = users
+        self.calls = []
+
+    def request(self, url, body=None, request_type="get", params=None):
+        self.calls.append((request_type, url, params, body))
+        if url.endswith("/Bulk"):
+            return {"Operations": [{"bulkId": op["bulkId"], "status": "204"}
+                                   for op in body["Operations"]]}
+        if request_type == "get":
+            start = params["startIndex"] - 1
+            page = self.users[start:start + params["count"]]
+            return {"totalResults": len(self.users), "Resources": page}
+        return ""
+
+    def stream(self, url, field, params=None):
+        return ArrayStream([json.dumps(self.request(url, params=params))], field)
+
+
+def make_users(n):
+    return [{"id": str(i), "userName": f"user{i}@domain.ca"} for i in range(n)]
+
+
+def test_iter_principals_paginates():
+    scim = FakeSCIM(make_users(250))
+    principals = list(iter_principals(scim, USERS, scim_filter="userName co @domain.ca"))
+
+    assert len(principals) == 250
+    assert principals[0] == ("user0@domain.ca", "0")
+    assert len(scim.calls) == 3
+
+
+def test_bulk_delete_cap_aborts_before_deleting():
+    scim = FakeSCIM(make_users(5))
+    with pytest.raises(ValueError):
+        bulk_delete(scim, iter_principals(scim, USERS), max_deletions=4)
+
+    assert all(call[0] == "get" for call in scim.calls)
+
+
+def test_bulk_delete_dry_run_and_bulk():
+    scim = FakeSCIM(make_users(5))
+    assert bulk_delete(scim, iter_principals(scim, USERS), dry_run=True) == []
+    assert all(call[0] == "get" for call in scim.calls)
+
+    results = bulk_delete(scim, iter_principals(scim, USERS),
+                          bulk=True, batch_size=2)
+    assert len(results) == 5
+    assert all(err is None for _, err in results)
+    assert len([c for c in scim.calls if c[1].endswith("/Bulk")]) == 3
+
+
+def test_bulk_delete_concurrent():
+    scim = FakeSCIM(make_users(5))
+    results = bulk_delete(scim, iter_principals(scim, USERS), max_workers=2)
+
+    assert sorted(name for name, _ in results) == [u["userName"] for u in make_users(5)]
+    assert len([c for c in scim.calls if c[0] == "delete"]) == 5
+
+
+def test_bulk_delete_reports_missing_operations():
+    scim = FakeSCIM(make_users(3))
+    # the server stopped after the first operation
+    scim.bulk = lambda operations, fail_on_errors=None: {
+        "Operations": [{"bulkId": operations[0]["bulkId"], "status": "204"}]}
+
+    results = dict(bulk_delete(scim, iter_principals(scim, USERS), bulk=True))
+    assert results["user0@domain.ca"] is None
+    assert isinstance(results["user1@domain.ca"], ValueError)
+    assert isinstance(results["user2@domain.ca"], ValueError)
+
+
+def test_delete_spn_arguments():
+    from databricks_api.delete_spn import parse_args
+
+    args = parse_args(["-wu", "https://host", "-pat", "dapi"])
+    assert args.all_spn and args.dry_run
+    assert not parse_args(["-wu", "https://host", "--execute"]).dry_run
@@ -0,0 +1,95 @@
+from databricks_api.base import APIBase
+from databricks_api.export import WorkspaceExporter, cluster_spec
+
+API = "https://host/api/2.0"
+CLUSTER = {"cluster_id": "c1", "cluster_name": "etl", "cluster_source": "UI",
+           "spark_version": "11.3.x-scala2.12", "node_type_id": "Standard_DS3_v2",
+           "driver_node_type_id": "Standard_DS3_v2", "num_workers": 0,
+           "autoscale": {"min_workers": 1, "max_workers": 4},
+           "autotermination_minutes": 30, "enable_elastic_disk": True,
+           "azure_attributes": {"first_on_demand": 1, "availability": "ON_DEMAND_AZURE",
+                                "spot_bid_max_price": -1.0},
+           "spark_conf": {}, "state": "TERMINATED", "default_tags": {"Vendor": "Databricks"}}
+USERS = [{"id": "u1", "userName": "a@x.ca"}, {"id": "u2", "userName": "b@x.ca"},
+         {"id": "u3", "userName": "c@x.ca"}]
+
+
+class FakeStream(list):
+    def __init__(self, items, meta=None):
+        super().__init__(items)
+        self.meta = meta or {}
+
+
+def stream(self, url, field, params=None, chunk_size=65536):
+    path = url[len(API):]
+    if path == "/preview/scim/v2/Users":
+        # the server caps pages at 2
+        start = params["startIndex"] - 1
+        return FakeStream(USERS[start:start + 2], {"totalResults": 3})
+    listings = {
+        "/preview/scim/v2/Groups": [
+            {"id": "g1", "displayName": "eng", "members": [{"value": "u2"}, {"value": "u3"}]},
+            {"id": "g2", "displayName": "bots", "members": [{"value": "s1"}]},
+            {"id": "g3", "displayName": "all", "members": [{"value": "g1"}, {"value": "g2"}]},
+            {"id": "g4", "displayName": "users", "members": [{"value": "u1"}]}],
+        "/preview/scim/v2/ServicePrincipals": [
+            {"id": "s1", "applicationId": "app-1", "displayName": "adf"}],
+        "/clusters/list": [CLUSTER, {**CLUSTER, "cluster_id": "j1", "cluster_name": "job-1",
+                                     "cluster_source": "JOB"}],
+        "/secrets/scopes/list": [{"name": "kv"}],
+        "/workspace/list": [{"path": "/team", "object_type": "DIRECTORY", "object_id": 7},
+                            {"path": "/Shared", "object_type": "DIRECTORY", "object_id": 2}]}
+    return FakeStream(listings[path], {"totalResults": len(listings[path])})
+
+
+def permissions(*entries):
+    return {"access_control_list": [
+        {"group_name": group, "all_permissions": [{"permission_level": level,
+                                                   "inherited": inherited}]}
+        for group, level, inherited in entries]}
+
+
+def send(self, url, body=None, request_type="get", params=None):
+    path = url[len(API):]
+    return {"/secrets/acls/list": {"items": [{"principal": "eng", "permission": "READ"},
+                                             {"principal": "ops", "permission": "READ"}]},
+            "/libraries/all-cluster-statuses": {"statuses": [{"cluster_id": "c1", "library_statuses": [
+                {"library": {"pypi": {"package": "pandas"}}, "status": "INSTALLED"},
+                {"library": {"jar": "dbfs:/all.jar"}, "status": "INSTALLED",
+                 "is_library_for_all_clusters": True}]}]},
+            "/workspace/get-status": {"object_id": 0, "object_type": "DIRECTORY"},
+            "/preview/permissions/clusters/c1": permissions(("eng", "CAN_RESTART", False),
+                                                            ("admins", "CAN_MANAGE", True)),
+            "/preview/permissions/directories/7": permissions(("eng", "CAN_RUN", False)),
+            "/preview/permissions/directories/0": permissions(("admins", "CAN_MANAGE", True)),
+            }[path]
+
+
+def test_cluster_spec_strips_defaults():
+    spec = cluster_spec(CLUSTER)
+    assert spec == {"cluster_name": "etl", "spark_version": "11.3.x-scala2.12",
+                    "node_type_id": "Standard_DS3_v2",
+                    "autoscale": {"min_workers": 1, "max_workers": 4},
+                    "autotermination_minutes": 30}
+    # the deploy finds an exported spec unchanged
+    assert spec.items() <= CLUSTER.items()
+    pooled = cluster_spec({**CLUSTER, "instance_pool_id": "p1", "driver_instance_pool_id": "p1"})
+    assert pooled["instance_pool_id"] == "p1"
+    assert "node_type_id" not in pooled and "driver_instance_pool_id" not in pooled
+
+
+def test_export(monkeypatch):
+    monkeypatch.setattr(APIBase, "stream", stream)
+    monkeypatch.setattr(APIBase, "_send", send)
+    acl, clusters, libraries = WorkspaceExporter(token="t", host="https://host").export()
+
+    assert acl["GROUPS"] == [
+        {"name": "all", "type": "group", "members": [{"group_name": "bots"}, {"group_name": "eng"}]},
+        {"name": "bots", "type": "spn", "members": [{"application_id": "app-1", "display_name": "adf"}]},
+        {"name": "eng", "type": "user", "members": [{"user_name": "b@x.ca"}, {"user_name": "c@x.ca"}]}]
+    assert acl["SECRETS"] == [{"scope": "kv", "acl": [{"permission": "READ", "group": ["eng", "ops"]}]}]
+    assert acl["CLUSTERS"] == [{"name": "etl", "acl": [{"permission": "CAN_RESTART", "group": ["eng"]}]}]
+    # the root folder has inherited permissions only
+    assert acl["WORKSPACE"] == [{"folder": "/team", "acl": [{"permission": "CAN_RUN", "group": ["eng"]}]}]
+    assert [c["cluster_name"] for c in clusters] == ["etl"]
+    assert libraries == [{"pypi": {"package": "pandas"}}]
@@ -0,0 +1,24 @@
+from databricks_api.journal import RunJournal
+
+import pytest
+
+
+def test_resume_skips_completed_units(tmp_path):
+    journal = RunJournal(directory=str(tmp_path))
+    journal.record("group", "grp", {"name": "grp", "members": []})
+    journal.record("cluster", "c", {"cluster_name": "c"}, cluster_id="0101-abc")
+
+    resumed = RunJournal(run_id=journal.run_id, directory=str(tmp_path), resume=True)
+    assert resumed.skip("group", "grp", {"name": "grp", "members": []})
+    # configuration changed since the failed run
+    assert not resumed.skip("group", "grp", {"name": "grp", "members": [{"user_name": "a"}]})
+    assert not resumed.skip("scope", "s", {})
+    # validation failed, e.g. cluster was deleted meanwhile
+    assert not resumed.skip("cluster", "c", {"cluster_name": "c"}, validate=lambda e: False)
+    assert resumed.skip("cluster", "c", {"cluster_name": "c"},
+                        validate=lambda e: e["cluster_id"] == "0101-abc")
+
+
+def test_resume_unknown_run(tmp_path):
+    with pytest.raises(ValueError):
+        RunJournal(run_id="missing", directory=str(tmp_path), resume=True)
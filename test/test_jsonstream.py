@@ -0,0 +1,32 @@
+import json
+
+from databricks_api.jsonstream import ArrayStream
+
+import pytest
+
+
+def chunked(text, size):
+    data = text.encode("utf-8")
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_items_and_meta_across_chunk_boundaries():
+    body = json.dumps({"totalResults": 12345,
+                       "Resources": [{"id": str(i), "displayName": f"grüppe {i}"}
+                                     for i in range(20)],
+                       "itemsPerPage": 20}, indent=1)
+    for size in [1, 2, 3, 7, 64, len(body)]:
+        stream = ArrayStream(chunked(body, size), "Resources")
+        items = list(stream)
+        assert [i["id"] for i in items] == [str(i) for i in range(20)]
+        assert items[3]["displayName"] == "grüppe 3"
+        assert stream.meta == {"totalResults": 12345, "itemsPerPage": 20}
+
+
+def test_missing_and_empty_fields():
+    assert list(ArrayStream([b'{"has_more": false}'], "clusters")) == []
+    assert list(ArrayStream([b'{"clusters": []}'], "clusters")) == []
+    assert list(ArrayStream([b"{}"], "clusters")) == []
+    assert list(ArrayStream([b""], "clusters")) == []
+    with pytest.raises(ValueError):
+        list(ArrayStream([b'{"clusters": [{"a": 1}'], "clusters"))
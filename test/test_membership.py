@@ -0,0 +1,71 @@
+from databricks_api.acl import deploy_groups
+from databricks_api.membership import MembershipGraph, CycleError, GROUP, USER, SPN
+
+import pytest
+
+GROUPS = [
+    {"name": "all", "type": "group",
+     "members": [{"group_name": "eng"}, {"group_name": "bots"}]},
+    {"name": "eng", "type": "user",
+     "members": [{"user_name": "a"}, {"user_name": "b"}, {"group_name": "leads"}]},
+    {"name": "leads", "type": "user", "members": [{"user_name": "c"}]},
+    {"name": "bots", "type": "spn", "members": [{"application_id": "app"}]},
+]
+
+
+def test_topological_order_and_closure():
+    graph = MembershipGraph.from_config(GROUPS)
+    order = graph.topological_order()
+
+    assert order.index("leads") < order.index("eng") < order.index("all")
+    assert order.index("bots") < order.index("all")
+    assert graph.effective_members("all") == {
+        (USER, "a"), (USER, "b"), (USER, "c"), (SPN, "app")}
+
+
+def test_effective_diff():
+    desired = MembershipGraph.from_config(GROUPS)
+    current = MembershipGraph()
+    current.add_member("all", (GROUP, "eng"))
+    current.add_member("eng", (USER, "a"))
+    current.add_member("eng", (USER, "z"))
+
+    added, removed = desired.effective_diff(current, "all")
+    assert added == {(USER, "b"), (USER, "c"), (SPN, "app")}
+    assert removed == {(USER, "z")}
+
+    # closure cache is dropped when the graph changes
+    current.remove_member("eng", (USER, "z"))
+    assert current.effective_members("all") == {(USER, "a")}
+
+
+def test_cycle_detection():
+    graph = MembershipGraph.from_config([
+        {"name": "a", "type": "group", "members": [{"group_name": "b"}]},
+        {"name": "b", "type": "group", "members": [{"group_name": "c"}]},
+        {"name": "c", "type": "group", "members": [{"group_name": "a"}]},
+    ])
+    with pytest.raises(CycleError, match="a -> b -> c -> a"):
+        graph.check_cycles()
+
+
+def test_invalid_nested_groups_delete_nothing():
+    class FakeGroups:
+        deleted = []
+
+        def list_all(self):
+            return {"group_names": ["users", "admins", "unmanaged"]}
+
+        def delete(self, group):
+            self.deleted.append(group)
+
+    groups = FakeGroups()
+    cyclic = [{"name": "a", "type": "group", "members": [{"group_name": "b"}]},
+              {"name": "b", "type": "group", "members": [{"group_name": "a"}]}]
+    with pytest.raises(CycleError):
+        deploy_groups(groups, None, cyclic, remove_unmanaged=True)
+    with pytest.raises(ValueError):
+        deploy_groups(groups, None, [{"name": "a", "type": "group",
+                                      "members": [{"group_name": "undefined"}]}],
+                      remove_unmanaged=True)
+    assert groups.deleted == []
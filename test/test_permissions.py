@@ -0,0 +1,67 @@
+from databricks_api.base import APIBase, RequestCache
+from databricks_api.permissions import PermissionsEngine
+
+HOST = "https://host"
+PERMISSIONS = f"{HOST}/api/2.0/preview/permissions"
+
+
+def acl(*entries):
+    return {"access_control_list": [
+        {key: name, "all_permissions": [{"permission_level": level, "inherited": inherited}]}
+        for key, name, level, inherited in entries]}
+
+
+class FakeWorkspace:
+    def __init__(self):
+        self.jobs = {"etl": 1, "report": 2}
+        self.permissions = {
+            f"{PERMISSIONS}/jobs/1": acl(("user_name", "owner@x", "IS_OWNER", False),
+                                         ("group_name", "eng", "CAN_VIEW", False)),
+            f"{PERMISSIONS}/jobs/2": acl(("user_name", "owner@x", "IS_OWNER", False),
+                                         ("group_name", "admins", "CAN_MANAGE", True)),
+        }
+        self.writes = []
+
+    def send(self, api, url, body=None, request_type="get", params=None):
+        if url.endswith("/jobs/list"):
+            return {"jobs": [{"job_id": i, "settings": {"name": n}}
+                             for n, i in self.jobs.items()],
+                    "has_more": False}
+        if request_type == "get":
+            return self.permissions[url]
+        self.writes.append((request_type, url, body["access_control_list"]))
+        return {}
+
+
+def engine(monkeypatch):
+    workspace = FakeWorkspace()
+    monkeypatch.setattr(APIBase, "_send",
+                        lambda api, *args, **kwargs: workspace.send(api, *args, **kwargs))
+    return workspace, PermissionsEngine(token="t", host=HOST, request_cache=RequestCache(),
+                                        retries=0)
+
+
+def test_only_changed_objects_are_applied(monkeypatch):
+    workspace, eng = engine(monkeypatch)
+    result = eng.deploy("JOBS", [
+        {"name": "etl", "acl": [{"permission": "CAN_VIEW", "group": ["eng"]}]},
+        {"name": "report", "acl": [{"permission": "CAN_VIEW", "group": ["eng"]}]},
+        {"name": "gone", "acl": [{"permission": "CAN_VIEW", "group": ["eng"]}]},
+    ])
+
+    assert result == {"unchanged": ["etl"], "applied": ["report"],
+                      "failed": [], "missing": ["gone"]}
+    # only an addition: patched, and the current owner is not touched
+    assert workspace.writes == [("patch", f"{PERMISSIONS}/jobs/2",
+                                 [{"group_name": "eng", "permission_level": "CAN_VIEW"}])]
+
+
+def test_removals_replace_and_keep_owner(monkeypatch):
+    workspace, eng = engine(monkeypatch)
+    eng.deploy("JOBS", [{"name": "etl",
+                         "acl": [{"permission": "CAN_MANAGE_RUN", "group": ["ops"]}]}])
+
+    request_type, url, body = workspace.writes[0]
+    assert request_type == "put"
+    assert {"user_name": "owner@x", "permission_level": "IS_OWNER"} in body
+    assert {"group_name": "eng", "permission_level": "CAN_VIEW"} not in body
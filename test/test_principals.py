@@ -0,0 +1,44 @@
+from databricks_api.acl import deploy_scope_acl
+from databricks_api.membership import member_node
+from databricks_api.permissions import acl_state
+from databricks_api.principals import Principal, names
+
+
+class FakeSecrets:
+    def __init__(self, items):
+        self.items = items
+        self.calls = []
+
+    def list_acls(self, scope):
+        return {"items": self.items}
+
+    def delete_acl(self, scope, principal):
+        self.calls.append(("delete", principal))
+
+    def put_acl(self, scope, principal, permission):
+        self.calls.append(("put", principal, permission))
+
+
+def test_records_are_interned_tuples():
+    name = "".join(["user", "@x.ca"])
+    node = member_node({"user_name": name})
+    assert node == ("user", "user@x.ca")
+    assert node == Principal("user", "user@x.ca")
+    assert node.name is member_node({"application_id": "user@x.ca"}).name
+    assert "user@x.ca" in names(["user@x.ca"])
+
+    state = acl_state([{"group_name": "eng", "permission_level": "CAN_USE"}])
+    assert state == {("group_name", "eng", "CAN_USE")}
+    assert next(iter(state)).permission == "CAN_USE"
+
+
+def test_scope_acl_diff():
+    secrets = FakeSecrets([{"principal": "eng", "permission": "READ"},
+                           {"principal": "ops", "permission": "READ"},
+                           {"principal": "old", "permission": "WRITE"}])
+    deploy_scope_acl(secrets, {"scope": "kv", "acl": [
+        {"permission": "READ", "group": ["eng"]},
+        {"permission": "MANAGE", "group": ["ops"]}]})
+
+    # unchanged entries are left alone, changed permissions are overwritten
+    assert secrets.calls == [("delete", "old"), ("put", "ops", "MANAGE")]
@@ -0,0 +1,53 @@
+import time
+
+from databricks_api.base import APIBase, RequestCache
+from databricks_api.profiling import Profiler
+
+
+def slow_get(response):
+    def get(**kwargs):
+        time.sleep(0.05)
+        return response
+    return get
+
+
+def test_phase_network_split(monkeypatch, tmp_path, fake_response):
+    api = APIBase(token="t", host="https://host", request_cache=RequestCache())
+    monkeypatch.setattr(api.transport.session, "get", slow_get(fake_response({"ok": True})))
+    original = APIBase._send
+
+    with Profiler(str(tmp_path), mode="cprofile") as profiler:
+        with profiler.phase("fetch"):
+            api.request("https://host/api/2.0/clusters/list", memoize=False)
+            api.request("https://host/api/2.0/clusters/list", memoize=False)
+        with profiler.phase("idle"):
+            time.sleep(0.02)
+
+    fetch = profiler.phases["fetch"]
+    assert fetch.requests == 2
+    assert fetch.network >= 0.1
+    assert profiler.phases["idle"].requests == 0
+    assert APIBase._send is original
+    assert (tmp_path / "fetch.pstats").exists()
+    assert "fetch" in (tmp_path / "summary.txt").read_text()
+
+
+def test_disabled_profiler_is_a_no_op():
+    profiler = Profiler()
+    with profiler:
+        with profiler.phase("render"):
+            pass
+    assert not profiler.phases
+
+
+def test_streamed_listings_count_as_network(monkeypatch, tmp_path, fake_response):
+    api = APIBase(token="t", host="https://host")
+    monkeypatch.setattr(api.transport.session, "get",
+                        slow_get(fake_response({"clusters": [{"cluster_id": "c1"}]})))
+
+    with Profiler(str(tmp_path), mode="timers") as profiler:
+        with profiler.phase("list"):
+            assert len(list(api.stream("https://host/api/2.0/clusters/list", "clusters"))) == 1
+
+    assert profiler.phases["list"].requests == 1
+    assert profiler.phases["list"].network >= 0.05
@@ -0,0 +1,55 @@
+from databricks_api.scheduler import ClusterStartScheduler, guess_node_type_cores
+
+import threading
+import time
+
+import pytest
+
+
+def test_guess_node_type_cores():
+    assert guess_node_type_cores("Standard_DS3_v2") == 4
+    assert guess_node_type_cores("Standard_DS13_v2") == 8
+    assert guess_node_type_cores("Standard_D8s_v3") == 8
+    assert guess_node_type_cores("Standard_NC6s_v3") == 6
+    assert guess_node_type_cores("i3.xlarge") == 4
+    assert guess_node_type_cores("r5.4xlarge") == 16
+    assert guess_node_type_cores("m5.large") == 2
+    assert guess_node_type_cores(None) == 4
+
+
+def test_scheduler_limits_and_priority():
+    scheduler = ClusterStartScheduler(max_concurrent_starts=2, core_quota=24)
+    order = []
+    peak = []
+    lock = threading.Lock()
+
+    def start(name, priority):
+        with scheduler.start_slot(name, 8, priority):
+            with lock:
+                order.append(name)
+                peak.append(len(scheduler._starting))
+            time.sleep(0.05)
+        # cluster is RUNNING, terminate it so the quota frees up
+        scheduler.stopped(name)
+
+    # occupy both slots so the rest queue up
+    blockers = [threading.Thread(target=start, args=(f"block{i}", 0)) for i in range(2)]
+    for t in blockers:
+        t.start()
+    time.sleep(0.01)
+    threads = [threading.Thread(target=start, args=(f"c{p}", p)) for p in [30, 10, 20]]
+    for t in threads:
+        t.start()
+        time.sleep(0.01)
+    for t in blockers + threads:
+        t.join()
+
+    assert max(peak) <= 2
+    assert order[2:] == ["c10", "c20", "c30"]
+    assert scheduler.total_cores == 0
+
+
+def test_scheduler_rejects_oversized_cluster():
+    scheduler = ClusterStartScheduler(core_quota=8)
+    with pytest.raises(ValueError):
+        scheduler.acquire("big", 16)
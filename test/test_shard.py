@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from databricks_api.membership import MembershipGraph
+from databricks_api.report import merge_reports
+from databricks_api.shard import Shard, parse_shard
+
+NAMES = [f"group-{i}" for i in range(200)]
+
+
+def test_parse_shard():
+    assert parse_shard("1/4") == (1, 4)
+    for value in ["4/4", "-1/2", "a/b", "1"]:
+        with pytest.raises(ValueError):
+            parse_shard(value)
+
+
+def test_shards_partition_objects():
+    shards = [Shard(i, 4) for i in range(4)]
+    owners = [[s.index for s in shards if s.owns("group", n)] for n in NAMES]
+
+    assert all(len(o) == 1 for o in owners)
+    # every shard gets a share
+    assert {o[0] for o in owners} == {0, 1, 2, 3}
+    assert sorted(sum((s.assigned["group"] for s in shards), [])) == sorted(NAMES)
+
+
+def test_adding_a_shard_only_moves_objects_to_it():
+    before = {n: next(i for i in range(4) if Shard(i, 4).owns("group", n)) for n in NAMES}
+    after = {n: next(i for i in range(5) if Shard(i, 5).owns("group", n)) for n in NAMES}
+
+    assert all(after[n] in (before[n], 4) for n in NAMES)
+
+
+def test_nested_group_components():
+    graph = MembershipGraph.from_config([
+        {"name": "all", "type": "group", "members": [{"group_name": "eng"}]},
+        {"name": "eng", "type": "user", "members": [{"user_name": "a"}]},
+        {"name": "ops", "type": "user", "members": [{"user_name": "b"}]},
+    ])
+    assert sorted(map(sorted, graph.components())) == [["all", "eng"], ["ops"]]
+
+
+def test_merge_reports(tmp_path):
+    reports = [
+        {"run_id": "r", "shard": "0/2", "assigned": {"scope": ["a"]},
+         "completed": {"scope": ["a"]}, "incomplete": {}},
+        {"run_id": "r", "shard": "1/2", "assigned": {"scope": ["b", "c"]},
+         "completed": {"scope": ["b"]}, "incomplete": {"scope": ["c"]}},
+    ]
+    paths = []
+    for i, r in enumerate(reports):
+        path = tmp_path / f"{i}.json"
+        path.write_text(json.dumps(r))
+        paths.append(str(path))
+
+    merged = merge_reports(paths)
+    assert merged["missing_shards"] == []
+    assert merged["summary"]["scope"] == {"assigned": 3, "completed": 2, "incomplete": 1}
+    assert merge_reports(paths[:1])["missing_shards"] == ["1/2"]
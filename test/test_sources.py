@@ -0,0 +1,81 @@
+from databricks_api.api import SCIM
+from databricks_api.sources import iter_members, sync_source_members
+
+import pytest
+
+
+class FakeGroups:
+    def __init__(self, members):
+        self.members = members
+
+    def list_members(self, group):
+        return {"members": [{"user_name": m} for m in self.members]}
+
+
+class FakeSCIM(SCIM):
+    """SCIM with an in memory user directory instead of http calls
+    """
+
+    def __init__(self, users):
+        super().__init__(token="token", host="https://host")
+        self.users = users
+        self.patches = []
+        self.created = []
+
+    def resolve_ids(self, url, attribute, values, batch_size=50):
+        if url == self.groups_url:
+            return [(v, "g1") for v in values]
+        return [(v, self.users[v.lower()]) for v in values if v.lower() in self.users]
+
+    def patch_group_members(self, group_id, add=(), remove=()):
+        self.patches.append((group_id, sorted(add), sorted(remove)))
+
+    def bulk(self, operations, fail_on_errors=None):
+        self.created.extend(op["data"]["userName"] for op in operations)
+        return {"Operations": [{"bulkId": op["bulkId"], "status": "201"} for op in operations]}
+
+
+def test_iter_members_chunks(tmp_path):
+    csv_file = tmp_path / "members.csv"
+    csv_file.write_text("user_name,display_name\n" +
+                        "".join(f"u{i}@x.ca,User {i}\n" for i in range(5)) + ",\n")
+    chunks = list(iter_members(str(csv_file), chunk_size=2))
+    assert [len(c) for c in chunks] == [2, 2, 1]
+    assert chunks[0][0] == {"user_name": "u0@x.ca", "display_name": "User 0"}
+
+    jsonl_file = tmp_path / "members.jsonl"
+    jsonl_file.write_text('{"application_id": "app1"}\n\n{"application_id": "app2"}\n')
+    assert list(iter_members(str(jsonl_file))) == [
+        [{"application_id": "app1"}, {"application_id": "app2"}]]
+
+    with pytest.raises(ValueError):
+        list(iter_members(str(tmp_path / "members.txt")))
+
+
+def test_sync_source_members(tmp_path):
+    source = tmp_path / "members.csv"
+    source.write_text("user_name\nA@x.ca\nb@x.ca\nnew@x.ca\n")
+    scim = FakeSCIM({"a@x.ca": "1", "b@x.ca": "2", "old@x.ca": "3"})
+    grp = {"name": "eng", "type": "user", "source": str(source),
+           "members": [{"user_name": "inline@x.ca"}, {"group_name": "leads"}]}
+
+    counts = sync_source_members(FakeGroups(["a@x.ca", "old@x.ca"]), scim, grp,
+                                 remove_unmanaged=True, chunk_size=2)
+
+    assert counts == {"added": 1, "created": 2, "removed": 1, "unmanaged": 0}
+    assert scim.patches == [("g1", ["2"], []), ("g1", [], ["3"])]
+    assert sorted(scim.created) == ["inline@x.ca", "new@x.ca"]
+
+
+def test_create_counts_only_confirmed_operations(tmp_path):
+    source = tmp_path / "members.csv"
+    source.write_text("user_name\nnew1@x.ca\nnew2@x.ca\n")
+    scim = FakeSCIM({})
+    bulk = scim.bulk
+    # the server stopped after the first operation
+    scim.bulk = lambda operations, fail_on_errors=None: bulk(operations[:1])
+    grp = {"name": "eng", "type": "user", "source": str(source), "members": []}
+
+    counts = sync_source_members(FakeGroups([]), scim, grp)
+    assert counts["created"] == 1
+    assert scim.created == ["new1@x.ca"]
@@ -0,0 +1,55 @@
+from databricks_api.api import Clusters
+from databricks_api.base import RequestCache
+from databricks_api.telemetry import (TelemetryCollector, load_records, phase_durations,
+                                      summarize)
+
+EVENTS = [{"timestamp": 1000, "type": "STARTING"},
+          {"timestamp": 4000, "type": "INIT_SCRIPTS_STARTED"},
+          {"timestamp": 6000, "type": "INIT_SCRIPTS_FINISHED"},
+          {"timestamp": 61000, "type": "RUNNING"},
+          {"timestamp": 62000, "type": "EDITED"},
+          {"timestamp": 62500, "type": "RESTARTING"},
+          {"timestamp": 92500, "type": "RUNNING"}]
+
+
+def test_phase_durations():
+    assert phase_durations(EVENTS, libraries_settled=100000) == {
+        "requested_to_running": 60.0,
+        "init_scripts": 2.0,
+        "edit_restart_count": 1,
+        "edit_restarts": 30.0,
+        "running_to_libraries": 7.5}
+    # edits of terminated clusters don't restart them
+    assert phase_durations([{"timestamp": 0, "type": "EDITED"},
+                            {"timestamp": 10, "type": "STARTING"},
+                            {"timestamp": 5010, "type": "RUNNING"}]) == {"requested_to_running": 5.0}
+
+
+def test_collect_pages_and_summarize(tmp_path):
+    clusters = Clusters(token="t", host="https://host", request_cache=RequestCache())
+    bodies = []
+
+    def send(url, body=None, request_type="get", params=None):
+        bodies.append(body)
+        if "offset" not in body:
+            return {"events": EVENTS[:4], "next_page": {**body, "offset": 4}}
+        return {"events": EVENTS[4:]}
+
+    clusters._send = send
+    path = str(tmp_path / "telemetry.jsonl")
+    for run_id in ["r1", "r2"]:
+        telemetry = TelemetryCollector(path, run_id=run_id)
+        telemetry.touched("etl", None, {"spark_version": "11.3.x-scala2.12",
+                                        "instance_pool_id": "pool"})
+        telemetry.update("etl", cluster_id="c1", state_before="TERMINATED")
+        records = telemetry.collect(clusters)
+    assert bodies[0]["cluster_id"] == "c1" and bodies[0]["order"] == "ASC"
+    assert len(bodies) == 4
+    assert records[0]["events"] == 7 and records[0]["instance_pool"]
+
+    summary = summarize(load_records([path]), by="instance_pool")
+    assert summary["True"]["requested_to_running"]["count"] == 2
+    assert summary["True"]["edit_restarts"]["p50"] == 30.0
+    assert "running_to_libraries" not in summary["True"]
+
+    assert TelemetryCollector().collect(clusters) == []
@@ -0,0 +1,87 @@
+from databricks_api.api import SCIM
+from databricks_api.usersync import desired_users, user_operations, sync_users
+
+import pytest
+
+
+class FakeSCIM(SCIM):
+    """SCIM with an in memory user directory instead of http calls
+    """
+
+    def __init__(self, users):
+        super().__init__(token="token", host="https://host")
+        self.users = users
+        self.bulks = []
+
+    def list_resources(self, url, attributes=None, count=100, max_workers=8):
+        return self.users
+
+    def bulk(self, operations, fail_on_errors=None):
+        self.bulks.append(operations)
+        return {"Operations": [{"bulkId": op["bulkId"],
+                                "status": "400" if op["bulkId"] == "3" else "200"}
+                               for op in operations]}
+
+
+def test_desired_users():
+    groups = [{"name": "eng", "type": "user",
+               "members": [{"user_name": "A@x.ca", "display_name": "A", "active": False},
+                           {"user_name": "b@x.ca"}, {"group_name": "leads"}]},
+              {"name": "ops", "type": "user",
+               "members": [{"user_name": "a@x.ca",
+                            "entitlements": ["workspace-access", "allow-cluster-create"]}]},
+              {"name": "spn", "type": "spn", "members": [{"application_id": "app"}]}]
+    assert desired_users(groups) == {
+        "a@x.ca": {"display_name": "A", "active": False,
+                   "entitlements": ["allow-cluster-create", "workspace-access"]}}
+
+    groups[1]["members"][0]["display_name"] = "B"
+    with pytest.raises(ValueError):
+        desired_users(groups)
+    with pytest.raises(ValueError):
+        desired_users([{"name": "eng", "type": "user",
+                        "members": [{"user_name": "a@x.ca", "entitlements": ["admin"]}]}])
+
+
+def test_user_operations():
+    current = {"displayName": "A", "entitlements": [{"value": "allow-cluster-create"},
+                                                     {"value": "databricks-sql-access"}]}
+    assert user_operations(current, {"display_name": "A", "active": True}) == []
+    assert user_operations(current, {"display_name": "B", "active": False,
+                                     "entitlements": ["allow-cluster-create", "workspace-access"]}) == [
+        {"op": "replace", "path": "displayName", "value": "B"},
+        {"op": "replace", "path": "active", "value": False},
+        {"op": "add", "path": "entitlements", "value": [{"value": "workspace-access"}]},
+        {"op": "remove", "path": 'entitlements[value eq "databricks-sql-access"]'}]
+
+
+def test_sync_users():
+    scim = FakeSCIM([{"id": "1", "userName": "a@x.ca", "displayName": "A"},
+                     {"id": "2", "userName": "b@x.ca", "displayName": "Old"},
+                     {"id": "3", "userName": "c@x.ca", "active": True},
+                     {"id": "4", "userName": "d@x.ca", "displayName": "D"}])
+    groups = [{"name": "eng", "type": "user",
+               "members": [{"user_name": "a@x.ca", "display_name": "A"},
+                           {"user_name": "B@x.ca", "display_name": "B"},
+                           {"user_name": "c@x.ca", "active": False},
+                           {"user_name": "missing@x.ca", "display_name": "M"}]}]
+
+    results = sync_users(scim, groups, batch_size=1)
+    # unchanged and missing users cost no request, one user per /Bulk request
+    assert [[op["path"] for op in ops] for ops in scim.bulks] == [["/Users/2"], ["/Users/3"]]
+    assert scim.bulks[0][0]["data"]["Operations"] == [
+        {"op": "replace", "path": "displayName", "value": "B"}]
+    assert [(name, err is None) for name, err in results] == [("b@x.ca", True), ("c@x.ca", False)]
+
+    assert sync_users(scim, [{"name": "eng", "type": "user",
+                              "members": [{"user_name": "a@x.ca"}]}]) == []
+
+
+def test_sync_users_reports_missing_operations():
+    scim = FakeSCIM([{"id": "1", "userName": "a@x.ca", "displayName": "A"}])
+    scim.bulk = lambda operations, fail_on_errors=None: {"Operations": []}
+
+    results = sync_users(scim, [{"name": "eng", "type": "user",
+                                 "members": [{"user_name": "a@x.ca", "display_name": "B"}]}])
+    assert [name for name, _ in results] == ["a@x.ca"]
+    assert isinstance(results[0][1], ValueError)
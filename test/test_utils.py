@@ -1,4 +1,4 @@
-from databricks_api.utils import render_yaml, infolog
+from databricks_api.utils import render_yaml
 
 # attempt import to catch errors
 from databricks_api.acl import main
@@ -17,8 +17,8 @@ def test_render_yaml():
         "adf_appid": "abc123"
     }
 
-    contents = render_yaml(f"{dir_path}\\ACL_template.yaml", mako_kwargs)
-    expected = render_yaml(f"{dir_path}\\ACL_expected.yaml", {})
+    contents = render_yaml(os.path.join(dir_path, "ACL_template.yaml"), mako_kwargs)
+    expected = render_yaml(os.path.join(dir_path, "ACL_expected.yaml"), {})
     pp(contents)
     pp(expected)
     assert isinstance(contents, dict)
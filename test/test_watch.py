@@ -0,0 +1,75 @@
+from databricks_api.permissions import permission_state
+from databricks_api.watch import DriftWatcher
+
+CONFIG = {
+    "GROUPS": [{"name": "eng", "type": "user", "members": [{"user_name": "a"}]}],
+    "SECRETS": [{"scope": "kv", "acl": [{"permission": "READ", "group": ["eng"]}]}],
+}
+
+
+class FakeWatcher(DriftWatcher):
+    def __init__(self, remote):
+        super().__init__(CONFIG, token="x", host="https://example.net")
+        self.remote = remote
+        self.reconciled = []
+
+    def _changed_groups(self):
+        return {"eng"}
+
+    def _scopes_changed(self):
+        return False
+
+    def observed_state(self, kind, item):
+        return set(self.remote[(kind, item.get("name") or item.get("scope"))])
+
+    def reconcile(self, kind, item):
+        self.reconciled.append(kind)
+
+
+def test_permission_state_ignores_inherited():
+    permissions = {"access_control_list": [
+        {"group_name": "admins",
+         "all_permissions": [{"permission_level": "CAN_MANAGE", "inherited": True}]},
+        {"group_name": "eng",
+         "all_permissions": [{"permission_level": "CAN_RESTART", "inherited": False}]},
+    ]}
+    assert permission_state(permissions) == {("group_name", "eng", "CAN_RESTART")}
+
+
+def test_poll_reconciles_only_drifted(tmp_path):
+    remote = {("group", "eng"): [("user", "a")],
+              ("scope", "kv"): [("eng", "READ"), ("intruder", "MANAGE")]}
+    watcher = FakeWatcher(remote)
+    watcher.report_path = str(tmp_path / "drift.jsonl")
+
+    report = watcher.poll_once()
+    assert watcher.reconciled == ["scope"]
+    assert report["drifted"][0]["unexpected"] == [("intruder", "MANAGE")]
+
+    # in sync objects with an unchanged listing are not compared again
+    remote[("scope", "kv")] = [("eng", "READ")]
+    report = watcher.poll_once()
+    assert report["drifted"] == []
+    assert len((tmp_path / "drift.jsonl").read_text().splitlines()) == 2
+
+
+def test_unmanaged_members_are_not_drift_without_remove():
+    remote = {("group", "eng"): [("user", "a"), ("user", "unmanaged")],
+              ("scope", "kv"): [("eng", "READ")]}
+    watcher = FakeWatcher(remote)
+    assert watcher.poll_once()["drifted"] == []
+
+    watcher.remove_unmanaged = True
+    watcher._in_sync.clear()
+    assert watcher.poll_once()["drifted"][0]["unexpected"] == [("user", "unmanaged")]
+    assert watcher.reconciled == ["group"]
+
+
+def test_unversioned_objects_are_fetched_on_full_checks():
+    remote = {("group", "eng"): [("user", "a")], ("scope", "kv"): [("eng", "READ")]}
+    watcher = FakeWatcher(remote)
+    watcher.full_check_every = 3
+    watcher._changed_groups = lambda: set()
+
+    # the first poll checks everything, then only every third poll
+    assert [watcher.poll_once()["checked"] for _ in range(4)] == [2, 0, 0, 1]
@@ -1,11 +1,10 @@
 """used for quick testing of yaml rendering
 """
-from databricks_api.utils import render_yaml, logger, dir_path
+from databricks_api.utils import render_yaml, logger, config_path
 from pprint import PrettyPrinter
 
 pp = PrettyPrinter(indent=4).pprint
 
-configuration_path = f"{dir_path}\\configuration\\"
 
 def test_yaml():
     mako_kwargs = {
@@ -13,7 +12,7 @@ def test_yaml():
     }
     config_files = ["ACL.yaml"]
     for cf in config_files:
-        contents = render_yaml(f"{configuration_path}\\{cf}", mako_kwargs)
+        contents = render_yaml(config_path(cf), mako_kwargs)
         pp(contents)
         assert contents
 